@@ -0,0 +1,156 @@
+import asyncio, json, socket, time, websockets
+from http.client import HTTPConnection
+from typing import Dict, List
+from services.server import QuoteServer
+from utils.binary_protocol import BinaryQuoteClient
+from benchmarks.common import percentiles, create_depth_message
+
+SYMBOLS = ["BTCUSDT", "ETHUSDT", "LTCUSDT", "BNBUSDT", "USDTTRY"]
+
+def get_free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+class LocalDepthFeed:
+    """Local websocket stand-in of Binance partial order book streams"""
+
+    def __init__(self, symbols: List[str], depth=20, interval=0.1):
+        self.symbols = symbols
+        self.depth = depth
+        self.interval = interval
+        self.messages = [json.dumps(create_depth_message(symbol, depth)) for symbol in symbols]
+        self.server = None
+
+    async def _serve(self, websocket):
+        try:
+            while True:
+                for message in self.messages:
+                    await websocket.send(message)
+                await asyncio.sleep(self.interval)
+        except websockets.ConnectionClosed:
+            pass
+
+    async def start(self) -> str:
+        self.server = await websockets.serve(self._serve, "127.0.0.1", 0)
+        return f"ws://127.0.0.1:{self.server.sockets[0].getsockname()[1]}"
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+def send_requests(port: int, count: int) -> List[float]:
+    """Sends quote requests on one keep-alive connection. Returns latencies in seconds"""
+    connection = HTTPConnection("127.0.0.1", port)
+    body = json.dumps({"action": "buy", "base_currency": "ETH", "quote_currency": "USDT", "amount": "1.5"})
+    headers = {"Content-Type": "application/json"}
+    latencies = []
+
+    for _ in range(count):
+        start = time.perf_counter()
+        connection.request("POST", "/quote", body, headers)
+        response = connection.getresponse()
+        response.read()
+        latencies.append(time.perf_counter() - start)
+
+        if response.status != 200:
+            raise RuntimeError(f"Quote request failed with status {response.status}")
+
+    connection.close()
+    return latencies
+
+async def measure_server(http_server_mode: str, requests: int) -> Dict:
+    feed = LocalDepthFeed(SYMBOLS)
+    uri = await feed.start()
+    port = get_free_port()
+
+    # quote cache is disabled so every repeated request measures a full quote computation
+    quote_server = QuoteServer().set_port(port).set_symbols(SYMBOLS).set_http_server_mode(http_server_mode) \
+        .set_quote_cache_size(0).build()
+    quote_server.binance_client.base_uri = uri
+    await quote_server.start()
+
+    try:
+        # wait until first order books and http server are ready
+        deadline = time.time() + 10
+        while "ETHUSDT" not in quote_server.quote_service.order_books or not await asyncio.to_thread(_is_listening, port):
+            if time.time() > deadline:
+                raise RuntimeError("Quote server is not ready")
+            await asyncio.sleep(0.05)
+
+        await asyncio.to_thread(send_requests, port, min(100, requests))
+
+        start = time.perf_counter()
+        latencies = await asyncio.to_thread(send_requests, port, requests)
+        elapsed = time.perf_counter() - start
+    finally:
+        await quote_server.stop()
+        await feed.stop()
+
+    return {
+        "name": f"end_to_end/quote/{http_server_mode}",
+        "requests": requests,
+        "ops_per_sec": requests / elapsed,
+        **{f"latency_{name}_us": value * 1e6 for name, value in percentiles(latencies).items()}}
+
+async def send_binary_requests(port: int, count: int, in_flight: int) -> List[float]:
+    """Sends quote requests on one binary protocol connection keeping given number in flight. Returns latencies in seconds"""
+    client = await BinaryQuoteClient.connect("127.0.0.1", port)
+    latencies = []
+
+    async def send(requests: int):
+        for _ in range(requests):
+            start = time.perf_counter()
+            response = await client.quote("buy", "ETH", "USDT", 1.5)
+            latencies.append(time.perf_counter() - start)
+
+            if isinstance(response, str):
+                raise RuntimeError(f"Quote request failed: {response}")
+
+    await asyncio.gather(*(send(count // in_flight) for _ in range(in_flight)))
+    await client.close()
+    return latencies
+
+async def measure_binary_server(requests: int, in_flight: int) -> Dict:
+    feed = LocalDepthFeed(SYMBOLS)
+    uri = await feed.start()
+    port = get_free_port()
+
+    quote_server = QuoteServer().set_port(get_free_port()).set_symbols(SYMBOLS).set_binary_server(port=port) \
+        .set_quote_cache_size(0).build()
+    quote_server.binance_client.base_uri = uri
+    await quote_server.start()
+
+    try:
+        deadline = time.time() + 10
+        while "ETHUSDT" not in quote_server.quote_service.order_books:
+            if time.time() > deadline:
+                raise RuntimeError("Quote server is not ready")
+            await asyncio.sleep(0.05)
+
+        await send_binary_requests(port, min(100, requests), 1)
+
+        start = time.perf_counter()
+        latencies = await send_binary_requests(port, requests, in_flight)
+        elapsed = time.perf_counter() - start
+    finally:
+        await quote_server.stop()
+        await feed.stop()
+
+    return {
+        "name": f"end_to_end/quote/binary/in_flight_{in_flight}",
+        "requests": len(latencies),
+        "ops_per_sec": len(latencies) / elapsed,
+        **{f"latency_{name}_us": value * 1e6 for name, value in percentiles(latencies).items()}}
+
+def _is_listening(port: int) -> bool:
+    try:
+        with socket.create_connection(("127.0.0.1", port), timeout=0.1):
+            return True
+    except OSError:
+        return False
+
+def run(requests=2000) -> List[Dict]:
+    """End-to-end quote latency percentiles against a running QuoteServer fed by a local websocket stand-in"""
+    return [asyncio.run(measure_server(mode, requests)) for mode in ("flask", "asyncio")] + \
+        [asyncio.run(measure_binary_server(requests, in_flight)) for in_flight in (1, 16)]
@@ -0,0 +1,28 @@
+import json
+from typing import Dict, List
+from utils.exchange_parser import BinanceSpotWebSocketMessageParser, get_fast_json_decoder
+from benchmarks.common import measure, create_depth_message
+
+DEPTHS = [5, 20, 1000]
+
+def run(min_time=0.2) -> List[Dict]:
+    """BinanceSpotWebSocketMessageParser.convert_order_book throughput in messages/sec"""
+    results = []
+
+    for depth in DEPTHS:
+        message = create_depth_message("ETHUSDT", depth)
+        raw_message = json.dumps(message)
+
+        for lazy in (False, True):
+            parser = BinanceSpotWebSocketMessageParser(lazy)
+            mode = "lazy" if lazy else "eager"
+
+            measurement = measure(lambda: parser.convert_order_book(message), min_time)
+            results.append({"name": f"convert_order_book/depth={depth}/{mode}", **measurement})
+
+            # decode and convert as done per received message
+            decoder = get_fast_json_decoder()
+            measurement = measure(lambda: parser.convert_order_book(decoder(raw_message)), min_time)
+            results.append({"name": f"decode_and_convert/depth={depth}/{mode}", **measurement})
+
+    return results
@@ -0,0 +1,39 @@
+from typing import Dict, List
+from models.quote import QuoteRequest
+from services.quote_service import QuoteService
+from benchmarks.common import measure, create_order_book
+
+DEPTHS = [5, 50, 500, 5000]
+LEVEL_FRACTIONS = [0.01, 0.5, 0.99]
+"""Requested amount as fraction of book's total liquidity"""
+
+def run(min_time=0.2) -> List[Dict]:
+    """QuoteService.quote across order book depths, amounts and direct vs reversed symbols"""
+    results = []
+
+    for depth in DEPTHS:
+        quote_service = QuoteService()
+        order_book = create_order_book("ETHUSDT", depth)
+        quote_service.on_order_book_received(order_book)
+
+        snapshot = quote_service.order_books["ETHUSDT"]
+        total_quantity = snapshot.asks.cumulative_quantities[-1]
+        total_volume = snapshot.asks.cumulative_volumes[-1]
+
+        for fraction in LEVEL_FRACTIONS:
+            for reversed_symbol in (False, True):
+                if reversed_symbol:
+                    request = QuoteRequest("buy", "USDT", "ETH", total_volume * fraction)
+                else:
+                    request = QuoteRequest("buy", "ETH", "USDT", total_quantity * fraction)
+
+                measurement = measure(lambda: quote_service.quote(request), min_time)
+                results.append({
+                    "name": f"quote/depth={depth}/fill={fraction}/{'reversed' if reversed_symbol else 'direct'}",
+                    **measurement})
+
+        # per update cost of building cumulative arrays
+        measurement = measure(lambda: quote_service.on_order_book_received(order_book), min_time)
+        results.append({"name": f"on_order_book_received/depth={depth}", **measurement})
+
+    return results
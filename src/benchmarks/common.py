@@ -0,0 +1,57 @@
+import time
+from typing import Callable, Dict, List
+from models.order_book import LimitOrder, LimitOrderBook
+
+def measure(function: Callable[[], object], min_time=0.2, repeat=3) -> Dict[str, float]:
+    """Calls function in batches until min_time passes, best of repeat runs.
+    Returns operations per second and nanoseconds per operation"""
+
+    # calibrate batch size to roughly a tenth of min_time
+    batch = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(batch):
+            function()
+        if time.perf_counter() - start > min_time / 10:
+            break
+        batch *= 2
+
+    best = float("inf")
+    for _ in range(repeat):
+        calls = 0
+        start = time.perf_counter()
+        while True:
+            for _ in range(batch):
+                function()
+            calls += batch
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time:
+                break
+        best = min(best, elapsed / calls)
+
+    return {"ops_per_sec": 1 / best, "ns_per_op": best * 1e9}
+
+def percentiles(samples: List[float], points=(50, 90, 99, 99.9)) -> Dict[str, float]:
+    """Nearest rank percentiles of samples"""
+    ordered = sorted(samples)
+    result = {}
+    for point in points:
+        index = min(len(ordered) - 1, max(0, int(round(point / 100 * len(ordered))) - 1))
+        result[f"p{point:g}"] = ordered[index]
+    return result
+
+def create_order_book(symbol: str, depth: int, best_bid=1999.0, best_ask=2000.0, tick=0.01, quantity=1.0) -> LimitOrderBook:
+    """Order book with given number of equally sized levels on each side"""
+    return LimitOrderBook(
+        symbol,
+        bids=[LimitOrder(best_bid - i * tick, quantity) for i in range(depth)],
+        asks=[LimitOrder(best_ask + i * tick, quantity) for i in range(depth)])
+
+def create_depth_message(symbol: str, depth: int, best_bid=1999.0, best_ask=2000.0, tick=0.01, quantity=1.0) -> dict:
+    """Binance partial order book stream message with given depth"""
+    return {
+        "stream": f"{symbol.lower()}@depth{depth}@100ms",
+        "data": {
+            "lastUpdateId": 1,
+            "bids": [[f"{best_bid - i * tick:.2f}", f"{quantity:.8f}"] for i in range(depth)],
+            "asks": [[f"{best_ask + i * tick:.2f}", f"{quantity:.8f}"] for i in range(depth)]}}
@@ -0,0 +1,70 @@
+"""Runs benchmark suites and writes results as json.
+
+Run from repository folder:
+    python src/benchmarks/run.py --output bench.json
+    python src/benchmarks/run.py --suite quote --compare bench.json
+"""
+import argparse, json, os, platform, subprocess, sys, time
+
+# allows running as a script from repository folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import bench_quote, bench_parser, bench_end_to_end
+
+SUITES = {
+    "quote": lambda args: bench_quote.run(args.min_time),
+    "parser": lambda args: bench_parser.run(args.min_time),
+    "end_to_end": lambda args: bench_end_to_end.run(args.requests),
+}
+
+def get_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results: list, baseline: dict):
+    """Prints throughput change of each benchmark against baseline results"""
+    baseline_results = {result["name"]: result for result in baseline["results"]}
+
+    for result in results:
+        previous = baseline_results.get(result["name"])
+        if previous is None or "ops_per_sec" not in previous:
+            continue
+
+        change = result["ops_per_sec"] / previous["ops_per_sec"] - 1
+        print(f"{result['name']:<60} {result['ops_per_sec']:>14.0f} ops/s {change:+8.1%}", file=sys.stderr)
+
+def main():
+    parser = argparse.ArgumentParser(description="Quote service benchmarks")
+    parser.add_argument("--suite", action="append", choices=list(SUITES), help="Suites to run, all when omitted")
+    parser.add_argument("--output", help="Result json file, stdout when omitted")
+    parser.add_argument("--compare", help="Baseline result json file to compare with")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Minimum seconds per micro benchmark")
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per end-to-end benchmark")
+    args = parser.parse_args()
+
+    results = []
+    for suite in args.suite or list(SUITES):
+        results.extend(SUITES[suite](args))
+
+    report = {
+        "commit": get_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.time(),
+        "results": results,
+    }
+
+    if args.compare:
+        with open(args.compare) as file:
+            compare(results, json.load(file))
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+import asyncio, math, os, stat
+from asyncio import AbstractServer, Transport
+from typing import List
+from models.quote import QuoteRequest, QuoteResponse
+from services.quote_service import QuoteCalculator
+from utils.binary_protocol import (CurrencyTable, ACTIONS, FRAME_HEADER, REQUEST_HEADER, QUOTE_REQUEST, QUOTE_RESPONSE,
+    INTERN_RESPONSE, INTERN, QUOTE, STATUS_OK, MAX_FRAME_SIZE, encode_error)
+
+class BinaryQuoteProtocol(asyncio.Protocol):
+    """Binary quote protocol connection. Complete frames are handled in the event loop in arrival order
+    and their responses are written in one batch per received chunk"""
+
+    def __init__(self, service: QuoteCalculator, connections: set):
+        self.service = service
+        self.connections = connections
+
+        self.currencies = CurrencyTable()
+        """Currencies interned by this connection"""
+
+        self.transport: Transport = None
+        self.buffer = bytearray()
+        """Received bytes that are not handled yet"""
+
+    def connection_made(self, transport: Transport):
+        self.transport = transport
+        self.connections.add(self)
+
+    def connection_lost(self, exc):
+        self.connections.discard(self)
+
+    def data_received(self, data: bytes):
+        self.buffer += data
+        responses = []
+        offset = 0
+
+        while len(self.buffer) - offset >= FRAME_HEADER.size:
+            body_length = FRAME_HEADER.unpack_from(self.buffer, offset)[0]
+
+            if body_length > MAX_FRAME_SIZE or body_length < REQUEST_HEADER.size - FRAME_HEADER.size:
+                # requests before the invalid frame are still answered, close flushes buffered writes
+                self.transport.write(b"".join(responses))
+                self.transport.close()
+                return
+
+            frame_end = offset + FRAME_HEADER.size + body_length
+            if len(self.buffer) < frame_end:
+                break
+
+            responses.append(self._handle(bytes(self.buffer[offset:frame_end])))
+            offset = frame_end
+
+        del self.buffer[:offset]
+        if responses:
+            self.transport.write(b"".join(responses))
+
+    def _handle(self, frame: bytes) -> bytes:
+        """Handles one request frame. Returns response frame"""
+        _, message_type, request_id = REQUEST_HEADER.unpack_from(frame)
+
+        try:
+            if message_type == QUOTE and len(frame) == QUOTE_REQUEST.size:
+                return self._quote(frame)
+
+            if message_type == INTERN:
+                currency = frame[REQUEST_HEADER.size:].decode("ascii", errors="replace")
+                currency_id = self.currencies.intern(currency) if currency.isalnum() else None
+                if currency_id is None:
+                    return encode_error(message_type, request_id, f"'{currency}' can not be interned")
+
+                return INTERN_RESPONSE.pack(INTERN_RESPONSE.size - FRAME_HEADER.size, INTERN, request_id, STATUS_OK, currency_id)
+
+            return encode_error(message_type, request_id, f"Invalid message type {message_type} or frame length {len(frame)}")
+
+        except Exception as e:
+            return encode_error(message_type, request_id, "Internal Server Error: " + str(e))
+
+    def _quote(self, frame: bytes) -> bytes:
+        _, _, request_id, action_code, base_id, quote_id, amount = QUOTE_REQUEST.unpack(frame)
+
+        base_currency = self.currencies.get_name(base_id)
+        quote_currency = self.currencies.get_name(quote_id)
+
+        # same checks as json requests
+        if action_code >= len(ACTIONS):
+            return encode_error(QUOTE, request_id, f"'{action_code}' is not valid action")
+        if base_currency is None or quote_currency is None:
+            return encode_error(QUOTE, request_id, "Currency id is not interned")
+        if not math.isfinite(amount) or amount < 0:
+            return encode_error(QUOTE, request_id, f"'{amount}' is not valid amount")
+
+        response = self.service.quote(QuoteRequest(ACTIONS[action_code], base_currency, quote_currency, amount))
+        if not isinstance(response, QuoteResponse):
+            return encode_error(QUOTE, request_id, response)
+
+        return QUOTE_RESPONSE.pack(QUOTE_RESPONSE.size - FRAME_HEADER.size, QUOTE, request_id, STATUS_OK,
+            float(response.total), float(response.price), response.version or 0)
+
+
+class BinaryQuoteServer:
+    """Serves quote service over the binary quote protocol on TCP and/or a Unix domain socket for co-located callers.
+    Each frame is a 4 byte little endian body length followed by body. Bodies start with message type and a client
+    chosen request id that is echoed in the response, so a persistent connection can have many requests in flight.
+    Currencies are interned to 2 byte ids once per connection, quote requests and responses are then fixed size"""
+
+    def __init__(self, service: QuoteCalculator, host: str = "127.0.0.1", port: int = None, path: str = None):
+        self.service = service
+        self.host = host
+
+        self.port = port
+        """TCP port. TCP is disabled when None"""
+
+        self.path = path
+        """Unix domain socket path. Unix socket is disabled when None"""
+
+        self.servers: List[AbstractServer] = []
+        self.connections = set()
+
+    def _create_protocol(self) -> BinaryQuoteProtocol:
+        return BinaryQuoteProtocol(self.service, self.connections)
+
+    async def start(self):
+        """Starts listening TCP port and Unix socket"""
+        loop = asyncio.get_running_loop()
+
+        if self.port is not None:
+            server = await loop.create_server(self._create_protocol, self.host, self.port)
+            self.servers.append(server)
+
+            # resolves port when an ephemeral port (0) is given
+            self.port = server.sockets[0].getsockname()[1]
+
+        if self.path is not None:
+            # socket file of a previous run is left behind on crash
+            if os.path.exists(self.path) and stat.S_ISSOCK(os.stat(self.path).st_mode):
+                os.unlink(self.path)
+            self.servers.append(await loop.create_unix_server(self._create_protocol, self.path))
+
+        return self
+
+    async def stop(self):
+        """Stops listening and closes connections"""
+        for server in self.servers:
+            server.close()
+
+        for connection in list(self.connections):
+            connection.transport.close()
+
+        for server in self.servers:
+            await server.wait_closed()
+        self.servers = []
+
+        if self.path is not None and os.path.exists(self.path):
+            os.unlink(self.path)
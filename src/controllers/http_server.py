@@ -0,0 +1,218 @@
+import asyncio, json
+from asyncio import AbstractServer, Transport
+from concurrent.futures import Future
+from http import HTTPStatus
+from typing import Any, Callable, Dict, Tuple, Union
+from urllib.parse import parse_qsl
+
+Routes = Dict[Tuple[str, str], Callable[[Any], Tuple[Any, int]]]
+
+class HttpProtocol(asyncio.Protocol):
+    """Minimal HTTP/1.1 connection handler. Supports keep-alive and pipelined requests.
+    Requests are handled in the event loop in arrival order"""
+
+    max_header_size = 64 * 1024
+    """Maximum size of request line and headers in bytes"""
+
+    max_body_size = 1024 * 1024
+    """Maximum size of request body in bytes"""
+
+    def __init__(self, routes: Routes, connections: set):
+        self.routes = routes
+        """Handlers by (http method, path)"""
+
+        self.connections = connections
+        """Open connections of server"""
+
+        self.transport: Transport = None
+        self.buffer = bytearray()
+        """Received bytes that are not handled yet"""
+
+        self.waiting: asyncio.Future = None
+        """Response of a long running handler. Later pipelined requests are handled after it is written"""
+
+    def connection_made(self, transport: Transport):
+        self.transport = transport
+        self.connections.add(self)
+
+    def connection_lost(self, exc):
+        self.connections.discard(self)
+
+    def data_received(self, data: bytes):
+        self.buffer += data
+
+        # handle every complete request in buffer, pipelined requests are answered in order
+        while not self.transport.is_closing() and self.waiting is None:
+            header_end = self.buffer.find(b"\r\n\r\n")
+
+            if header_end < 0:
+                if len(self.buffer) > self.max_header_size:
+                    self._write(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "Request header is too large", keep_alive=False)
+                return
+
+            lines = self.buffer[:header_end].decode("latin-1").split("\r\n")
+            request_line = lines[0].split(" ")
+
+            if len(request_line) != 3:
+                self._write(HTTPStatus.BAD_REQUEST, "Invalid request line", keep_alive=False)
+                return
+
+            method, target, version = request_line
+            headers = {}
+            for line in lines[1:]:
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+
+            if "transfer-encoding" in headers:
+                self._write(HTTPStatus.NOT_IMPLEMENTED, "Transfer encoding is not supported", keep_alive=False)
+                return
+
+            # int() also accepts signs and underscores, a negative length would end request inside its headers
+            content_length = headers.get("content-length", "0")
+            if not (content_length.isascii() and content_length.isdigit()):
+                self._write(HTTPStatus.BAD_REQUEST, "Invalid content length", keep_alive=False)
+                return
+            content_length = int(content_length)
+
+            if content_length > self.max_body_size:
+                self._write(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Request body is too large", keep_alive=False)
+                return
+
+            # wait for the rest of body
+            request_end = header_end + 4 + content_length
+            if len(self.buffer) < request_end:
+                return
+
+            body = bytes(self.buffer[header_end + 4:request_end])
+            del self.buffer[:request_end]
+
+            # HTTP/1.1 keeps connection open unless client closes, HTTP/1.0 closes unless client keeps
+            connection = headers.get("connection", "").lower()
+            keep_alive = connection == "keep-alive" if version == "HTTP/1.0" else connection != "close"
+
+            result = self._handle(method, target, body)
+            if isinstance(result, Future):
+                self._wait(result, keep_alive)
+            else:
+                status, response, content_type = result
+                self._write(status, response, keep_alive, content_type)
+
+    def _wait(self, result: Future, keep_alive: bool):
+        """Writes response of a handler that completes in another thread without blocking event loop,
+        then continues with buffered requests"""
+        self.waiting = asyncio.wrap_future(result)
+
+        def on_done(waiting: asyncio.Future):
+            self.waiting = None
+            if self.transport.is_closing() or waiting.cancelled():
+                return
+
+            if waiting.exception() is not None:
+                self._write(HTTPStatus.INTERNAL_SERVER_ERROR, "Internal Server Error: " + str(waiting.exception()), keep_alive)
+            else:
+                status, response, content_type = HttpProtocol._to_response(waiting.result())
+                self._write(status, response, keep_alive, content_type)
+
+            self.data_received(b"")
+
+        self.waiting.add_done_callback(on_done)
+
+    def _handle(self, method: str, target: str, body: bytes) -> Union[Tuple[int, Any, str], Future]:
+        """Dispatches request to route handler. Returns status code, response and content type,
+        or future of handler result when handler completes in another thread"""
+        path, _, query = target.partition("?")
+        handler = self.routes.get((method, path))
+
+        if handler is None:
+            if any(route_path == path for _, route_path in self.routes):
+                return HTTPStatus.METHOD_NOT_ALLOWED, "Method Not Allowed", None
+            return HTTPStatus.NOT_FOUND, "Not Found", None
+
+        if method == "POST":
+            try:
+                request_json = json.loads(body)
+            except ValueError as e:
+                return HTTPStatus.BAD_REQUEST, f"Failed to decode JSON object: {e}", None
+        else:
+            request_json = dict(parse_qsl(query))
+
+        try:
+            result = handler(request_json)
+        except Exception as e:
+            return HTTPStatus.INTERNAL_SERVER_ERROR, "Internal Server Error: " + str(e), None
+
+        if isinstance(result, Future):
+            return result
+
+        return HttpProtocol._to_response(result)
+
+    @staticmethod
+    def _to_response(result: tuple) -> Tuple[int, Any, str]:
+        """Converts handler result to status code, response and content type"""
+
+        # handlers may return (text, status, content type) for non json responses
+        if len(result) == 3:
+            response, status, content_type = result
+            return status, response, content_type
+
+        response, status = result
+        return status, response, None
+
+    def _write(self, status: int, response: Any, keep_alive: bool, content_type: str = None):
+        """Writes response. Response is serialized to json unless a content type is given"""
+        if content_type is None:
+            content_type = "application/json"
+            body = (json.dumps(response, separators=(",", ":"), sort_keys=True) + "\n").encode()
+        else:
+            body = response.encode() if isinstance(response, str) else response
+
+        status = HTTPStatus(status)
+        header = (
+            f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+
+        self.transport.write(header.encode() + body)
+
+        if not keep_alive:
+            self.transport.close()
+
+
+class AsyncHttpServer:
+    """Serves routes on the running event loop without thread handoff"""
+
+    def __init__(self, routes: Routes, host: str = "0.0.0.0", port: int = 5000):
+        self.routes = routes
+        """Handlers by (http method, path)"""
+
+        self.host = host
+        self.port = port
+
+        self.reuse_port = False
+        """Allows multiple processes to listen same port"""
+
+        self.server: AbstractServer = None
+
+        self.connections = set()
+        """Open keep-alive connections"""
+
+    async def start(self):
+        """Starts listening port"""
+        loop = asyncio.get_running_loop()
+        self.server = await loop.create_server(
+            lambda: HttpProtocol(self.routes, self.connections), self.host, self.port, reuse_port=self.reuse_port or None)
+
+        # resolves port when an ephemeral port (0) is given
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        """Stops listening port"""
+        if self.server:
+            self.server.close()
+
+            for connection in list(self.connections):
+                connection.transport.close()
+
+            await self.server.wait_closed()
@@ -1,42 +1,348 @@
-from flask import Flask, request, jsonify
+import math, time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Tuple
+from flask import Flask, Response, request, jsonify
 from werkzeug.exceptions import BadRequest
 
-from services.quote_service import QuoteService
+from services.quote_service import QuoteCalculator
+from services.metrics_service import ServiceMetrics
+from services.tracing_service import Tracer, Trace, SamplingProfiler
+from services.watchlist_service import WatchlistService
 from models.quote import QuoteRequest, QuoteResponse
 from utils.quote_parser import QuoteParser
 
-def create_controller(quote_service:QuoteService) -> Flask:
-    """Creates controller that handles http request and redirects to quote service"""
+class QuoteController:
+    """Handles parsed http requests and redirects to quote service independent of http server.
+    Handlers receive request json (query parameters for GET) and return (response json, status code)
+    or (response text, status code, content type). Long running handlers return a concurrent Future of that result"""
 
-    app = Flask(__name__)
-    service = quote_service
+    def __init__(self, quote_service:QuoteCalculator, metrics:ServiceMetrics = None, tracer:Tracer = None,
+        watchlist:WatchlistService = None):
+        self.service = quote_service
+        self.metrics = metrics
+        """Records quote latencies and rejection reasons. Disabled when None"""
+
+        self.tracer = tracer
+        """Samples stage timings of quote requests. Disabled when None"""
+
+        self.profiler = SamplingProfiler()
+
+        self.watchlist = watchlist
+        """Subscribes symbols at runtime and lazily on first quote. Disabled when None"""
+
+    def get_routes(self) -> Dict[Tuple[str, str], Callable[[Any], Tuple[Any, int]]]:
+        """Handlers by (http method, path)"""
+        return {
+            ("POST", "/quote"): self.quote,
+            ("POST", "/quotes"): self.quotes,
+            ("POST", "/impact"): self.price_impact,
+            ("GET", "/admin/cache"): self.cache_stats,
+            ("GET", "/admin/traces"): self.get_traces,
+            ("GET", "/admin/profile"): self.profile,
+            ("GET", "/admin/symbols"): self.get_symbols,
+            ("POST", "/admin/symbols"): self.update_symbols,
+            ("GET", "/ready"): self.ready,
+            ("GET", "/history"): self.get_history,
+            ("GET", "/metrics"): self.get_metrics,
+        }
 
-    @app.post('/quote')
-    def quote():
+    def quote(self, request_json) -> Tuple[Any, int]:
         """Calculates best price for given QuoteRequest"""
-        try:
-            request_json = request.get_json()
+        trace = self.tracer.start("quote") if self.tracer is not None else None
 
-            error_message = QuoteParser.validate_request(request_json)
+        try:
+            error_reason, error_message = QuoteParser.get_validation_error(request_json)
             error_exist = error_message != ""
+            if trace is not None:
+                trace.mark("validate")
 
             # bad request
             if error_exist:
-                return jsonify(error_message), 400
-            
+                self._count_error(error_reason)
+                return error_message, 400
+
             quote_request = QuoteParser.to_request(request_json)
-            quote_response = service.quote(quote_request)
+            if trace is not None:
+                trace.mark("parse")
+                trace.attributes.update(symbol=quote_request.get_symbol(), action=quote_request.action)
+
+            # quote service marks resolve and fill stages
+            start = time.perf_counter()
+            quote_response = self.service.quote(quote_request)
+
+            # first quote of an unwatched pair waits for its subscription
+            if not isinstance(quote_response, QuoteResponse) and self.watchlist is not None:
+                subscription = self.watchlist.subscribe_missing(quote_request)
+                if subscription is not None:
+                    return QuoteController._then(subscription, lambda: self._to_quote_result(quote_request))
 
-            if isinstance(quote_response, QuoteResponse):
-                response_json = QuoteParser.to_response_json(quote_response)
-                return jsonify(response_json), 200
-            else:
-                return jsonify(quote_response), 400
-        
-        except BadRequest as e:
-            return jsonify(e.description), 400
+            return self._to_quote_result(quote_request, quote_response, start, trace)
 
         except Exception as e:
-            return jsonify("Internal Server Error: " + e), 500
+            return "Internal Server Error: " + str(e), 500
+
+        finally:
+            if trace is not None:
+                self.tracer.finish(trace)
+
+    def _to_quote_result(self, quote_request: QuoteRequest, quote_response=None, start: float = None, trace: Trace = None) -> Tuple[Any, int]:
+        """Response json of quote, quotes request when no response is given"""
+        if quote_response is None:
+            start = time.perf_counter()
+            quote_response = self.service.quote(quote_request)
+
+        if isinstance(quote_response, QuoteResponse):
+            if self.metrics is not None:
+                symbol = quote_request.base_currency.upper() + quote_request.quote_currency.upper()
+                self.metrics.quote_latency.observe(time.perf_counter() - start, symbol, quote_request.action)
+
+            response_json = QuoteParser.to_response_json(quote_response)
+            if trace is not None:
+                trace.mark("serialize")
+            return response_json, 200
+        else:
+            self._count_error("quote_failed")
+            return quote_response, 400
+
+    @staticmethod
+    def _then(future: Future, handler: Callable[[], Tuple]) -> Future:
+        """Future of handler's result once given future completes, handler runs on the thread completing it"""
+        result = Future()
+
+        def on_done(_):
+            try:
+                result.set_result(handler())
+            except Exception as e:
+                result.set_result(("Internal Server Error: " + str(e), 500))
+
+        future.add_done_callback(on_done)
+        return result
+
+    def quotes(self, request_json) -> Tuple[Any, int]:
+        """Calculates best prices for list of QuoteRequests against the same order books.
+        Returns response or error of each request in given order"""
+        try:
+            # bad request
+            if not isinstance(request_json, list):
+                return "Request body must be a list of quote requests", 400
+
+            results = [None] * len(request_json)
+            quote_requests = []
+            quote_indexes = []
+
+            for index, item in enumerate(request_json):
+                error_reason, error_message = QuoteParser.get_validation_error(item) if isinstance(item, dict) \
+                    else ("invalid_request", "Quote request must be an object")
+
+                if error_message != "":
+                    self._count_error(error_reason)
+                    results[index] = {"error": error_message}
+                else:
+                    quote_requests.append(QuoteParser.to_request(item))
+                    quote_indexes.append(index)
+
+            start = time.perf_counter()
+            quote_responses = self.service.quote_batch(quote_requests)
+
+            if self.metrics is not None:
+                self.metrics.quote_batch_latency.observe(time.perf_counter() - start)
+
+            for index, quote_response in zip(quote_indexes, quote_responses):
+                if isinstance(quote_response, QuoteResponse):
+                    results[index] = QuoteParser.to_response_json(quote_response)
+                else:
+                    self._count_error("quote_failed")
+                    results[index] = {"error": quote_response}
+
+            return results, 200
+
+        except Exception as e:
+            return "Internal Server Error: " + str(e), 500
+
+    def price_impact(self, request_json) -> Tuple[Any, int]:
+        """Calculates average price, total and slippage of each amount on one side of a symbol's order book"""
+        try:
+            error_reason, error_message = QuoteParser.get_impact_validation_error(request_json)
+
+            # bad request
+            if error_message != "":
+                self._count_error(error_reason)
+                return error_message, 400
+
+            impact_request = QuoteParser.to_impact_request(request_json)
+            start = time.perf_counter()
+            impact_response = self.service.price_impact(impact_request)
+
+            if isinstance(impact_response, str):
+                self._count_error("quote_failed")
+                return impact_response, 400
+
+            if self.metrics is not None:
+                self.metrics.impact_latency.observe(time.perf_counter() - start, impact_request.symbol)
+
+            return QuoteParser.to_impact_response_json(impact_response), 200
+
+        except Exception as e:
+            return "Internal Server Error: " + str(e), 500
+
+    def ready(self, request_json) -> Tuple[Any, int]:
+        """Readiness of quote service. Ready when any order book is published, including restored stale order books"""
+        order_books = self.service.order_books
+        restored = sorted(symbol for symbol, snapshot in list(order_books.items()) if snapshot.restored)
+        status = 200 if len(order_books) > 0 else 503
+        return {"order_books": len(order_books), "restored": restored}, status
+
+    def get_history(self, request_json) -> Tuple[Any, int]:
+        """Order book of 'symbol' that was latest at unix timestamp 'time' in seconds"""
+        if self.service.history is None:
+            return "Order book history is disabled", 404
+
+        symbol = request_json.get("symbol", "").upper()
+        if symbol == "":
+            return "Missing parameter 'symbol'", 400
+
+        try:
+            at_time = float(request_json.get("time", time.time()))
+            if not math.isfinite(at_time):
+                raise ValueError
+
+        except (TypeError, ValueError):
+            return f"'{request_json['time']}' is not valid time", 400
+
+        history = self.service.history.get_history(symbol)
+        snapshot = history.get_snapshot(at_time) if history is not None else None
+        if snapshot is None:
+            return f"Order book history of '{symbol}' does not reach back to {at_time}", 404
+
+        return QuoteParser.to_order_book_json(snapshot), 200
+
+    def get_traces(self, request_json) -> Tuple[Any, int]:
+        """Latest sampled traces of 'kind' ('quote' or 'feed', all when omitted), at most 'limit' (default 100),
+        and per stage percentiles in seconds over all buffered traces"""
+        if self.tracer is None:
+            return "Tracing is disabled", 404
+
+        kind = request_json.get("kind") or None
+        try:
+            limit = int(request_json.get("limit", 100))
+            if limit < 0:
+                raise ValueError
+
+        except (TypeError, ValueError):
+            return f"'{request_json['limit']}' is not valid limit", 400
+
+        traces = self.tracer.get_traces(kind, limit) if limit > 0 else []
+        return {
+            "sample_rate": self.tracer.sample_rate,
+            "summary": self.tracer.get_summary(kind),
+            "traces": [trace.to_json() for trace in traces]}, 200
+
+    def profile(self, request_json) -> Tuple[Any, int]:
+        """Samples stacks of all threads every 'interval' seconds (default 0.005) for 'seconds' (default 5).
+        Returns collapsed stacks, one 'thread;outer;...;inner count' line per sampled stack"""
+        try:
+            duration = float(request_json.get("seconds", 5))
+            interval = float(request_json.get("interval", 0.005))
+            if not 0 < duration <= SamplingProfiler.max_duration or not 0.0001 <= interval <= 1:
+                raise ValueError
+
+        except (TypeError, ValueError):
+            return f"'seconds' must be in (0, {SamplingProfiler.max_duration}] and 'interval' in [0.0001, 1]", 400
+
+        try:
+            profile: Future = self.profiler.start(duration, interval)
+        except RuntimeError as e:
+            return str(e), 409
+
+        # completes on profiler thread, http servers wait without blocking other requests
+        return QuoteController._then(profile, lambda: (profile.result(), 200, "text/plain; charset=utf-8"))
+
+    def get_symbols(self, request_json) -> Tuple[Any, int]:
+        """Watched symbols and the ones subscribed lazily by quotes"""
+        if self.watchlist is None:
+            return "Runtime subscriptions are disabled", 404
+
+        return {"symbols": self.watchlist.get_symbols(), "lazy": sorted(self.watchlist.lazy_symbols)}, 200
+
+    def update_symbols(self, request_json) -> Tuple[Any, int]:
+        """Subscribes 'subscribe' and unsubscribes 'unsubscribe' symbol lists on open websocket connections.
+        Responds once exchange accepted both"""
+        if self.watchlist is None:
+            return "Runtime subscriptions are disabled", 404
+
+        if not isinstance(request_json, dict):
+            return "Request body must be an object", 400
+
+        changes = {name: request_json.get(name, []) for name in ("subscribe", "unsubscribe")}
+        for name, symbols in changes.items():
+            if not isinstance(symbols, list) or not all(isinstance(symbol, str) and symbol.isalnum() for symbol in symbols):
+                return f"'{name}' must be a list of symbols", 400
+
+        async def update():
+            return await self.watchlist.subscribe(changes["subscribe"]), await self.watchlist.unsubscribe(changes["unsubscribe"])
+
+        update_future = self.watchlist.run(update())
+
+        def to_result():
+            try:
+                subscribed, unsubscribed = update_future.result()
+            except (ValueError, RuntimeError, TimeoutError) as e:
+                return f"Subscription update failed: {e}", 409
+            return {"subscribed": subscribed, "unsubscribed": unsubscribed}, 200
+
+        return QuoteController._then(update_future, to_result)
+
+    def cache_stats(self, request_json) -> Tuple[Any, int]:
+        """Quote cache hit/miss counters"""
+        if self.service.cache is None:
+            return "Quote cache is disabled", 404
+
+        return self.service.cache.get_stats(), 200
+
+    def get_metrics(self, request_json) -> Tuple[Any, int]:
+        """Metrics in Prometheus text format"""
+        if self.metrics is None:
+            return "Metrics are disabled", 404
+
+        return self.metrics.render(), 200, ServiceMetrics.content_type
+
+    def _count_error(self, reason: str):
+        if self.metrics is not None:
+            self.metrics.quote_errors.inc(reason)
+
+
+def create_controller(quote_service:QuoteCalculator, metrics:ServiceMetrics = None, tracer:Tracer = None,
+    watchlist:WatchlistService = None) -> Flask:
+    """Creates controller that handles http request and redirects to quote service"""
+
+    app = Flask(__name__)
+    controller = QuoteController(quote_service, metrics, tracer, watchlist)
+
+    def create_view(handler: Callable[[Any], Tuple[Any, int]]):
+        def view():
+            try:
+                request_json = request.get_json() if request.method == "POST" else request.args.to_dict()
+
+            except BadRequest as e:
+                return jsonify(e.description), 400
+
+            result = handler(request_json)
+
+            # long running handler completes in another thread
+            if isinstance(result, Future):
+                result = result.result()
+
+            # non json response with its content type
+            if len(result) == 3:
+                response, status, content_type = result
+                return Response(response, status, content_type=content_type)
+
+            response_json, status = result
+            return jsonify(response_json), status
+
+        return view
+
+    for (method, path), handler in controller.get_routes().items():
+        app.add_url_rule(path, f"{method} {path}", create_view(handler), methods=[method])
 
-    return app
\ No newline at end of file
+    return app
@@ -0,0 +1,126 @@
+import asyncio, json, websockets
+from typing import Any, Dict, Tuple, Union
+from models.quote import QuoteResponse
+from services.subscription_service import QuoteSubscriptionService, SubscriptionKey, Subscriber
+from utils.quote_parser import QuoteParser
+
+class SubscriptionConnection:
+    """Subscriptions of one websocket client. Results waiting to be sent are replaced by newer results of the same
+    subscription, so a slow client receives latest quotes instead of a growing backlog"""
+
+    def __init__(self, service: QuoteSubscriptionService, websocket):
+        self.service = service
+        self.websocket = websocket
+
+        self.subscriptions: Dict[Any, Tuple[SubscriptionKey, Subscriber]] = {}
+        """Subscription key and subscriber by client given id"""
+
+        self.pending: Dict[Any, dict] = {}
+        """Unsent latest message by subscription id"""
+
+        self.pending_event = asyncio.Event()
+
+    def _push(self, subscription_id, result: Union[QuoteResponse, str]):
+        if isinstance(result, QuoteResponse):
+            message = {"type": "quote", "id": subscription_id, **QuoteParser.to_response_json(result)}
+        else:
+            message = {"type": "error", "id": subscription_id, "error": result}
+
+        self.pending[subscription_id] = message
+        self.pending_event.set()
+
+    def _send(self, message: dict):
+        self.pending[message.get("id")] = message
+        self.pending_event.set()
+
+    def on_message(self, raw_message):
+        """Handles subscribe and unsubscribe messages"""
+        try:
+            message = json.loads(raw_message)
+        except ValueError as e:
+            return self._send({"type": "error", "error": f"Failed to decode JSON object: {e}"})
+
+        if not isinstance(message, dict) or message.get("type") not in ("subscribe", "unsubscribe"):
+            return self._send({"type": "error", "error": "Message type must be 'subscribe' or 'unsubscribe'"})
+
+        subscription_id = message.get("id")
+        if message["type"] == "unsubscribe":
+            self.unsubscribe(subscription_id)
+            return self._send({"type": "unsubscribed", "id": subscription_id})
+
+        request_json = message.get("request")
+        error_message = QuoteParser.validate_request(request_json) if isinstance(request_json, dict) \
+            else "Quote request must be an object"
+
+        if error_message != "":
+            return self._send({"type": "error", "id": subscription_id, "error": error_message})
+
+        # resubscribing an id replaces its request
+        self.unsubscribe(subscription_id)
+
+        # current result is pushed on subscribe
+        subscriber = lambda key, result: self._push(subscription_id, result)
+        key = self.service.subscribe(QuoteParser.to_request(request_json), subscriber)
+        self.subscriptions[subscription_id] = (key, subscriber)
+
+    def unsubscribe(self, subscription_id):
+        subscription = self.subscriptions.pop(subscription_id, None)
+        if subscription is not None:
+            self.service.unsubscribe(*subscription)
+        self.pending.pop(subscription_id, None)
+
+    def close(self):
+        for subscription_id in list(self.subscriptions):
+            self.unsubscribe(subscription_id)
+
+    async def send_pending(self):
+        """Sends waiting messages until connection is closed"""
+        while True:
+            await self.pending_event.wait()
+            self.pending_event.clear()
+
+            while self.pending:
+                subscription_id = next(iter(self.pending))
+                await self.websocket.send(json.dumps(self.pending.pop(subscription_id), separators=(",", ":")))
+
+
+class QuoteSubscriptionServer:
+    """Websocket endpoint of standing quote requests. Clients send
+    {"type": "subscribe", "id": 1, "request": {<quote request>}} and {"type": "unsubscribe", "id": 1}
+    and receive {"type": "quote", "id": 1, <quote response>} or {"type": "error", "id": 1, "error": <message>}
+    whenever the result of subscription changes"""
+
+    def __init__(self, service: QuoteSubscriptionService, host: str = "0.0.0.0", port: int = 5001):
+        self.service = service
+        self.host = host
+        self.port = port
+        self.server = None
+
+    async def _serve(self, websocket):
+        connection = SubscriptionConnection(self.service, websocket)
+        send_task = asyncio.create_task(connection.send_pending())
+
+        try:
+            async for raw_message in websocket:
+                connection.on_message(raw_message)
+
+        except websockets.ConnectionClosed:
+            pass
+
+        finally:
+            connection.close()
+            send_task.cancel()
+
+    async def start(self):
+        """Starts listening port"""
+        self.server = await websockets.serve(self._serve, self.host, self.port)
+
+        # resolves port when an ephemeral port (0) is given
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        """Stops listening port and closes connections"""
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
@@ -1,5 +1,12 @@
+from array import array
+from bisect import bisect_left
 from dataclasses import dataclass, field
-from typing import List
+from decimal import Decimal, ROUND_HALF_EVEN
+from heapq import merge
+from itertools import accumulate, islice, repeat
+from operator import itemgetter, mul
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
 
 @dataclass
 class LimitOrder:
@@ -7,8 +14,466 @@ class LimitOrder:
     price: float
     quantity: float
 
+@dataclass(frozen=True)
+class OrderBookChange:
+    """Parts of an order book that changed since previous order book of its symbol from the same source"""
+    bids: bool
+    asks: bool
+    top: bool
+    """Best bid or best ask level changed"""
+
+    def is_changed(self) -> bool:
+        return self.bids or self.asks
+
+UNCHANGED = OrderBookChange(False, False, False)
+"""Order book with the same levels as previous one, only its receive time is new"""
+
 @dataclass
 class LimitOrderBook:
     symbol: str
     bids: List[LimitOrder] = field(default_factory=list)
-    asks: List[LimitOrder] = field(default_factory=list)
\ No newline at end of file
+    asks: List[LimitOrder] = field(default_factory=list)
+    event_time: Optional[int] = None
+    """Exchange event time in milliseconds, None when exchange does not provide it"""
+    received_time: Optional[float] = None
+    """Local receive time as unix timestamp in seconds"""
+    venue: Optional[str] = None
+    """Name of exchange that order book is received from, None when there is a single venue"""
+    change: Optional[OrderBookChange] = None
+    """Changed sides since previous order book of symbol, None when it is not known and every side may have changed"""
+
+
+class PriceLevels(Sequence[LimitOrder]):
+    """One side of an order book stored as contiguous price/quantity arrays
+    with cumulative quantity and cumulative volume (quantity*price) precomputed"""
+
+    __slots__ = ("prices", "quantities", "cumulative_quantities", "cumulative_volumes")
+
+    def __init__(self, prices: Sequence[float], quantities: Sequence[float]):
+        self.prices = array('d', prices)
+        """Price of each level, best price first"""
+
+        self.quantities = array('d', quantities)
+        """Total offered quantity of each level"""
+
+        self.cumulative_quantities = array('d', accumulate(self.quantities))
+        """Total quantity from best level up to and including each level"""
+
+        self.cumulative_volumes = array('d', accumulate(map(mul, self.prices, self.quantities)))
+        """Total quantity*price from best level up to and including each level"""
+
+    @staticmethod
+    def of(orders: Sequence[LimitOrder]) -> "PriceLevels":
+        """Converts limit orders to price levels. Returns given orders if already converted"""
+        if isinstance(orders, PriceLevels):
+            return orders
+
+        return PriceLevels([order.price for order in orders], [order.quantity for order in orders])
+
+    @staticmethod
+    def from_raw(raw: List[List[str]]) -> "PriceLevels":
+        """Converts received [price, quantity] string pairs to price levels"""
+        return PriceLevels([float(price) for price, _ in raw], [float(quantity) for _, quantity in raw])
+
+    @staticmethod
+    def wrap(prices: Sequence[float], quantities: Sequence[float],
+        cumulative_quantities: Sequence[float], cumulative_volumes: Sequence[float]) -> "PriceLevels":
+        """Creates price levels over already computed arrays without copying them (e.g. shared memory views)"""
+        levels = PriceLevels.__new__(PriceLevels)
+        levels.prices = prices
+        levels.quantities = quantities
+        levels.cumulative_quantities = cumulative_quantities
+        levels.cumulative_volumes = cumulative_volumes
+        return levels
+
+    def __len__(self) -> int:
+        return len(self.prices)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [LimitOrder(price, quantity) for price, quantity in zip(self.prices[index], self.quantities[index])]
+
+        return LimitOrder(self.prices[index], self.quantities[index])
+
+    def _fill_at(self, level: int, amount: float, by_volume: bool) -> Tuple[float, float]:
+        """Fills given amount whose last partially filled level is given level. Returns filled (quantity, volume)"""
+
+        # completely filled levels before the last one
+        filled_quantity = self.cumulative_quantities[level - 1] if level > 0 else 0
+        filled_volume = self.cumulative_volumes[level - 1] if level > 0 else 0
+
+        # last level partially filled
+        if by_volume:
+            volume_left = amount - filled_volume
+            return filled_quantity + volume_left / self.prices[level], amount
+        else:
+            quantity_left = amount - filled_quantity
+            return amount, filled_volume + quantity_left * self.prices[level]
+
+    def fill(self, amount: float, by_volume=False) -> Optional[Tuple[float, float]]:
+        """Fills given quantity, or volume (quantity*price) when by_volume, starting from best level.
+        Returns filled (quantity, volume) or None if levels are not liquid enough"""
+        cumulative = self.cumulative_volumes if by_volume else self.cumulative_quantities
+
+        # first level where cumulative amount covers requested amount
+        level = bisect_left(cumulative, amount)
+        if level == len(cumulative):
+            return None
+
+        return self._fill_at(level, amount, by_volume)
+
+    def fill_many(self, amounts: Sequence[float], by_volume=False) -> List[Optional[Tuple[float, float]]]:
+        """Fills each of given amounts with a single pass over levels.
+        Returns filled (quantity, volume) or None for each amount in given order"""
+        cumulative = self.cumulative_volumes if by_volume else self.cumulative_quantities
+        levels = len(cumulative)
+        fills = [None] * len(amounts)
+
+        # amounts are visited in ascending order so level index only moves forward
+        level = 0
+        for index in sorted(range(len(amounts)), key=amounts.__getitem__):
+            amount = amounts[index]
+
+            while level < levels and cumulative[level] < amount:
+                level += 1
+
+            # remaining amounts are larger than total liquidity
+            if level == levels:
+                break
+
+            fills[index] = self._fill_at(level, amount, by_volume)
+
+        return fills
+
+
+class RawPriceLevels(PriceLevels):
+    """Price levels kept as received raw [price, quantity] string pairs.
+    Numeric and cumulative arrays are materialized on first read"""
+
+    __slots__ = ("raw",)
+
+    def __init__(self, raw: List[List[str]]):
+        self.raw = raw
+        """Received levels, None after materialized"""
+
+    def __getattr__(self, name: str):
+        # called only while array slots are not assigned yet
+        raw = self.raw
+        if raw is None or name not in PriceLevels.__slots__:
+            raise AttributeError(name)
+
+        PriceLevels.__init__(self, [float(price) for price, _ in raw], [float(quantity) for _, quantity in raw])
+        self.raw = None
+        return getattr(self, name)
+
+    def is_materialized(self) -> bool:
+        return self.raw is None
+
+    def __len__(self) -> int:
+        raw = self.raw
+        return len(raw) if raw is not None else len(self.prices)
+
+
+class VenuePriceLevels(PriceLevels):
+    """Price levels of several venues merged best price first. Levels of different venues at the same price
+    are kept separate so that fills can be split by venue"""
+
+    __slots__ = ("venues", "venue_names")
+
+    def __init__(self, prices: Sequence[float], quantities: Sequence[float], venues: Sequence[int], venue_names: List[str]):
+        super().__init__(prices, quantities)
+        self.venues = array('H', venues)
+        """Venue index of each level"""
+
+        self.venue_names = venue_names
+        """Venue name by index"""
+
+    @staticmethod
+    def merge(sides: Dict[str, PriceLevels], descending: bool) -> "VenuePriceLevels":
+        """K-way merges sorted levels of each venue. Bids are merged descending, asks ascending"""
+        venue_names = list(sides)
+        levels = [zip(side.prices, side.quantities, repeat(index)) for index, side in enumerate(sides.values())]
+
+        # inputs are already sorted, ties keep venue order
+        merged = list(merge(*levels, key=itemgetter(0), reverse=descending))
+        if not merged:
+            return VenuePriceLevels([], [], [], venue_names)
+
+        prices, quantities, venues = zip(*merged)
+        return VenuePriceLevels(prices, quantities, venues, venue_names)
+
+    def fill_by_venue(self, amount: float, by_volume=False) -> Optional[Dict[str, Tuple[float, float]]]:
+        """Fills like fill and splits filled (quantity, volume) by venue. Returns None if levels are not liquid enough"""
+        fill = self.fill(amount, by_volume)
+        if fill is None:
+            return None
+
+        cumulative = self.cumulative_volumes if by_volume else self.cumulative_quantities
+        level = bisect_left(cumulative, amount)
+        fills: Dict[str, Tuple[float, float]] = {}
+
+        def add(index: int, quantity: float, volume: float):
+            venue = self.venue_names[self.venues[index]]
+            filled_quantity, filled_volume = fills.get(venue, (0, 0))
+            fills[venue] = (filled_quantity + quantity, filled_volume + volume)
+
+        for index in range(level):
+            add(index, self.quantities[index], self.quantities[index] * self.prices[index])
+
+        # last level partially filled
+        quantity, volume = fill
+        add(level,
+            quantity - (self.cumulative_quantities[level - 1] if level > 0 else 0),
+            volume - (self.cumulative_volumes[level - 1] if level > 0 else 0))
+
+        return fills
+
+
+def to_scaled_int(raw: str, decimals: int) -> int:
+    """Converts a decimal string to an integer of given decimals without float rounding, e.g. '2000.01000000', 2 -> 200001.
+    Digits beyond given decimals are truncated"""
+    whole, _, fraction = raw.partition(".")
+    return int(whole + fraction[:decimals].ljust(decimals, "0"))
+
+def get_decimals(step: str) -> int:
+    """Number of decimals of a tick or step size string, e.g. '0.01000000' -> 2"""
+    fraction = step.partition(".")[2].rstrip("0")
+    return len(fraction)
+
+
+class FixedPointPriceLevels(PriceLevels):
+    """Price levels stored as integers scaled by symbol's tick and step size. Fills are computed in integer
+    arithmetic and returned as exact Decimals. Prices, quantities and cumulative quantities are packed int64 arrays,
+    cumulative volumes are unbounded integers since price*quantity may exceed int64"""
+
+    __slots__ = ("price_decimals", "quantity_decimals")
+
+    def __init__(self, prices: Sequence[int], quantities: Sequence[int], price_decimals: int, quantity_decimals: int):
+        self.prices = array('q', prices)
+        """Price of each level in price ticks"""
+
+        self.quantities = array('q', quantities)
+        """Quantity of each level in quantity steps"""
+
+        self.cumulative_quantities = array('q', accumulate(self.quantities))
+        self.cumulative_volumes = list(accumulate(map(mul, self.prices, self.quantities)))
+        """Cumulative quantity*price scaled by price decimals + quantity decimals"""
+
+        self.price_decimals = price_decimals
+        self.quantity_decimals = quantity_decimals
+
+    @staticmethod
+    def from_raw(raw: List[List[str]], price_decimals: int, quantity_decimals: int) -> "FixedPointPriceLevels":
+        """Converts received [price, quantity] string pairs to scaled integers"""
+        return FixedPointPriceLevels(
+            [to_scaled_int(price, price_decimals) for price, _ in raw],
+            [to_scaled_int(quantity, quantity_decimals) for _, quantity in raw],
+            price_decimals, quantity_decimals)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[level] for level in range(*index.indices(len(self)))]
+
+        return LimitOrder(
+            float(Decimal(self.prices[index]).scaleb(-self.price_decimals)),
+            float(Decimal(self.quantities[index]).scaleb(-self.quantity_decimals)))
+
+    def _to_int(self, amount, decimals: int) -> int:
+        """Scales requested amount, amounts finer than symbol's precision are rounded to it"""
+        amount = amount if isinstance(amount, Decimal) else Decimal(repr(amount))
+        return int(amount.scaleb(decimals).to_integral_value(ROUND_HALF_EVEN))
+
+    def fill(self, amount, by_volume=False) -> Optional[Tuple[Decimal, Decimal]]:
+        volume_decimals = self.price_decimals + self.quantity_decimals
+
+        if by_volume:
+            amount = self._to_int(amount, volume_decimals)
+            level = bisect_left(self.cumulative_volumes, amount)
+        else:
+            amount = self._to_int(amount, self.quantity_decimals)
+            level = bisect_left(self.cumulative_quantities, amount)
+
+        if level == len(self.prices):
+            return None
+
+        # completely filled levels before the last one
+        filled_quantity = self.cumulative_quantities[level - 1] if level > 0 else 0
+        filled_volume = self.cumulative_volumes[level - 1] if level > 0 else 0
+
+        # last level partially filled, quantity of a partial volume is rounded down to quantity step
+        if by_volume:
+            quantity, volume = filled_quantity + (amount - filled_volume) // self.prices[level], amount
+        else:
+            quantity, volume = amount, filled_volume + (amount - filled_quantity) * self.prices[level]
+
+        return Decimal(quantity).scaleb(-self.quantity_decimals), Decimal(volume).scaleb(-volume_decimals)
+
+    def fill_many(self, amounts, by_volume=False) -> List[Optional[Tuple[Decimal, Decimal]]]:
+        return [self.fill(amount, by_volume) for amount in amounts]
+
+    def round_price(self, price: Decimal) -> Decimal:
+        """Rounds an average price to symbol's tick precision"""
+        return price.quantize(Decimal(1).scaleb(-self.price_decimals), ROUND_HALF_EVEN)
+
+
+@dataclass(frozen=True)
+class OrderBookSnapshot:
+    """Immutable published version of a symbol's order book. 
+    Replaced as a whole on each update so readers never see a partially updated book"""
+    symbol: str
+    bids: PriceLevels
+    asks: PriceLevels
+    version: int
+    """Monotonically increasing sequence number per symbol"""
+    event_time: Optional[int]
+    """Exchange event time in milliseconds, None when exchange does not provide it"""
+    received_time: float
+    """Local receive time as unix timestamp in seconds"""
+    restored: bool = False
+    """Loaded from persisted order books of a previous run and not updated since"""
+
+    def get_age(self, now: float = None) -> float:
+        """Seconds passed since order book received"""
+        return (now if now is not None else time.time()) - self.received_time
+
+
+@dataclass
+class OrderBookUpdate:
+    """Incremental price level changes of an order book between two update ids.
+    Levels are (price, quantity) pairs, zero quantity removes the price level"""
+    symbol: str
+    first_update_id: int
+    last_update_id: int
+    bids: List[Tuple[float, float]] = field(default_factory=list)
+    asks: List[Tuple[float, float]] = field(default_factory=list)
+    event_time: Optional[int] = None
+    """Exchange event time in milliseconds"""
+
+
+class SortedPriceLevels:
+    """Mutable order book side kept sorted best price first. Publishing copies levels to immutable price levels
+    incrementally: an unchanged side is published as is, and a changed side copies arrays and cumulative sums
+    of levels above its first changed level from its previous publish and recomputes only the rest"""
+
+    __slots__ = ("keys", "quantities", "descending", "changed_from", "published")
+
+    def __init__(self, descending=False):
+        self.keys: List[float] = []
+        """Ascending sort keys of levels. Negated prices when sorted descending"""
+
+        self.quantities: List[float] = []
+        """Quantity of each level, parallel to keys"""
+
+        self.descending = descending
+        """Best price is highest price (bids)"""
+
+        self.changed_from: Optional[int] = 0
+        """Index of best level changed since last publish, None when side is unchanged"""
+
+        self.published: Optional[PriceLevels] = None
+        """Price levels of last publish"""
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def clear(self):
+        self.keys.clear()
+        self.quantities.clear()
+        self.changed_from = 0
+        self.published = None
+
+    def _mark_changed(self, index: int):
+        if self.changed_from is None or index < self.changed_from:
+            self.changed_from = index
+
+    def update(self, price: float, quantity: float):
+        """Sets absolute quantity of price level. Removes level when quantity is zero"""
+        key = -price if self.descending else price
+        index = bisect_left(self.keys, key)
+        exists = index < len(self.keys) and self.keys[index] == key
+
+        if quantity == 0:
+            if exists:
+                del self.keys[index]
+                del self.quantities[index]
+                self._mark_changed(index)
+        elif exists:
+            if self.quantities[index] != quantity:
+                self.quantities[index] = quantity
+                self._mark_changed(index)
+        else:
+            # memmove of a few thousand slots, cheaper than a tree of python objects at order book depths
+            self.keys.insert(index, key)
+            self.quantities.insert(index, quantity)
+            self._mark_changed(index)
+
+    def is_changed(self) -> bool:
+        """Checks wether levels changed since last publish"""
+        return self.changed_from is not None
+
+    def to_price_levels(self) -> PriceLevels:
+        """Publishes current levels as immutable price levels, built incrementally from previous publish"""
+        previous = self.published
+        if previous is not None and self.changed_from is None:
+            return previous
+
+        start = self.changed_from if previous is not None else 0
+        keys = self.keys[start:]
+        tail_prices = [-key for key in keys] if self.descending else keys
+        tail_quantities = self.quantities[start:]
+
+        # array slices are copied in C, only levels from first changed one are summed again
+        prices, quantities, cumulative_quantities, cumulative_volumes = (values[:start] for values in (
+            previous.prices, previous.quantities, previous.cumulative_quantities, previous.cumulative_volumes)) \
+            if previous is not None else (array('d') for _ in range(4))
+
+        prices.extend(tail_prices)
+        quantities.extend(tail_quantities)
+        cumulative_quantities.extend(islice(accumulate(tail_quantities,
+            initial=cumulative_quantities[-1] if start else 0), 1, None))
+        cumulative_volumes.extend(islice(accumulate(map(mul, tail_prices, tail_quantities),
+            initial=cumulative_volumes[-1] if start else 0), 1, None))
+
+        self.published = PriceLevels.wrap(prices, quantities, cumulative_quantities, cumulative_volumes)
+        self.changed_from = None
+        return self.published
+
+
+class LocalOrderBook:
+    """Full depth order book maintained locally from a snapshot and incremental updates"""
+
+    def __init__(self, symbol: str):
+        self.symbol = symbol
+
+        self.last_update_id = 0
+        """Id of last applied update"""
+
+        self.event_time: Optional[int] = None
+        """Exchange event time of last applied update in milliseconds"""
+
+        self.bids = SortedPriceLevels(descending=True)
+        self.asks = SortedPriceLevels()
+
+    def apply(self, update: OrderBookUpdate):
+        """Applies incremental price level changes"""
+        for price, quantity in update.bids:
+            self.bids.update(price, quantity)
+
+        for price, quantity in update.asks:
+            self.asks.update(price, quantity)
+
+        self.last_update_id = update.last_update_id
+        self.event_time = update.event_time
+
+    def reset(self, snapshot: OrderBookUpdate):
+        """Replaces all levels with given full snapshot"""
+        self.bids.clear()
+        self.asks.clear()
+        self.apply(snapshot)
+
+    def to_order_book(self) -> LimitOrderBook:
+        """Publishes current levels as an order book with its changed sides since last publish"""
+        change = OrderBookChange(self.bids.is_changed(), self.asks.is_changed(),
+            self.bids.changed_from == 0 or self.asks.changed_from == 0)
+        return LimitOrderBook(self.symbol, self.bids.to_price_levels(), self.asks.to_price_levels(), self.event_time,
+            change=change)
@@ -1,4 +1,5 @@
 from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
 
 @dataclass
 class QuoteRequest:
@@ -6,6 +7,18 @@ class QuoteRequest:
     base_currency: str
     quote_currency: str
     amount: str
+    min_version: Optional[int] = None
+    """Minimum accepted order book version"""
+    max_age: Optional[float] = None
+    """Maximum accepted order book age in seconds"""
+    venue_breakdown: bool = False
+    """Splits response by venue when order book is consolidated from several venues"""
+    allow_stale: bool = False
+    """Accepts order books restored from a previous run before their first update, within max age"""
+    window: Optional[float] = None
+    """Seconds of order book history that fill is averaged over. Latest order book only when None"""
+    window_average: str = "twap"
+    """'twap' weights order books of window by seconds they were live, 'snapshot' weights each order book equally"""
 
     def get_symbol(self, reversed=False):
        symbol = self.quote_currency + self.base_currency if reversed \
@@ -18,4 +31,48 @@ class QuoteRequest:
 class QuoteResponse:
     total: str
     price: str
-    currency: str
\ No newline at end of file
+    currency: str
+    version: Optional[int] = None
+    """Version of order book that quote is priced against"""
+    route: Optional[Dict[str, int]] = None
+    """Versions of order books by symbol in conversion order when quote is priced through intermediate currencies"""
+    venues: Optional[Dict[str, Tuple[float, float]]] = None
+    """Filled (amount, total) by venue when requested on a consolidated order book"""
+    stale_age: Optional[float] = None
+    """Age in seconds of the oldest restored order book that quote is priced against, None when all are updated"""
+    snapshots: Optional[int] = None
+    """Number of order books averaged by a windowed quote"""
+
+@dataclass
+class PriceImpactRequest:
+    symbol: str
+    action: str
+    amounts: List[float]
+    """Base currency quantities to fill, each one a point of the curve"""
+    min_version: Optional[int] = None
+    """Minimum accepted order book version"""
+    max_age: Optional[float] = None
+    """Maximum accepted order book age in seconds"""
+
+
+@dataclass
+class PriceImpactPoint:
+    amount: float
+    total: Optional[float] = None
+    """Quote currency total of filling amount, None when order book is not liquid enough"""
+    price: Optional[float] = None
+    """Average fill price"""
+    slippage: Optional[float] = None
+    """Relative difference of average price to top of book price, positive when worse"""
+
+
+@dataclass
+class PriceImpactResponse:
+    symbol: str
+    action: str
+    top_price: float
+    """Best price of filled side"""
+    points: List[PriceImpactPoint]
+    """Fill of each requested amount in given order"""
+    version: Optional[int] = None
+    """Version of order book that curve is priced against"""
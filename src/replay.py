@@ -0,0 +1,103 @@
+"""Replays a recorded feed log from a local websocket stand-in.
+
+Serve a recording to a quote server whose client connects to ws://127.0.0.1:<port>
+    python src/replay.py feed.log --speed 10 --port 9443
+
+Measure ingestion throughput and order book staleness of an unmodified Binance client
+    python src/replay.py feed.log --max-speed --measure
+"""
+import argparse, asyncio, json, time
+from typing import List
+from models.order_book import LimitOrderBook
+from services.exchange_service import BinanceSpotWebSocketClient
+from services.feed_replay import FeedReplayServer
+from services.price_service import OrderBookObserver
+from services.quote_service import QuoteService
+from utils.exchange_parser import BinanceSpotWebSocketMessageParser
+from utils.feed_recorder import read_feed
+
+class StalenessObserver(OrderBookObserver):
+    """Measures seconds between frame receive and order book publish"""
+
+    def __init__(self):
+        self.count = 0
+        self.staleness: List[float] = []
+
+    def on_order_book_received(self, order_book: LimitOrderBook):
+        self.count += 1
+        self.staleness.append(time.time() - order_book.received_time)
+
+def get_recorded_symbols(path: str) -> List[str]:
+    """Symbols of recorded streams"""
+    parser = BinanceSpotWebSocketMessageParser()
+    symbols = set()
+
+    for _, message in read_feed(path):
+        stream_name = parser.get_stream_key(message) or json.loads(message).get("stream", "")
+        if stream_name:
+            symbols.add(stream_name.split("@")[0].upper())
+
+    return sorted(symbols)
+
+async def measure(replay_server: FeedReplayServer, path: str, conflate: bool) -> dict:
+    """Replays log to a Binance client feeding a quote service"""
+    client = BinanceSpotWebSocketClient()
+    client.base_uri = replay_server.get_uri()
+    client.set_symbols(get_recorded_symbols(path))
+    client.set_conflation(conflate)
+
+    observer = StalenessObserver()
+    client.observers.extend([QuoteService(), observer])
+
+    start = time.perf_counter()
+    await client.start()
+    await replay_server.finished.wait()
+
+    # let processing catch up with received frames
+    while client.stats.processed + client.stats.conflated < replay_server.sent_frames:
+        await asyncio.sleep(0.01)
+
+    elapsed = time.perf_counter() - start
+    await client.stop()
+
+    staleness = sorted(observer.staleness) or [0]
+    return {
+        "frames": replay_server.sent_frames,
+        "order_books": observer.count,
+        "conflated": client.stats.conflated,
+        "seconds": elapsed,
+        "frames_per_sec": replay_server.sent_frames / elapsed,
+        "staleness_p50_ms": staleness[len(staleness) // 2] * 1e3,
+        "staleness_p99_ms": staleness[int(len(staleness) * 0.99)] * 1e3,
+        "staleness_max_ms": staleness[-1] * 1e3,
+    }
+
+async def main():
+    parser = argparse.ArgumentParser(description="Feed log replay")
+    parser.add_argument("path", help="Feed log path, rotated files are read in order")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay speed multiplier")
+    parser.add_argument("--max-speed", action="store_true", help="Replay without waiting recorded intervals")
+    parser.add_argument("--port", type=int, default=0, help="Served websocket port")
+    parser.add_argument("--measure", action="store_true", help="Replay to a local client and print ingestion measurements")
+    parser.add_argument("--conflate", action="store_true", help="Enables client conflation while measuring")
+    args = parser.parse_args()
+
+    replay_server = FeedReplayServer(args.path, None if args.max_speed else args.speed)
+    replay_server.port = args.port
+    await replay_server.start()
+    print(f"Replaying at {replay_server.get_uri()}")
+
+    try:
+        if args.measure:
+            print(json.dumps(await measure(replay_server, args.path, args.conflate), indent=2))
+        else:
+            await asyncio.Event().wait()
+    finally:
+        await replay_server.stop()
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,79 @@
+import time
+from dataclasses import replace
+from typing import Dict, List, Tuple
+from models.order_book import LimitOrderBook, PriceLevels, VenuePriceLevels
+from services.price_service import OrderBookObserver
+
+class OrderBookConsolidator(OrderBookObserver):
+    """Keeps latest order book of each venue and publishes one consolidated book per symbol.
+    On each venue update the sorted levels of all venues are k-way merged once, so quotes fill
+    across venues at best combined prices without sorting per request"""
+
+    def __init__(self):
+        self.observers: List[OrderBookObserver] = []
+        """Observers of consolidated order books"""
+
+        self.venue_books: Dict[str, Dict[str, LimitOrderBook]] = {}
+        """Latest order book by venue by symbol"""
+
+        self.max_venue_age: float = None
+        """Seconds after which a venue's order book is left out of consolidation. Never when None"""
+
+        self.consolidated_books: Dict[str, Tuple[Tuple[str, ...], LimitOrderBook]] = {}
+        """(merged venues, latest consolidated order book) by symbol"""
+
+    def set_max_venue_age(self, max_venue_age: float):
+        """Leaves out venues whose latest order book is older than given seconds, e.g. a disconnected venue"""
+        self.max_venue_age = max_venue_age
+
+    def on_order_book_received(self, order_book: LimitOrderBook):
+        venue_books = self.venue_books.setdefault(order_book.symbol, {})
+        venue_book = venue_books.get(order_book.venue)
+        change = order_book.change
+
+        # unchanged venue levels are kept, only receive time is renewed
+        if venue_book is not None and change is not None and not change.is_changed():
+            venue_book.event_time = order_book.event_time
+            venue_book.received_time = order_book.received_time
+        else:
+            venue_books[order_book.venue] = LimitOrderBook(
+                order_book.symbol,
+                PriceLevels.of(order_book.bids),
+                PriceLevels.of(order_book.asks),
+                order_book.event_time,
+                order_book.received_time,
+                order_book.venue)
+
+        now = time.time()
+        books = [book for book in venue_books.values()
+            if self.max_venue_age is None or book.received_time is None or now - book.received_time <= self.max_venue_age]
+
+        # a venue's change is the consolidated change while the same venues are merged
+        venues = tuple(book.venue for book in books)
+        previous_venues, previous = self.consolidated_books.get(order_book.symbol, ((), None))
+        if previous is None or venues != previous_venues:
+            change = None
+
+        if change is not None and not change.is_changed():
+            consolidated = LimitOrderBook(order_book.symbol, previous.bids, previous.asks,
+                order_book.event_time, order_book.received_time, change=change)
+        else:
+            consolidated = LimitOrderBook(
+                order_book.symbol,
+                VenuePriceLevels.merge({book.venue: book.bids for book in books}, descending=True),
+                VenuePriceLevels.merge({book.venue: book.asks for book in books}, descending=False),
+                order_book.event_time,
+                order_book.received_time)
+            self.consolidated_books[order_book.symbol] = (venues, consolidated)
+
+            # top of a venue may move below best level of another venue
+            if change is not None:
+                consolidated.change = replace(change, top=OrderBookConsolidator._is_top_changed(previous, consolidated))
+
+        for observer in self.observers:
+            observer.on_order_book_received(consolidated)
+
+    @staticmethod
+    def _is_top_changed(previous: LimitOrderBook, current: LimitOrderBook) -> bool:
+        return any(levels.prices[:1] != previous_levels.prices[:1] or levels.quantities[:1] != previous_levels.quantities[:1]
+            for levels, previous_levels in ((current.bids, previous.bids), (current.asks, previous.asks)))
@@ -0,0 +1,143 @@
+import asyncio, json
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote
+from urllib.request import urlopen
+from models.order_book import LimitOrderBook, LocalOrderBook, OrderBookUpdate, get_decimals
+
+class OrderBookSnapshotProvider(ABC):
+    """Provides full depth order book snapshots to initialize local order books"""
+
+    @abstractmethod
+    async def get_snapshot(self, symbol: str) -> dict:
+        """Gets raw json snapshot of given symbol's order book"""
+        pass
+
+
+class BinanceSpotSnapshotProvider(OrderBookSnapshotProvider):
+    """Gets order book snapshots from Binance - Spot Markets REST api"""
+
+    def __init__(self, limit=5000):
+        self.uri = "https://api.binance.com/api/v3/depth"
+        """REST endpoint of order book snapshots"""
+
+        self.limit = limit
+        """Snapshot depth"""
+
+    def _get(self, symbol: str) -> dict:
+        with urlopen(f"{self.uri}?symbol={symbol.upper()}&limit={self.limit}") as response:
+            return json.loads(response.read())
+
+    async def get_snapshot(self, symbol: str) -> dict:
+        # blocking http call is moved out of event loop
+        return await asyncio.to_thread(self._get, symbol)
+
+
+class SymbolPrecisionProvider(ABC):
+    """Provides price and quantity precision of symbols for fixed point order books"""
+
+    @abstractmethod
+    async def get_precisions(self, symbols: List[str]) -> Dict[str, Tuple[int, int]]:
+        """Gets (price decimals, quantity decimals) by symbol"""
+        pass
+
+
+class BinanceSpotPrecisionProvider(SymbolPrecisionProvider):
+    """Gets tick and step sizes from Binance - Spot Markets exchange info"""
+
+    def __init__(self):
+        self.uri = "https://api.binance.com/api/v3/exchangeInfo"
+        """REST endpoint of symbol rules"""
+
+    def _get(self, symbols: List[str]) -> dict:
+        symbol_list = json.dumps([symbol.upper() for symbol in symbols], separators=(",", ":"))
+        with urlopen(f"{self.uri}?symbols={quote(symbol_list)}") as response:
+            return json.loads(response.read())
+
+    @staticmethod
+    def parse_precisions(exchange_info: dict) -> Dict[str, Tuple[int, int]]:
+        """Reads decimals of PRICE_FILTER tick size and LOT_SIZE step size of each symbol"""
+        precisions = {}
+
+        for symbol_info in exchange_info.get("symbols", []):
+            filters = {symbol_filter["filterType"]: symbol_filter for symbol_filter in symbol_info.get("filters", [])}
+            if "PRICE_FILTER" in filters and "LOT_SIZE" in filters:
+                precisions[symbol_info["symbol"]] = (
+                    get_decimals(filters["PRICE_FILTER"]["tickSize"]),
+                    get_decimals(filters["LOT_SIZE"]["stepSize"]))
+
+        return precisions
+
+    async def get_precisions(self, symbols: List[str]) -> Dict[str, Tuple[int, int]]:
+        # blocking http call is moved out of event loop
+        return BinanceSpotPrecisionProvider.parse_precisions(await asyncio.to_thread(self._get, symbols))
+
+
+class LocalOrderBookSynchronizer:
+    """Keeps a local order book in sync with a diff depth stream.
+    Buffers updates until a snapshot is loaded, checks update id sequence and resyncs on gaps"""
+
+    def __init__(self, symbol: str):
+        self.order_book = LocalOrderBook(symbol)
+        """Local full depth order book"""
+
+        self.buffer: List[OrderBookUpdate] = []
+        """Updates received while waiting for snapshot"""
+
+        self.synced = False
+        """Order book is initialized by a snapshot and all later updates are applied"""
+
+        self.loading = False
+        """A snapshot request is in progress"""
+
+    def needs_snapshot(self) -> bool:
+        """Checks wether a snapshot should be requested"""
+        return not self.synced and not self.loading and len(self.buffer) > 0
+
+    def _resync(self, update: OrderBookUpdate):
+        """Drops local state and starts buffering from given update"""
+        self.synced = False
+        self.buffer = [update]
+
+    def on_update(self, update: OrderBookUpdate) -> Optional[LimitOrderBook]:
+        """Applies received update. Returns changed order book or None if book is not synced"""
+
+        if not self.synced:
+            self.buffer.append(update)
+            return None
+
+        # already applied by snapshot
+        if update.last_update_id <= self.order_book.last_update_id:
+            return None
+
+        # missed updates in between, local order book is no longer valid
+        if update.first_update_id != self.order_book.last_update_id + 1:
+            self._resync(update)
+            return None
+
+        self.order_book.apply(update)
+        return self.order_book.to_order_book()
+
+    def on_snapshot(self, snapshot: OrderBookUpdate) -> Optional[LimitOrderBook]:
+        """Initializes local order book with snapshot and applies buffered updates.
+        Returns order book or None if snapshot does not connect to buffered updates"""
+
+        # drop updates already contained in snapshot
+        buffer = [update for update in self.buffer if update.last_update_id > snapshot.last_update_id]
+
+        # snapshot is older than first buffered update, a newer snapshot is required
+        if buffer and buffer[0].first_update_id > snapshot.last_update_id + 1:
+            return None
+
+        self.order_book.reset(snapshot)
+
+        for update in buffer:
+            if update.first_update_id > self.order_book.last_update_id + 1:
+                self._resync(update)
+                return None
+
+            self.order_book.apply(update)
+
+        self.buffer = []
+        self.synced = True
+        return self.order_book.to_order_book()
@@ -1,12 +1,46 @@
 import asyncio, websockets
 from abc import ABC, abstractmethod
-import json
+import json, random, time
 from json import JSONDecodeError
 from websockets import WebSocketClientProtocol
 from asyncio import Task
-from typing import List
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, List, Set, Tuple
+from models.order_book import LimitOrderBook, OrderBookChange, UNCHANGED
 from services.price_service import OrderBookObserver
-from utils.exchange_parser import ExchangeWebSocketMessageParser, BinanceSpotWebSocketMessageParser
+from services.depth_service import OrderBookSnapshotProvider, BinanceSpotSnapshotProvider, LocalOrderBookSynchronizer
+from utils.exchange_parser import ExchangeWebSocketMessageParser, BinanceSpotWebSocketMessageParser, JsonDecoder
+from utils.feed_recorder import FeedRecorder
+from services.metrics_service import ServiceMetrics
+from services.tracing_service import Tracer, Trace, current_trace
+
+@dataclass
+class IngestionStats:
+    """Counters of received and processed websocket messages"""
+    received: int = 0
+    processed: int = 0
+    conflated: int = 0
+    """Messages dropped because a newer message of the same stream arrived before processing"""
+    last_lag: float = 0
+    """Seconds between receive and processing of last processed message"""
+    max_lag: float = 0
+    """Maximum seconds between receive and processing"""
+    reconnects: int = 0
+    """Reconnections after connection errors"""
+    duplicates: int = 0
+    """Messages dropped because a redundant connection delivered them first"""
+    unchanged: int = 0
+    """Order books with the same levels as previous order book of their symbol, published without conversion"""
+
+
+@dataclass
+class PendingRequest:
+    """Control request waiting for responses of the connections it is sent to"""
+    future: asyncio.Future
+    remaining: int = 0
+    """Connections that did not respond yet"""
+
 
 class ExchangeWebSocketClient(ABC):
     """Manages websocket connection to stock exchange"""
@@ -15,6 +49,9 @@ class ExchangeWebSocketClient(ABC):
         self.parser = parser
         """JSON message to model converter"""
 
+        self.json_decoder: JsonDecoder = json.loads
+        """Decodes received raw messages to json"""
+
         self.symbols: List[str] = []
         """List of watched symbol names"""
 
@@ -24,6 +61,12 @@ class ExchangeWebSocketClient(ABC):
         self.websocket: WebSocketClientProtocol = None
         """Client connection"""
 
+        self.venue: str = None
+        """Exchange name set on received order books"""
+
+        self.max_streams_per_connection: int = None
+        """Maximum number of streams that exchange accepts on one connection. Unlimited when None"""
+
         self.connection_retry_interval = 5
         """Connection retry interval in seconds"""
 
@@ -42,15 +85,224 @@ class ExchangeWebSocketClient(ABC):
         self.stop_event = asyncio.Event()
         """Event to signal stopping the WebSocket connection"""
 
+        self.snapshot_provider: OrderBookSnapshotProvider = None
+        """Provides initial snapshots of full depth local order books. Full depth mode is disabled when None"""
+
+        self.snapshot_retry_interval = 1
+        """Interval in seconds between snapshot requests that does not connect to received updates"""
+
+        self.local_order_books: Dict[str, LocalOrderBookSynchronizer] = {}
+        """Full depth local order books by symbol"""
+
+        self.conflate = False
+        """Decouples receiving from processing. Only latest unprocessed message of each snapshot stream is kept"""
+
+        self.latest_messages: Dict[str, Tuple[str, float]] = {}
+        """Latest unprocessed (raw message, receive time) by stream when conflating"""
+
+        self.ordered_messages: Deque[Tuple[str, float]] = deque()
+        """Unprocessed (raw message, receive time) of streams that must not be conflated (incremental updates)"""
+
+        self.message_event = asyncio.Event()
+        """Signals processing task that messages are waiting"""
+
+        self.process_task: Task = None
+        """Task for processing received messages when conflating"""
+
+        self.stats = IngestionStats()
+        """Received, processed and conflated message counters"""
+
+        self.recorder: FeedRecorder = None
+        """Records received raw frames for replay. Disabled when None"""
+
+        self.metrics: ServiceMetrics = None
+        """Records parse time and feed latency of published order books. Disabled when None"""
+
+        self.message_start: float = None
+        """Performance counter at start of decoding current message, None outside of message processing"""
+
+        self.tracer: Tracer = None
+        """Samples stage timings of processed messages. Disabled when None"""
+
+        self.trace: Trace = None
+        """Trace of current message, None when it is not sampled or outside of message processing"""
+
+        self.redundant_connections = 1
+        """Parallel connections receiving the same streams. Messages are deduplicated by update id, first arrival wins"""
+
+        self.reconnect_backoff = 0.1
+        """Upper bound in seconds of first reconnect delay of a redundant connection, doubled on each failed attempt"""
+
+        self.max_reconnect_backoff = 10
+        """Maximum upper bound in seconds of reconnect delay of a redundant connection"""
+
+        self.connections: List[FeedConnection] = []
+        """Redundant connections, empty when a single connection is used"""
+
+        self.last_message_ids: Dict[str, int] = {}
+        """Latest processed update id by stream when deduplicating redundant connections"""
+
+        self.subscribable = False
+        """Symbols can be subscribed and unsubscribed on open connections"""
+
+        self.request_timeout = 5
+        """Seconds to wait for responses of subscribe and unsubscribe requests"""
+
+        self.next_request_id = 1
+        self.pending_requests: Dict[int, PendingRequest] = {}
+        """Control requests waiting for responses by request id"""
+
+        self.unsubscribed: Set[str] = set()
+        """Symbols unsubscribed at runtime. Their order books still in flight are dropped"""
+
+        self.detect_changes = False
+        """Compares raw levels of each order book with previous one of its symbol before conversion"""
+
+        self.previous_order_books: Dict[str, Tuple[list, list, LimitOrderBook]] = {}
+        """(raw bids, raw asks, converted order book) of latest order book by symbol when detecting changes"""
+
     def set_symbols(self, symbols: List[str]):
         """Sets list of watched symbols. Connects only streams of specified symbol names"""
         self.symbols = symbols
 
+    def set_venue(self, venue: str):
+        """Sets exchange name of received order books, distinguishes venues of a consolidated order book"""
+        self.venue = venue
+
+    def set_json_decoder(self, json_decoder: JsonDecoder):
+        """Sets decoder of received raw messages, e.g. a faster json library's loads function"""
+        self.json_decoder = json_decoder
+
+    def set_conflation(self, conflate: bool = True):
+        """Enables per stream latest-only processing of received messages"""
+        self.conflate = conflate
+
+    def set_recorder(self, recorder: FeedRecorder):
+        """Records every received raw frame with its receive time"""
+        self.recorder = recorder
+
+    def set_metrics(self, metrics: ServiceMetrics):
+        """Records per symbol message metrics"""
+        self.metrics = metrics
+
+    def set_tracer(self, tracer: Tracer):
+        """Samples receive, decode, convert and dispatch timings of processed messages"""
+        self.tracer = tracer
+
+    def set_change_detection(self, detect_changes: bool = True):
+        """Skips conversion of order books whose levels equal previous order book of their symbol and
+        marks changed sides of the others, so that observers only recompute what changed"""
+        self.detect_changes = detect_changes
+        self.previous_order_books = {}
+
+    def set_redundancy(self, connections: int, reconnect_backoff: float = 0.1, max_reconnect_backoff: float = 10):
+        """Receives the same streams over given number of parallel connections. A dropped connection reconnects
+        in background with exponential backoff and jitter while the others keep delivering"""
+        self.redundant_connections = connections
+        self.reconnect_backoff = reconnect_backoff
+        self.max_reconnect_backoff = max_reconnect_backoff
+
+    def set_snapshot_provider(self, snapshot_provider: OrderBookSnapshotProvider):
+        """Enables full depth mode. Order books are maintained locally from snapshots and incremental updates"""
+        self.snapshot_provider = snapshot_provider
+
     @abstractmethod
     def get_uri(self) -> str:
         """Gets uri adress to connect socket"""
         pass
 
+    @abstractmethod
+    def create_subscription_message(self, symbols: List[str], subscribe: bool, request_id: int) -> str:
+        """Creates control message that subscribes or unsubscribes streams of given symbols"""
+        pass
+
+    async def subscribe(self, symbols: List[str]) -> List[str]:
+        """Adds given symbols to watched symbols and subscribes their streams on open connections.
+        Reconnections use the updated symbols. Returns symbols that were not watched.
+        Raises ValueError when exchange does not support runtime subscriptions"""
+        if not self.subscribable:
+            raise ValueError(f"{type(self).__name__} does not support runtime subscriptions")
+
+        added = [symbol for symbol in dict.fromkeys(symbols) if symbol not in self.symbols]
+        if not added:
+            return []
+
+        # symbols list is shared with shard, so it is updated in place
+        self.symbols.extend(added)
+        self.unsubscribed.difference_update(symbol.upper() for symbol in added)
+
+        try:
+            await self._send_request(added, subscribe=True)
+        except BaseException:
+            # reconnections must not request a rejected stream, order books of a timed out request are dropped
+            for symbol in added:
+                self.symbols.remove(symbol)
+            self.unsubscribed.update(symbol.upper() for symbol in added)
+            raise
+
+        return added
+
+    async def unsubscribe(self, symbols: List[str]) -> List[str]:
+        """Removes given symbols from watched symbols and unsubscribes their streams on open connections.
+        Returns symbols that were watched. Raises ValueError when exchange does not support runtime subscriptions"""
+        if not self.subscribable:
+            raise ValueError(f"{type(self).__name__} does not support runtime subscriptions")
+
+        removed = [symbol for symbol in dict.fromkeys(symbols) if symbol in self.symbols]
+        if not removed:
+            return []
+
+        for symbol in removed:
+            self.symbols.remove(symbol)
+            self.unsubscribed.add(symbol.upper())
+            self.local_order_books.pop(symbol.upper(), None)
+            self.previous_order_books.pop(symbol.upper(), None)
+
+        await self._send_request(removed, subscribe=False)
+        return removed
+
+    async def _send_request(self, symbols: List[str], subscribe: bool):
+        """Sends subscription request on every open connection and waits for all of their responses.
+        Raises RuntimeError when exchange rejects it and TimeoutError when a connection does not respond"""
+        if self.connections:
+            sockets = [connection.websocket for connection in self.connections if connection.connected.is_set()]
+        else:
+            sockets = [self.websocket] if self.websocket is not None else []
+
+        request_id = self.next_request_id
+        self.next_request_id += 1
+        message = self.create_subscription_message(symbols, subscribe, request_id)
+
+        request = self.pending_requests[request_id] = PendingRequest(asyncio.get_running_loop().create_future())
+        try:
+            for websocket in sockets:
+                try:
+                    await websocket.send(message)
+                    request.remaining += 1
+
+                # closed connection reconnects with updated symbols
+                except websockets.ConnectionClosed:
+                    pass
+
+            if request.remaining > 0:
+                await asyncio.wait_for(request.future, self.request_timeout)
+        finally:
+            self.pending_requests.pop(request_id, None)
+
+    def _on_response(self, request_id: int, error: str = None):
+        """Completes control request when all connections responded or any rejected it"""
+        request = self.pending_requests.get(request_id)
+        if request is None or request.future.done():
+            return
+
+        if error is not None:
+            request.future.set_exception(RuntimeError(f"Request {request_id} is rejected: {error}"))
+            return
+
+        request.remaining -= 1
+        if request.remaining <= 0:
+            request.future.set_result(None)
+
     async def _connect(self):
         while True:
             try:
@@ -77,20 +329,120 @@ class ExchangeWebSocketClient(ABC):
         """Receives and processes messages from websocket"""
         while not self.stop_event.is_set():
             try:
-                message = await self.websocket.recv()
-                json_message = json.loads(message)
-                self.on_message(json_message)
-            except websockets.ConnectionClosedError:
-                print("Connection closed, reconnecting...")
-                await self._connect()
+                self._receive(await self.websocket.recv())
             except websockets.WebSocketException as e:
-                print(f"WebSocket error: {e}. Reconnecting...")
+                # connection is closed by stop
+                if self.stop_event.is_set():
+                    break
+
+                if isinstance(e, websockets.ConnectionClosedError):
+                    print("Connection closed, reconnecting...")
+                else:
+                    print(f"WebSocket error: {e}. Reconnecting...")
+
+                self.stats.reconnects += 1
                 await self._connect()
             except JSONDecodeError as e:
                 print(f"JSON decode error: {e}")
             except Exception as e:
                 print(f"Unexpected error: {e}")
 
+    def _receive(self, message):
+        """Records and processes received raw message, or enqueues it when conflating"""
+        received_time = time.time()
+        self.stats.received += 1
+
+        if self.connections and self._is_duplicate(message):
+            self.stats.duplicates += 1
+            return
+
+        if self.recorder:
+            self.recorder.write(message, received_time)
+
+        if self.conflate:
+            self._enqueue(message, received_time)
+            return
+
+        self._process_message(message, received_time)
+
+    def _is_duplicate(self, message) -> bool:
+        """Checks wether message's update id of its stream is already received by another connection"""
+        message_id = self.parser.get_message_id(message)
+        if message_id is None:
+            return False
+
+        stream, update_id = message_id
+        if update_id <= self.last_message_ids.get(stream, -1):
+            return True
+
+        self.last_message_ids[stream] = update_id
+        return False
+
+    def _process_message(self, message, received_time: float):
+        """Decodes raw message and notifies listeners"""
+        if self.metrics is not None:
+            self.message_start = time.perf_counter()
+
+        trace = self.trace = self.tracer.start("feed") if self.tracer is not None else None
+        if trace is not None:
+            # deduplication, recording and waiting in conflation queue
+            trace.add("receive", max(time.time() - received_time, 0))
+
+        try:
+            json_message = self.json_decoder(message)
+            if trace is not None:
+                trace.mark("decode")
+
+            self.on_message(json_message, received_time)
+        finally:
+            self.message_start = None
+            if trace is not None:
+                self.trace = None
+                self.tracer.finish(trace)
+
+        self.stats.processed += 1
+
+    def _enqueue(self, message, received_time: float):
+        """Stores received message for processing task, replaces unprocessed message of the same stream"""
+        stream_key = self.parser.get_stream_key(message)
+
+        if stream_key is None:
+            self.ordered_messages.append((message, received_time))
+        else:
+            if stream_key in self.latest_messages:
+                self.stats.conflated += 1
+            self.latest_messages[stream_key] = (message, received_time)
+
+        self.message_event.set()
+
+    async def _process(self):
+        """Processes latest messages of each stream while receiving continues"""
+        while not self.stop_event.is_set():
+            await self.message_event.wait()
+            self.message_event.clear()
+
+            while self.ordered_messages or self.latest_messages:
+                if self.ordered_messages:
+                    message, received_time = self.ordered_messages.popleft()
+                else:
+                    # oldest waiting stream first
+                    stream_key = next(iter(self.latest_messages))
+                    message, received_time = self.latest_messages.pop(stream_key)
+
+                lag = time.time() - received_time
+                self.stats.last_lag = lag
+                self.stats.max_lag = max(self.stats.max_lag, lag)
+
+                try:
+                    self._process_message(message, received_time)
+                except JSONDecodeError as e:
+                    print(f"JSON decode error: {e}")
+                except Exception as e:
+                    print(f"Unexpected error: {e}")
+
+                # lets receiving task run, newer messages replace waiting ones meanwhile
+                await asyncio.sleep(0)
+
     async def _send_ping(self):
         while not self.stop_event.is_set():
             try:
@@ -101,14 +453,114 @@ class ExchangeWebSocketClient(ABC):
             except Exception as e:
                 print(f"An error occurred while sending ping: {e}")
 
-    def on_message(self, message):
-        """Executed each time on json message received. Converts data and notifies to listeners"""
+    def _notify(self, order_book: LimitOrderBook, received_time: float = None):
+        """Notifies listeners with received order book"""
+
+        # received before exchange processed unsubscribe request
+        if self.unsubscribed and order_book.symbol in self.unsubscribed:
+            return
+
+        trace = self.trace
+        if trace is not None:
+            trace.mark("convert")
+            trace.attributes["symbol"] = order_book.symbol
 
-        if self.parser.is_order_book(message):
-            order_book = self.parser.convert_order_book(message)
+        order_book.received_time = received_time if received_time is not None else time.time()
+        order_book.venue = self.venue
 
+        if self.metrics is not None:
+            parse_time = time.perf_counter() - self.message_start if self.message_start is not None else None
+            self.metrics.on_order_book(order_book, parse_time)
+
+        if trace is None:
             for observer in self.observers:
                 observer.on_order_book_received(order_book)
+        else:
+            # quotes recomputed by observers are not stages of the feed trace
+            token = current_trace.set(None)
+            try:
+                for observer in self.observers:
+                    observer.on_order_book_received(order_book)
+            finally:
+                current_trace.reset(token)
+            trace.mark("dispatch")
+
+    def on_message(self, message, received_time: float = None):
+        """Executed each time on json message received. Converts data and notifies to listeners"""
+
+        response = self.parser.get_response(message)
+        if response is not None:
+            self._on_response(*response)
+
+        elif self.parser.is_order_book_update(message):
+            self.on_order_book_update(self.parser.convert_order_book_update(message), received_time)
+
+        elif self.parser.is_order_book(message):
+            raw_levels = self.parser.get_raw_levels(message) if self.detect_changes else None
+            if raw_levels is None:
+                self._notify(self.parser.convert_order_book(message), received_time)
+            else:
+                self._notify(self._convert_changed(message, *raw_levels), received_time)
+
+    def _convert_changed(self, message, symbol: str, raw_bids: list, raw_asks: list) -> LimitOrderBook:
+        """Converts order book with its changed sides. An order book equal to previous one reuses its converted levels"""
+        previous = self.previous_order_books.get(symbol)
+
+        if previous is not None:
+            previous_bids, previous_asks, previous_order_book = previous
+
+            # depth snapshots are short lists of short strings, comparing them is cheaper than converting
+            bids_changed = raw_bids != previous_bids
+            asks_changed = raw_asks != previous_asks
+            if not bids_changed and not asks_changed:
+                self.stats.unchanged += 1
+                return LimitOrderBook(symbol, previous_order_book.bids, previous_order_book.asks, change=UNCHANGED)
+
+            top_changed = raw_bids[:1] != previous_bids[:1] or raw_asks[:1] != previous_asks[:1]
+            change = OrderBookChange(bids_changed, asks_changed, top_changed)
+        else:
+            change = None
+
+        order_book = self.parser.convert_order_book(message)
+        order_book.change = change
+        self.previous_order_books[symbol] = (raw_bids, raw_asks, order_book)
+        return order_book
+
+    def on_order_book_update(self, update, received_time: float = None):
+        """Applies incremental update to local order book and notifies listeners when book is in sync"""
+        synchronizer = self.local_order_books.get(update.symbol)
+        if synchronizer is None:
+            synchronizer = self.local_order_books[update.symbol] = LocalOrderBookSynchronizer(update.symbol)
+
+        order_book = synchronizer.on_update(update)
+        if order_book is not None:
+            self._notify(order_book, received_time)
+
+        # first update or sequence gap
+        elif synchronizer.needs_snapshot() and self.snapshot_provider is not None:
+            synchronizer.loading = True
+            asyncio.create_task(self._load_snapshot(synchronizer))
+
+    async def _load_snapshot(self, synchronizer: LocalOrderBookSynchronizer):
+        """Initializes local order book from snapshots until it connects to buffered updates"""
+        symbol = synchronizer.order_book.symbol
+
+        try:
+            while not self.stop_event.is_set():
+                try:
+                    snapshot = await self.snapshot_provider.get_snapshot(symbol)
+                    order_book = synchronizer.on_snapshot(self.parser.convert_snapshot(symbol, snapshot))
+
+                    if order_book is not None:
+                        self._notify(order_book)
+                        break
+
+                except Exception as e:
+                    print(f"Snapshot error for {symbol}: {e}")
+
+                await asyncio.sleep(self.snapshot_retry_interval)
+        finally:
+            synchronizer.loading = False
 
     async def start(self):
         """Starts websocket connection and receives datas"""
@@ -116,12 +568,31 @@ class ExchangeWebSocketClient(ABC):
         # reset stop event
         self.stop_event = asyncio.Event()
 
-        if len(self.symbols) == 0:
+        # symbols can be subscribed later on open connections
+        if len(self.symbols) == 0 and not self.subscribable:
             raise ValueError("'symbols' must not be empty to connect socket")
+        elif self.redundant_connections > 1:
+            await self._start_connections()
         else:
             await self._connect()
             self.listen_task = asyncio.create_task(self._listen())
 
+        # messages of all connections are queued by receive
+        if self.conflate:
+            self.process_task = asyncio.create_task(self._process())
+
+    async def _start_connections(self):
+        """Starts redundant connections and waits until any of them is connected"""
+        self.last_message_ids = {}
+        self.connections = [FeedConnection(self, index) for index in range(self.redundant_connections)]
+        for connection in self.connections:
+            connection.start()
+
+        waiters = [asyncio.create_task(connection.connected.wait()) for connection in self.connections]
+        await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+        for waiter in waiters:
+            waiter.cancel()
+
     async def stop(self):
         """Stops the WebSocket connection and cleans up tasks"""
         self.stop_event.set()
@@ -129,22 +600,149 @@ class ExchangeWebSocketClient(ABC):
         if self.websocket:
             await self.websocket.close()
 
+        for connection in self.connections:
+            await connection.stop()
+
         if self.listen_task:
             self.listen_task.cancel()
 
+        if self.process_task:
+            self.process_task.cancel()
+
+        if self.recorder:
+            self.recorder.close()
+
         if self.ping_task:
             self.ping_task.cancel()
 
 
+class FeedConnection:
+    """One of a client's redundant connections to the same streams. Received messages are handed to client
+    for deduplication. When connection drops it reconnects in background with exponential backoff and full jitter"""
+
+    def __init__(self, client: ExchangeWebSocketClient, index: int):
+        self.client = client
+        self.index = index
+
+        self.websocket: WebSocketClientProtocol = None
+        self.connected = asyncio.Event()
+        """Set while connection is open"""
+
+        self.failures = 0
+        """Consecutive failed connection attempts"""
+
+        self.task: Task = None
+
+        self.ping_task: Task = None
+        """Keeps open connection alive like client's single connection"""
+
+    def get_reconnect_delay(self) -> float:
+        """Random delay up to exponentially growing bound, so redundant connections do not reconnect in lockstep"""
+        bound = min(self.client.reconnect_backoff * 2 ** self.failures, self.client.max_reconnect_backoff)
+        return random.uniform(0, bound)
+
+    async def _run(self):
+        client = self.client
+
+        while not client.stop_event.is_set():
+            try:
+                self.websocket = await websockets.connect(client.get_uri())
+                self.failures = 0
+                self.connected.set()
+                self.ping_task = asyncio.create_task(self._send_ping(self.websocket))
+
+                while True:
+                    message = await self.websocket.recv()
+                    try:
+                        client._receive(message)
+                    except JSONDecodeError as e:
+                        print(f"JSON decode error: {e}")
+                    except Exception as e:
+                        print(f"Unexpected error: {e}")
+
+            except (websockets.WebSocketException, OSError) as e:
+                self.connected.clear()
+                self._cancel_ping()
+
+                # connection is closed by stop
+                if client.stop_event.is_set():
+                    break
+
+                delay = self.get_reconnect_delay()
+                self.failures += 1
+                client.stats.reconnects += 1
+                print(f"Connection {self.index} error: {e}. Reconnecting in {delay:.2f} seconds...")
+                await asyncio.sleep(delay)
+
+    async def _send_ping(self, websocket: WebSocketClientProtocol):
+        while True:
+            try:
+                await websocket.ping()
+                await asyncio.sleep(self.client.ping_interval * 60)
+            except asyncio.CancelledError:
+                break
+            except websockets.ConnectionClosed:
+                break
+            except Exception as e:
+                print(f"An error occurred while sending ping on connection {self.index}: {e}")
+                await asyncio.sleep(self.client.ping_interval * 60)
+
+    def _cancel_ping(self):
+        if self.ping_task:
+            self.ping_task.cancel()
+            self.ping_task = None
+
+    def start(self):
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._cancel_ping()
+
+        if self.websocket:
+            await self.websocket.close()
+
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+
+
 class BinanceSpotWebSocketClient(ExchangeWebSocketClient):
     """Manages websocket connection to Binance - Spot Markets"""
-    def __init__(self):
-        super().__init__(BinanceSpotWebSocketMessageParser())
+    def __init__(self, lazy=False):
+        super().__init__(BinanceSpotWebSocketMessageParser(lazy))
         self.send_ping_periodically = True
         self.ping_interval = 3
 
-    def get_uri(self) -> str:
-        depth = 5 # partial order book depth
+        self.venue = "binance"
+        self.max_streams_per_connection = 1024
+        self.subscribable = True
+
+        self.base_uri = "wss://stream.binance.com:9443"
+        """Websocket server adress"""
+
+    def set_full_depth(self, snapshot_provider: OrderBookSnapshotProvider = None):
+        """Listens diff depth streams and maintains full depth local order books. 
+        Snapshots are requested from Binance REST api unless another provider is given"""
+        self.set_snapshot_provider(snapshot_provider or BinanceSpotSnapshotProvider())
+
+    def get_stream_names(self, symbols: List[str]) -> List[str]:
+        # full depth diff stream or partial order book depth
+        depth = "" if self.snapshot_provider else 5
         interval = "100ms" # order book receive period
-        stream_names = [f"{symbol.lower()}@depth{depth}@{interval}" for symbol in self.symbols]
-        return f"wss://stream.binance.com:9443/stream?streams={'/'.join(stream_names)}"
\ No newline at end of file
+        return [f"{symbol.lower()}@depth{depth}@{interval}" for symbol in symbols]
+
+    def get_uri(self) -> str:
+        # streams are subscribed later when there is no watched symbol yet
+        if not self.symbols:
+            return f"{self.base_uri}/stream"
+
+        return f"{self.base_uri}/stream?streams={'/'.join(self.get_stream_names(self.symbols))}"
+
+    def create_subscription_message(self, symbols: List[str], subscribe: bool, request_id: int) -> str:
+        return json.dumps({
+            "method": "SUBSCRIBE" if subscribe else "UNSUBSCRIBE",
+            "params": self.get_stream_names(symbols),
+            "id": request_id})
\ No newline at end of file
@@ -0,0 +1,66 @@
+import asyncio, time, websockets
+from typing import Iterable, List, Optional, Union
+from utils.feed_recorder import read_feed
+
+class FeedReplayServer:
+    """Local websocket stand-in of an exchange that serves a recorded feed log to each connected client.
+    Frames are sent with recorded timing scaled by speed, or as fast as possible when speed is None"""
+
+    def __init__(self, paths: Union[str, Iterable[str]], speed: Optional[float] = 1.0):
+        self.paths = paths
+        """Feed log path or list of files"""
+
+        self.speed = speed
+        """Replay speed multiplier, None replays at maximum speed"""
+
+        self.host = "127.0.0.1"
+        self.port = 0
+        """Listened port, an ephemeral port is selected when 0"""
+
+        self.sent_frames = 0
+        """Frames sent to all clients"""
+
+        self.finished = asyncio.Event()
+        """Set when a client received the whole log"""
+
+        self.server = None
+
+    def get_uri(self) -> str:
+        """Base uri to connect, e.g. BinanceSpotWebSocketClient.base_uri"""
+        return f"ws://{self.host}:{self.port}"
+
+    async def _serve(self, websocket):
+        start_time = time.perf_counter()
+        first_timestamp = None
+
+        try:
+            for timestamp, message in read_feed(self.paths):
+                if self.speed is not None:
+                    if first_timestamp is None:
+                        first_timestamp = timestamp
+
+                    # wait until frame's scaled offset from first frame
+                    delay = (timestamp - first_timestamp) / 1e9 / self.speed - (time.perf_counter() - start_time)
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+
+                await websocket.send(message)
+                self.sent_frames += 1
+
+            self.finished.set()
+
+            # keeps connection open so that client does not reconnect and replay again
+            await websocket.wait_closed()
+
+        except websockets.ConnectionClosed:
+            pass
+
+    async def start(self):
+        self.server = await websockets.serve(self._serve, self.host, self.port, max_queue=None)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
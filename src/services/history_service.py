@@ -0,0 +1,145 @@
+import threading, time
+from array import array
+from typing import Dict, List, Optional, Tuple
+from models.order_book import LimitOrderBook, OrderBookSnapshot, PriceLevels
+from services.price_service import OrderBookObserver
+
+class OrderBookHistory:
+    """Ring buffer of a symbol's recent order books in preallocated arrays. Each slot stores receive time,
+    level counts and max depth levels of 8 arrays like the order book store: bid prices, quantities,
+    cumulative quantities, cumulative volumes and the same for asks. Oldest slot is overwritten when full"""
+
+    arrays_per_slot = 8
+
+    def __init__(self, symbol: str, capacity: int, max_depth: int):
+        self.symbol = symbol
+        self.capacity = capacity
+        self.max_depth = max_depth
+
+        self.times = array('d', bytes(8 * capacity))
+        """Receive time of each slot, ascending in ring order"""
+
+        self.counts = array('I', bytes(4 * 2 * capacity))
+        """Bid count and ask count of each slot"""
+
+        self.levels = [array('d', bytes(8 * capacity * max_depth)) for _ in range(OrderBookHistory.arrays_per_slot)]
+
+        self.start = 0
+        """Slot of oldest order book"""
+
+        self.size = 0
+        """Number of stored order books"""
+
+        self.lock = threading.Lock()
+        """Guards slots written by websocket thread and read by http threads"""
+
+    def _get_slot(self, index: int) -> int:
+        return (self.start + index) % self.capacity
+
+    def append(self, received_time: float, bids: PriceLevels, asks: PriceLevels):
+        """Stores order book in next slot. Levels deeper than max depth are dropped"""
+        with self.lock:
+            if self.size == self.capacity:
+                slot = self.start
+                self.start = (self.start + 1) % self.capacity
+            else:
+                slot = self._get_slot(self.size)
+                self.size += 1
+
+            # times stay sorted when clocks of different sources step back
+            if self.size > 1:
+                received_time = max(received_time, self.times[self._get_slot(self.size - 2)])
+            self.times[slot] = received_time
+
+            offset = slot * self.max_depth
+            for side, levels in enumerate((bids, asks)):
+                count = min(len(levels), self.max_depth)
+                self.counts[2 * slot + side] = count
+
+                values = (levels.prices, levels.quantities, levels.cumulative_quantities, levels.cumulative_volumes)
+                for array_index, side_values in enumerate(values):
+                    memoryview(self.levels[4 * side + array_index])[offset:offset + count] = side_values[:count]
+
+    def _find(self, at_time: float) -> int:
+        """Index of latest order book received at or before given time, -1 when there is none"""
+        low, high = 0, self.size
+        while low < high:
+            middle = (low + high) // 2
+            if self.times[self._get_slot(middle)] <= at_time:
+                low = middle + 1
+            else:
+                high = middle
+        return low - 1
+
+    def _get_levels(self, index: int, side: int) -> PriceLevels:
+        """Levels of stored order book side (0 bids, 1 asks) as views of ring arrays. Valid while lock is held"""
+        slot = self._get_slot(index)
+        offset = slot * self.max_depth
+        count = self.counts[2 * slot + side]
+        return PriceLevels.wrap(*(memoryview(self.levels[4 * side + array_index])[offset:offset + count]
+            for array_index in range(4)))
+
+    def get_snapshot(self, at_time: float) -> Optional[OrderBookSnapshot]:
+        """Copy of order book that was latest at given time, None when history does not reach back to it"""
+        with self.lock:
+            index = self._find(at_time)
+            if index < 0:
+                return None
+
+            bids, asks = (PriceLevels.wrap(*(array('d', values) for values in (levels.prices, levels.quantities,
+                levels.cumulative_quantities, levels.cumulative_volumes))) for levels in
+                (self._get_levels(index, 0), self._get_levels(index, 1)))
+
+            # versions are not kept, a snapshot is identified by its receive time
+            return OrderBookSnapshot(self.symbol, bids, asks, 0, None, self.times[self._get_slot(index)])
+
+    def fill_window(self, side: int, amount: float, by_volume: bool, start_time: float, end_time: float,
+        time_weighted: bool) -> List[Tuple[float, Optional[Tuple[float, float]]]]:
+        """Fills given amount on given side of each order book live during time window, including the order book
+        that was latest at window start. Returns (weight, filled (quantity, volume) or None when not liquid enough)
+        of each order book. Weight is seconds the order book was live within window when time weighted, otherwise 1"""
+        with self.lock:
+            first = max(self._find(start_time), 0)
+            last = self._find(end_time)
+
+            fills = []
+            for index in range(first, last + 1):
+                if time_weighted:
+                    live_from = max(self.times[self._get_slot(index)], start_time)
+                    live_until = self.times[self._get_slot(index + 1)] if index < last else end_time
+                    weight = max(min(live_until, end_time) - live_from, 0)
+                else:
+                    weight = 1
+
+                fills.append((weight, self._get_levels(index, side).fill(amount, by_volume)))
+
+            return fills
+
+
+class OrderBookHistoryService(OrderBookObserver):
+    """Keeps a fixed memory history of each symbol's recent order books for windowed quotes and as of lookups"""
+
+    def __init__(self, capacity: int = 600, max_depth: int = 100):
+        self.capacity = capacity
+        """Order books kept per symbol"""
+
+        self.max_depth = max_depth
+        """Levels kept per order book side"""
+
+        self.histories: Dict[str, OrderBookHistory] = {}
+
+    def on_order_book_received(self, order_book: LimitOrderBook):
+        history = self.histories.get(order_book.symbol)
+
+        # previous order book stays live until levels change, so history reaches further back
+        if history is not None and order_book.change is not None and not order_book.change.is_changed():
+            return
+
+        if history is None:
+            history = self.histories[order_book.symbol] = OrderBookHistory(order_book.symbol, self.capacity, self.max_depth)
+
+        received_time = order_book.received_time if order_book.received_time is not None else time.time()
+        history.append(received_time, PriceLevels.of(order_book.bids), PriceLevels.of(order_book.asks))
+
+    def get_history(self, symbol: str) -> Optional[OrderBookHistory]:
+        return self.histories.get(symbol)
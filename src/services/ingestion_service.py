@@ -0,0 +1,412 @@
+import asyncio, math, multiprocessing, threading, time
+from abc import ABC, abstractmethod
+from array import array
+from dataclasses import astuple, fields
+from multiprocessing.process import BaseProcess
+from typing import Callable, Dict, List, Optional, Tuple
+from models.order_book import LimitOrderBook, OrderBookChange, PriceLevels
+from services.price_service import OrderBookObserver
+from services.depth_service import OrderBookSnapshotProvider
+from services.exchange_service import ExchangeWebSocketClient, BinanceSpotWebSocketClient, IngestionStats
+from services.metrics_service import ServiceMetrics
+
+ClientFactory = Callable[[List[str]], ExchangeWebSocketClient]
+"""Creates a configured client of given symbols. Must be picklable (e.g. a partial of a module level function) for process shards"""
+
+INGESTION_MODES = ("task", "thread", "process")
+
+def create_binance_client(symbols: List[str], lazy_decoding=False, json_decoder=None, conflate=False,
+    full_depth=False, base_uri: str = None, fixed_point=False, redundant_connections=1,
+    detect_changes=False, snapshot_provider: OrderBookSnapshotProvider = None) -> BinanceSpotWebSocketClient:
+    """Creates a Binance client of given symbols with quote server's ingestion settings"""
+    client = BinanceSpotWebSocketClient(lazy_decoding)
+    if fixed_point:
+        client.parser.set_fixed_point()
+    if json_decoder is not None:
+        client.set_json_decoder(json_decoder)
+    client.set_conflation(conflate)
+    client.set_symbols(symbols)
+    if full_depth:
+        client.set_full_depth(snapshot_provider)
+    if base_uri is not None:
+        client.base_uri = base_uri
+    if redundant_connections > 1:
+        client.set_redundancy(redundant_connections)
+    if detect_changes:
+        client.set_change_detection()
+    return client
+
+def shard_symbols(symbols: List[str], shard_count: int, max_streams: Optional[int] = None) -> List[List[str]]:
+    """Distributes symbols round robin to given number of shards.
+    More shards are used when a shard would exceed maximum streams per connection"""
+    if max_streams is not None:
+        shard_count = max(shard_count, math.ceil(len(symbols) / max_streams))
+
+    shard_count = max(min(shard_count, len(symbols)), 1)
+    return [symbols[index::shard_count] for index in range(shard_count)]
+
+
+class LoopForwarder(OrderBookObserver):
+    """Hands order books received on another thread to observers on the event loop that started forwarding"""
+
+    def __init__(self, observers: List[OrderBookObserver]):
+        self.observers = observers
+        self.loop: asyncio.AbstractEventLoop = None
+
+    def start(self):
+        self.loop = asyncio.get_running_loop()
+
+    def on_order_book_received(self, order_book: LimitOrderBook):
+        self.loop.call_soon_threadsafe(self.forward, order_book)
+
+    def forward(self, order_book: LimitOrderBook):
+        for observer in self.observers:
+            observer.on_order_book_received(order_book)
+
+
+class IngestionShard(ABC):
+    """Websocket connection of a subset of watched symbols with its own reconnect handling"""
+
+    def __init__(self, symbols: List[str]):
+        self.symbols = symbols
+
+    @abstractmethod
+    async def start(self):
+        pass
+
+    @abstractmethod
+    async def stop(self):
+        pass
+
+    @abstractmethod
+    def get_stats(self) -> IngestionStats:
+        """Message counters of shard's connection"""
+        pass
+
+    @abstractmethod
+    async def subscribe(self, symbols: List[str]):
+        """Subscribes streams of given symbols on shard's open connection"""
+        pass
+
+    @abstractmethod
+    async def unsubscribe(self, symbols: List[str]):
+        """Unsubscribes streams of given symbols on shard's open connection"""
+        pass
+
+
+class TaskIngestionShard(IngestionShard):
+    """Shard client running on the event loop that observers are notified on"""
+
+    def __init__(self, client: ExchangeWebSocketClient, observers: List[OrderBookObserver]):
+        super().__init__(client.symbols)
+        self.client = client
+        self.client.observers = observers
+
+    async def start(self):
+        await self.client.start()
+
+    async def stop(self):
+        await self.client.stop()
+
+    def get_stats(self) -> IngestionStats:
+        return self.client.stats
+
+    async def subscribe(self, symbols: List[str]):
+        await self.client.subscribe(symbols)
+
+    async def unsubscribe(self, symbols: List[str]):
+        await self.client.unsubscribe(symbols)
+
+
+class ThreadIngestionShard(IngestionShard):
+    """Shard client receiving and parsing on its own event loop thread. Order books are handed to observers' loop"""
+
+    def __init__(self, client: ExchangeWebSocketClient, observers: List[OrderBookObserver]):
+        super().__init__(client.symbols)
+        self.client = client
+        self.forwarder = LoopForwarder(observers)
+        self.client.observers = [self.forwarder]
+
+        self.thread: threading.Thread = None
+        self.loop: asyncio.AbstractEventLoop = None
+        self.stop_event: asyncio.Event = None
+        self.started = threading.Event()
+
+    async def _run(self):
+        self.loop = asyncio.get_running_loop()
+        self.stop_event = asyncio.Event()
+
+        try:
+            await self.client.start()
+        finally:
+            self.started.set()
+
+        await self.stop_event.wait()
+        await self.client.stop()
+
+    async def start(self):
+        self.forwarder.start()
+        self.thread = threading.Thread(target=asyncio.run, args=(self._run(),), daemon=True)
+        self.thread.start()
+        await asyncio.to_thread(self.started.wait)
+
+    async def stop(self):
+        if self.thread is None:
+            return
+
+        if self.loop is not None and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self.stop_event.set)
+
+        await asyncio.to_thread(self.thread.join)
+        self.thread = None
+
+    def get_stats(self) -> IngestionStats:
+        return self.client.stats
+
+    async def subscribe(self, symbols: List[str]):
+        # client's connection belongs to shard's loop
+        await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(self.client.subscribe(symbols), self.loop))
+
+    async def unsubscribe(self, symbols: List[str]):
+        await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(self.client.unsubscribe(symbols), self.loop))
+
+
+def encode_order_book(order_book: LimitOrderBook, stats: IngestionStats = None) -> tuple:
+    """Converts order book to arrays of price levels with computed cumulative sums, its changed sides
+    and optionally shard counters for transfer"""
+    sides = []
+    for orders in (order_book.bids, order_book.asks):
+        levels = PriceLevels.of(orders)
+        sides.append(tuple(bytes(values) for values in
+            (levels.prices, levels.quantities, levels.cumulative_quantities, levels.cumulative_volumes)))
+
+    change = astuple(order_book.change) if order_book.change is not None else None
+    return (order_book.symbol, sides[0], sides[1], order_book.event_time, order_book.received_time, order_book.venue,
+        change, astuple(stats) if stats is not None else None)
+
+def decode_order_book(message: tuple) -> Tuple[LimitOrderBook, Optional[IngestionStats]]:
+    """Converts transferred message back to order book and shard counters. Counters are None when not sent"""
+    symbol, bids, asks, event_time, received_time, venue, change, stats = message
+
+    def to_levels(side) -> PriceLevels:
+        arrays = []
+        for values in side:
+            arrays.append(array('d'))
+            arrays[-1].frombytes(values)
+        return PriceLevels.wrap(*arrays)
+
+    change = OrderBookChange(*change) if change is not None else None
+    stats = IngestionStats(*stats) if stats is not None else None
+    return LimitOrderBook(symbol, to_levels(bids), to_levels(asks), event_time, received_time, venue, change), stats
+
+
+class QueueWriter(OrderBookObserver):
+    """Sends order books of a shard process to ingester process"""
+
+    def __init__(self, queue, stats: IngestionStats, stats_interval: float = 1.0):
+        self.queue = queue
+        self.stats = stats
+
+        self.stats_interval = stats_interval
+        """Seconds between order books that carry shard counters, others are sent without them"""
+
+        self.stats_time: float = None
+        """Monotonic time counters were last sent"""
+
+    def on_order_book_received(self, order_book: LimitOrderBook):
+        now = time.monotonic()
+        if self.stats_time is None or now - self.stats_time >= self.stats_interval:
+            self.stats_time = now
+            self.queue.put(encode_order_book(order_book, self.stats))
+        else:
+            self.queue.put(encode_order_book(order_book))
+
+
+async def serve_ingestion_shard(client_factory: ClientFactory, symbols: List[str], queue, stop_event):
+    client = client_factory(symbols)
+    client.observers.append(QueueWriter(queue, client.stats))
+    await client.start()
+
+    try:
+        await asyncio.to_thread(stop_event.wait)
+    finally:
+        await client.stop()
+
+        # end of stream after all sent order books
+        queue.put(None)
+
+def run_ingestion_shard(client_factory: ClientFactory, symbols: List[str], queue, stop_event):
+    """Shard process entry point"""
+    try:
+        asyncio.run(serve_ingestion_shard(client_factory, symbols, queue, stop_event))
+    except KeyboardInterrupt:
+        pass
+
+
+class ProcessIngestionShard(IngestionShard):
+    """Shard client receiving, decoding and building price levels in a separate process.
+    Converted order books are sent through a queue and handed to observers' loop by a reader thread"""
+
+    def __init__(self, client_factory: ClientFactory, symbols: List[str], observers: List[OrderBookObserver]):
+        super().__init__(symbols)
+        self.client_factory = client_factory
+        self.forwarder = LoopForwarder(observers)
+
+        self.metrics: ServiceMetrics = None
+        """Records received order books, parse time is measured only by in-process clients"""
+
+        self.context = multiprocessing.get_context("spawn")
+        self.queue = self.context.Queue()
+        self.stop_event = self.context.Event()
+        """Asks shard process to close its connection and end the queue"""
+
+        self.stop_timeout = 5
+        """Seconds to wait for shard process to stop before it is terminated"""
+
+        self.process: BaseProcess = None
+        self.reader: threading.Thread = None
+        self.stats = IngestionStats()
+        """Counters of shard process as of its latest order book that carried them"""
+
+    def _read(self):
+        while True:
+            message = self.queue.get()
+            if message is None:
+                break
+
+            order_book, stats = decode_order_book(message)
+            if stats is not None:
+                self.stats = stats
+            if self.metrics is not None:
+                self.metrics.on_order_book(order_book)
+            self.forwarder.on_order_book_received(order_book)
+
+    async def start(self):
+        self.forwarder.start()
+        self.process = self.context.Process(target=run_ingestion_shard,
+            args=(self.client_factory, self.symbols, self.queue, self.stop_event), daemon=True)
+        self.process.start()
+
+        self.reader = threading.Thread(target=self._read, daemon=True)
+        self.reader.start()
+
+    async def stop(self):
+        if self.process is not None:
+            self.stop_event.set()
+            await asyncio.to_thread(self.process.join, self.stop_timeout)
+
+            # a terminated process may leave a partially written message, reader is not waited then
+            if self.process.is_alive():
+                self.process.terminate()
+                await asyncio.to_thread(self.process.join)
+                self.queue.put(None)
+            self.process = None
+
+        if self.reader is not None:
+            await asyncio.to_thread(self.reader.join, self.stop_timeout)
+            self.reader = None
+
+    def get_stats(self) -> IngestionStats:
+        return self.stats
+
+    async def subscribe(self, symbols: List[str]):
+        raise ValueError("Process shards do not support runtime subscriptions")
+
+    async def unsubscribe(self, symbols: List[str]):
+        raise ValueError("Process shards do not support runtime subscriptions")
+
+
+class ShardedIngestion:
+    """Splits watched symbols across websocket connections that all notify the same observers on one event loop.
+    A slow or reconnecting shard does not stall the others. Shards run as tasks of the event loop,
+    on their own threads or in their own processes"""
+
+    def __init__(self, client_factory: ClientFactory, symbols: List[str], shard_count=1, mode="task", max_streams: int = None):
+        if mode not in INGESTION_MODES:
+            raise ValueError(f"'{mode}' is not valid ingestion mode")
+
+        self.mode = mode
+
+        self.max_streams = max_streams
+        """Maximum streams of one shard connection. Unlimited when None"""
+
+        self.subscription_lock = asyncio.Lock()
+        """Serializes runtime subscription changes, so a symbol is assigned to one shard"""
+
+        self.observers: List[OrderBookObserver] = []
+        """Observers of all shards' order books, notified on the event loop that started ingestion"""
+
+        self.shards: List[IngestionShard] = []
+        for symbol_group in shard_symbols(symbols, shard_count, max_streams):
+            if mode == "process":
+                self.shards.append(ProcessIngestionShard(client_factory, symbol_group, self.observers))
+            elif mode == "thread":
+                self.shards.append(ThreadIngestionShard(client_factory(symbol_group), self.observers))
+            else:
+                self.shards.append(TaskIngestionShard(client_factory(symbol_group), self.observers))
+
+    def get_clients(self) -> List[ExchangeWebSocketClient]:
+        """Clients of shards running in this process"""
+        return [shard.client for shard in self.shards if not isinstance(shard, ProcessIngestionShard)]
+
+    def get_symbols(self) -> List[str]:
+        """Watched symbols of all shards"""
+        return [symbol for shard in self.shards for symbol in shard.symbols]
+
+    async def subscribe(self, symbols: List[str]) -> List[str]:
+        """Subscribes symbols that no shard watches on shards with fewest symbols.
+        Returns newly subscribed symbols. Raises ValueError when all shards are at streams limit"""
+        if self.mode == "process":
+            raise ValueError("Process shards do not support runtime subscriptions")
+
+        async with self.subscription_lock:
+            watched = set(self.get_symbols())
+            added = [symbol for symbol in dict.fromkeys(symbols) if symbol not in watched]
+
+            assignments: Dict[IngestionShard, List[str]] = {}
+            for symbol in added:
+                shard = min(self.shards, key=lambda shard: len(shard.symbols) + len(assignments.get(shard, ())))
+                if self.max_streams is not None and len(shard.symbols) + len(assignments.get(shard, ())) >= self.max_streams:
+                    raise ValueError(f"All shards are at the limit of {self.max_streams} streams, '{symbol}' is not subscribed")
+                assignments.setdefault(shard, []).append(symbol)
+
+            await asyncio.gather(*(shard.subscribe(group) for shard, group in assignments.items()))
+            return added
+
+    async def unsubscribe(self, symbols: List[str]) -> List[str]:
+        """Unsubscribes given symbols on shards watching them. Returns symbols that were watched"""
+        if self.mode == "process":
+            raise ValueError("Process shards do not support runtime subscriptions")
+
+        async with self.subscription_lock:
+            assignments = [(shard, [symbol for symbol in dict.fromkeys(symbols) if symbol in shard.symbols])
+                for shard in self.shards]
+
+            await asyncio.gather(*(shard.unsubscribe(group) for shard, group in assignments if group))
+            return [symbol for _, group in assignments for symbol in group]
+
+    def set_metrics(self, metrics: ServiceMetrics):
+        for shard in self.shards:
+            if isinstance(shard, ProcessIngestionShard):
+                shard.metrics = metrics
+            else:
+                shard.client.set_metrics(metrics)
+
+    def get_stats(self) -> IngestionStats:
+        """Sum of all shards' counters. Lags are the maximum of shards"""
+        total = IngestionStats()
+        for shard in self.shards:
+            stats = shard.get_stats()
+            for field in fields(IngestionStats):
+                value = getattr(stats, field.name)
+                if field.name.endswith("lag"):
+                    setattr(total, field.name, max(getattr(total, field.name), value))
+                else:
+                    setattr(total, field.name, getattr(total, field.name) + value)
+        return total
+
+    async def start(self):
+        await asyncio.gather(*(shard.start() for shard in self.shards))
+
+    async def stop(self):
+        await asyncio.gather(*(shard.stop() for shard in self.shards))
@@ -0,0 +1,193 @@
+import threading, time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Mapping, Optional, Tuple
+from models.order_book import LimitOrderBook, OrderBookSnapshot
+
+Labels = Tuple[str, ...]
+
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+"""Upper bounds in seconds of in-process latency histograms"""
+
+FEED_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+"""Upper bounds in seconds of exchange event to receive latency histograms"""
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Tuple[str, ...], values: Labels, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Metric:
+    """Named metric with a fixed set of label names, rendered in Prometheus text format"""
+    type = "untyped"
+
+    def __init__(self, name: str, description: str, label_names: Tuple[str, ...] = ()):
+        self.name = name
+        self.description = description
+        self.label_names = label_names
+        self.lock = threading.Lock()
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.type}"]
+
+
+class Counter(Metric):
+    """Monotonically increasing values by labels"""
+    type = "counter"
+
+    def __init__(self, name: str, description: str, label_names: Tuple[str, ...] = ()):
+        super().__init__(name, description, label_names)
+        self.values: Dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def get(self, *labels: str) -> float:
+        return self.values.get(labels, 0)
+
+    def render(self) -> List[str]:
+        with self.lock:
+            values = list(self.values.items())
+
+        return super().render() + [f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}"
+            for labels, value in values]
+
+
+class Histogram(Metric):
+    """Observation counts in fixed buckets by labels. Observing is a bisect and two additions"""
+    type = "histogram"
+
+    def __init__(self, name: str, description: str, label_names: Tuple[str, ...] = (), buckets=LATENCY_BUCKETS):
+        super().__init__(name, description, label_names)
+        self.buckets = tuple(buckets)
+        """Sorted upper bounds. Values above last bound are only counted in +Inf"""
+
+        self.counts: Dict[Labels, List[int]] = {}
+        """Non-cumulative count of each bucket and +Inf by labels"""
+
+        self.sums: Dict[Labels, float] = {}
+
+    def observe(self, value: float, *labels: str):
+        index = bisect_left(self.buckets, value)
+
+        with self.lock:
+            counts = self.counts.get(labels)
+            if counts is None:
+                counts = self.counts[labels] = [0] * (len(self.buckets) + 1)
+                self.sums[labels] = 0
+
+            counts[index] += 1
+            self.sums[labels] += value
+
+    def get_count(self, *labels: str) -> int:
+        return sum(self.counts.get(labels, ()))
+
+    def render(self) -> List[str]:
+        with self.lock:
+            items = [(labels, list(counts), self.sums[labels]) for labels, counts in self.counts.items()]
+
+        lines = super().render()
+        for labels, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, labels, le)} {cumulative}")
+
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, labels)} {cumulative}")
+
+        return lines
+
+
+class CallbackMetric(Metric):
+    """Metric whose values by labels are read from a callback at scrape time, so nothing is added to the hot path"""
+
+    def __init__(self, name: str, description: str, label_names: Tuple[str, ...] = (), metric_type="gauge"):
+        super().__init__(name, description, label_names)
+        self.type = metric_type
+        self.callback: Optional[Callable[[], Dict[Labels, float]]] = None
+
+    def set_callback(self, callback: Callable[[], Dict[Labels, float]]):
+        self.callback = callback
+
+    def render(self) -> List[str]:
+        values = self.callback() if self.callback is not None else {}
+        return super().render() + [f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}"
+            for labels, value in values.items()]
+
+
+class ServiceMetrics:
+    """In-process metrics of quote server rendered for Prometheus scrapes"""
+
+    content_type = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self):
+        self.quote_latency = Histogram("quote_latency_seconds",
+            "Quote calculation latency of successful /quote requests", ("symbol", "action"))
+
+        self.quote_batch_latency = Histogram("quote_batch_latency_seconds",
+            "Calculation latency of /quotes batch requests")
+
+        self.impact_latency = Histogram("price_impact_latency_seconds",
+            "Calculation latency of /impact curves", ("symbol",))
+
+        self.quote_errors = Counter("quote_errors_total",
+            "Rejected quote requests by reason", ("reason",))
+
+        self.feed_latency = Histogram("feed_to_book_latency_seconds",
+            "Seconds between exchange event time and local receive time", ("symbol",), FEED_LATENCY_BUCKETS)
+
+        self.parse_time = Histogram("order_book_parse_seconds",
+            "Decoding and conversion time of order book messages", ("symbol",))
+
+        self.order_books = Counter("order_book_messages_total",
+            "Order books published by symbol", ("symbol",))
+
+        self.book_age = CallbackMetric("order_book_age_seconds",
+            "Seconds since latest order book of symbol was received", ("symbol",))
+
+        self.ingestion = CallbackMetric("websocket_messages_total",
+            "Websocket messages by state (received, processed, conflated, duplicate, unchanged)", ("state",), "counter")
+
+        self.reconnects = CallbackMetric("websocket_reconnects_total",
+            "Websocket reconnections after connection errors", metric_type="counter")
+
+        self.metrics: List[Metric] = [self.quote_latency, self.quote_batch_latency, self.impact_latency, self.quote_errors,
+            self.feed_latency, self.parse_time, self.order_books, self.book_age, self.ingestion, self.reconnects]
+
+    def set_order_books(self, order_books: Callable[[], Mapping[str, OrderBookSnapshot]]):
+        """Reports age of published order books given by callback"""
+        def get_ages() -> Dict[Labels, float]:
+            now = time.time()
+            return {(symbol, ): snapshot.get_age(now) for symbol, snapshot in order_books().items()}
+
+        self.book_age.set_callback(get_ages)
+
+    def on_order_book(self, order_book: LimitOrderBook, parse_time: float = None):
+        """Records a published order book with the time spent decoding and converting its message"""
+        symbol = order_book.symbol
+        self.order_books.inc(symbol)
+
+        if parse_time is not None:
+            self.parse_time.observe(parse_time, symbol)
+
+        # exchange event time is in milliseconds
+        if order_book.event_time is not None and order_book.received_time is not None:
+            self.feed_latency.observe(max(order_book.received_time - order_book.event_time / 1000, 0), symbol)
+
+    def render(self) -> str:
+        """Metrics in Prometheus text exposition format"""
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+
+        return "\n".join(lines) + "\n"
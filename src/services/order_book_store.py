@@ -0,0 +1,223 @@
+import struct, threading, time
+from collections.abc import Mapping
+from typing import Dict, Iterator, List, Optional, Tuple
+from models.order_book import LimitOrderBook, OrderBookSnapshot, PriceLevels
+from services.price_service import OrderBookObserver
+
+class OrderBookStore:
+    """Fixed layout order book storage over a writable buffer (shared memory or memory-mapped file).
+    Each symbol has a slot guarded by a sequence lock: a single writer makes the sequence odd while writing
+    and even when done, readers retry when sequence is odd or changed while reading.
+
+    Layout: header | slot 0 | slot 1 | ... where each slot is a slot header followed by 8 arrays of
+    max_depth doubles: bid prices, quantities, cumulative quantities, cumulative volumes and the same for asks"""
+
+    magic = b"QOB1"
+
+    header = struct.Struct("<4sIII")
+    """magic, max symbols, max depth, symbol count"""
+
+    slot_header = struct.Struct("<16sQQqdII8x")
+    """symbol, sequence, version, event time (-1 when missing), received time, bid count, ask count"""
+
+    sequence = struct.Struct("<Q")
+    sequence_offset = 16
+    """Offset of sequence in slot header"""
+
+    arrays_per_slot = 8
+
+    def __init__(self, buffer: memoryview, max_symbols: int = None, max_depth: int = None):
+        """Initializes store over given buffer. Creates a new layout when max symbols and max depth are given,
+        otherwise reads layout of an existing store"""
+        self.buffer = buffer
+
+        if max_symbols is not None:
+            OrderBookStore.header.pack_into(buffer, 0, OrderBookStore.magic, max_symbols, max_depth, 0)
+
+        magic, self.max_symbols, self.max_depth, _ = OrderBookStore.header.unpack_from(buffer, 0)
+        if magic != OrderBookStore.magic:
+            raise ValueError("Buffer is not an order book store")
+
+        self.slot_size = OrderBookStore.slot_header.size + OrderBookStore.arrays_per_slot * self.max_depth * 8
+        """Bytes of one symbol's slot"""
+
+        self.slots: Dict[str, int] = {}
+        """Slot index by symbol"""
+
+    @staticmethod
+    def get_size(max_symbols: int, max_depth: int) -> int:
+        """Bytes required to store given number of symbols with given depth"""
+        slot_size = OrderBookStore.slot_header.size + OrderBookStore.arrays_per_slot * max_depth * 8
+        return OrderBookStore.header.size + max_symbols * slot_size
+
+    def _get_offset(self, slot: int) -> int:
+        return OrderBookStore.header.size + slot * self.slot_size
+
+    def get_symbol_count(self) -> int:
+        return OrderBookStore.header.unpack_from(self.buffer, 0)[3]
+
+    def get_sequence(self, slot: int) -> int:
+        return OrderBookStore.sequence.unpack_from(self.buffer, self._get_offset(slot) + OrderBookStore.sequence_offset)[0]
+
+    def _set_sequence(self, slot: int, sequence: int):
+        OrderBookStore.sequence.pack_into(self.buffer, self._get_offset(slot) + OrderBookStore.sequence_offset, sequence)
+
+    def refresh_slots(self) -> Dict[str, int]:
+        """Reads symbol slots allocated by writer"""
+        symbol_count = self.get_symbol_count()
+
+        for slot in range(len(self.slots), symbol_count):
+            symbol = OrderBookStore.slot_header.unpack_from(self.buffer, self._get_offset(slot))[0]
+            self.slots[symbol.rstrip(b"\0").decode()] = slot
+
+        return self.slots
+
+    def _allocate_slot(self, symbol: str) -> Optional[int]:
+        """Allocates a slot for a new symbol. Returns None when store is full"""
+        slot = self.get_symbol_count()
+        if slot >= self.max_symbols:
+            return None
+
+        OrderBookStore.slot_header.pack_into(self.buffer, self._get_offset(slot), symbol.encode(), 0, 0, -1, 0, 0, 0)
+
+        # symbol count is published after slot is initialized
+        OrderBookStore.header.pack_into(self.buffer, 0, OrderBookStore.magic, self.max_symbols, self.max_depth, slot + 1)
+        self.slots[symbol] = slot
+        return slot
+
+    def write(self, snapshot: OrderBookSnapshot) -> bool:
+        """Writes order book snapshot to its symbol's slot. Levels deeper than max depth are dropped.
+        Returns False when there is no free slot for a new symbol. Must be called from a single writer"""
+        slot = self.slots.get(snapshot.symbol)
+        if slot is None:
+            slot = self._allocate_slot(snapshot.symbol)
+            if slot is None:
+                return False
+
+        offset = self._get_offset(slot)
+        sequence = self.get_sequence(slot)
+        bid_count = min(len(snapshot.bids), self.max_depth)
+        ask_count = min(len(snapshot.asks), self.max_depth)
+        event_time = snapshot.event_time if snapshot.event_time is not None else -1
+
+        # odd sequence: readers wait until write completes
+        self._set_sequence(slot, sequence + 1)
+
+        OrderBookStore.slot_header.pack_into(self.buffer, offset, snapshot.symbol.encode(), sequence + 1,
+            snapshot.version, event_time, snapshot.received_time, bid_count, ask_count)
+
+        arrays = self._get_arrays(slot, bid_count, ask_count)
+        for levels, views, count in ((snapshot.bids, arrays[:4], bid_count), (snapshot.asks, arrays[4:], ask_count)):
+            views[0][:] = levels.prices[:count]
+            views[1][:] = levels.quantities[:count]
+            views[2][:] = levels.cumulative_quantities[:count]
+            views[3][:] = levels.cumulative_volumes[:count]
+
+        # even sequence: write completed
+        self._set_sequence(slot, sequence + 2)
+        return True
+
+    def _get_arrays(self, slot: int, bid_count: int, ask_count: int) -> List[memoryview]:
+        """Views of slot's 8 arrays limited to level counts"""
+        start = self._get_offset(slot) + OrderBookStore.slot_header.size
+        array_size = self.max_depth * 8
+        views = []
+
+        for index in range(OrderBookStore.arrays_per_slot):
+            count = bid_count if index < 4 else ask_count
+            array_start = start + index * array_size
+            views.append(self.buffer[array_start:array_start + count * 8].cast('d'))
+
+        return views
+
+    def read(self, slot: int) -> Tuple[int, OrderBookSnapshot]:
+        """Reads slot without copying level arrays. Returns sequence at read start and snapshot.
+        Snapshot is consistent only if slot's sequence is still the same after it is used"""
+        while True:
+            symbol, sequence, version, event_time, received_time, bid_count, ask_count = \
+                OrderBookStore.slot_header.unpack_from(self.buffer, self._get_offset(slot))
+
+            # writer is in progress
+            if sequence % 2 == 1 or bid_count > self.max_depth or ask_count > self.max_depth:
+                time.sleep(0)
+                continue
+
+            arrays = self._get_arrays(slot, bid_count, ask_count)
+            snapshot = OrderBookSnapshot(
+                symbol.rstrip(b"\0").decode(),
+                PriceLevels.wrap(*arrays[:4]),
+                PriceLevels.wrap(*arrays[4:]),
+                version,
+                event_time if event_time >= 0 else None,
+                received_time)
+
+            return sequence, snapshot
+
+
+class OrderBookStoreWriter(OrderBookObserver):
+    """Writes received order books to an order book store"""
+
+    def __init__(self, store: OrderBookStore):
+        self.store = store
+
+        self.versions: Dict[str, int] = {}
+        """Last written version by symbol"""
+
+    def on_order_book_received(self, order_book: LimitOrderBook):
+        version = self.versions.get(order_book.symbol, 0) + 1
+        self.versions[order_book.symbol] = version
+
+        snapshot = OrderBookSnapshot(
+            order_book.symbol,
+            PriceLevels.of(order_book.bids),
+            PriceLevels.of(order_book.asks),
+            version,
+            order_book.event_time,
+            order_book.received_time if order_book.received_time is not None else time.time())
+
+        if not self.store.write(snapshot):
+            print(f"Order book store is full, '{order_book.symbol}' is not stored")
+
+
+class OrderBookStoreView(Mapping):
+    """Read-only order book snapshots by symbol over an order book store.
+    Snapshots read by current thread are tracked so that a calculation can be validated against concurrent writes"""
+
+    def __init__(self, store: OrderBookStore):
+        self.store = store
+        self.local = threading.local()
+
+    def _get_slots(self) -> Dict[str, int]:
+        slots = self.store.slots
+        if len(slots) != self.store.get_symbol_count():
+            slots = self.store.refresh_slots()
+        return slots
+
+    def __getitem__(self, symbol: str) -> OrderBookSnapshot:
+        slot = self._get_slots()[symbol]
+        sequence, snapshot = self.store.read(slot)
+
+        reads = getattr(self.local, "reads", None)
+        if reads is not None:
+            reads.append((slot, sequence))
+
+        return snapshot
+
+    def __contains__(self, symbol) -> bool:
+        return symbol in self._get_slots()
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._get_slots()))
+
+    def __len__(self) -> int:
+        return len(self._get_slots())
+
+    def begin_read(self):
+        """Starts tracking snapshots read by current thread"""
+        self.local.reads = []
+
+    def end_read(self) -> bool:
+        """Stops tracking. Returns wether every snapshot read since begin is still unchanged"""
+        reads = self.local.reads
+        self.local.reads = None
+        return all(self.store.get_sequence(slot) == sequence for slot, sequence in reads)
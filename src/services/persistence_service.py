@@ -0,0 +1,132 @@
+import asyncio, mmap, os
+from array import array
+from typing import Collection, Dict, List, Mapping, Optional
+from models.order_book import OrderBookSnapshot, PriceLevels
+from services.order_book_store import OrderBookStore
+
+class OrderBookPersister:
+    """Periodically writes latest order book snapshots to a memory-mapped file laid out as an order book store,
+    so that a restarted service can quote from last known order books until fresh ones are received.
+    Writes are plain memory copies, the operating system flushes dirty pages to the file"""
+
+    def __init__(self, path: str, max_symbols: int, max_depth: int = 1000, interval: float = 1.0):
+        self.path = path
+        self.max_symbols = max_symbols
+        self.max_depth = max_depth
+
+        self.interval = interval
+        """Seconds between writes of changed order books"""
+
+        self.file = None
+        self.mmap: mmap.mmap = None
+        self.buffer: memoryview = None
+        self.store: OrderBookStore = None
+
+        self.versions: Dict[str, int] = {}
+        """Last written version by symbol"""
+
+        self.task: asyncio.Task = None
+
+    def load(self, symbols: Collection[str] = None) -> List[OrderBookSnapshot]:
+        """Reads order books persisted by a previous run, optionally only of given symbols.
+        Returns no order books when file does not exist or is not an order book store"""
+        if not os.path.exists(self.path) or os.path.getsize(self.path) < OrderBookStore.header.size:
+            return []
+
+        with open(self.path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            with memoryview(buffer) as view:
+                return OrderBookPersister._read_all(view, symbols)
+
+    @staticmethod
+    def _read_all(view: memoryview, symbols: Optional[Collection[str]]) -> List[OrderBookSnapshot]:
+        """Copies valid order books out of a store buffer"""
+        try:
+            store = OrderBookStore(view)
+        except ValueError:
+            return []
+
+        snapshots = []
+        for symbol, slot in store.refresh_slots().items():
+            # odd sequence is a write interrupted by a crash
+            if (symbols is not None and symbol not in symbols) or store.get_sequence(slot) % 2 == 1:
+                continue
+
+            snapshots.append(OrderBookPersister._copy(store.read(slot)[1]))
+
+        return snapshots
+
+    @staticmethod
+    def _copy(snapshot: OrderBookSnapshot) -> OrderBookSnapshot:
+        """Copies levels out of mapped file"""
+        def copy_levels(levels: PriceLevels) -> PriceLevels:
+            return PriceLevels.wrap(*(array('d', values) for values in
+                (levels.prices, levels.quantities, levels.cumulative_quantities, levels.cumulative_volumes)))
+
+        return OrderBookSnapshot(snapshot.symbol, copy_levels(snapshot.bids), copy_levels(snapshot.asks),
+            snapshot.version, snapshot.event_time, snapshot.received_time)
+
+    def open(self):
+        """Maps persistence file for writing. An existing store of the same layout keeps its slots,
+        otherwise file is recreated"""
+        size = OrderBookStore.get_size(self.max_symbols, self.max_depth)
+        existing = os.path.exists(self.path) and os.path.getsize(self.path) == size
+
+        self.file = open(self.path, "r+b" if existing else "w+b")
+        self.file.truncate(size)
+        self.mmap = mmap.mmap(self.file.fileno(), size)
+        self.buffer = memoryview(self.mmap)
+
+        if existing:
+            try:
+                store = OrderBookStore(self.buffer)
+                if (store.max_symbols, store.max_depth) == (self.max_symbols, self.max_depth):
+                    self.store = store
+                    self.store.refresh_slots()
+                    return self
+            except ValueError:
+                pass
+
+        self.store = OrderBookStore(self.buffer, self.max_symbols, self.max_depth)
+        return self
+
+    def persist(self, order_books: Mapping[str, OrderBookSnapshot]):
+        """Writes order books updated since last write. Restored order books are not written back"""
+        for symbol, snapshot in list(order_books.items()):
+            if snapshot.restored or self.versions.get(symbol) == snapshot.version:
+                continue
+
+            if self.store.write(snapshot):
+                self.versions[symbol] = snapshot.version
+
+    async def _run(self, order_books: Mapping[str, OrderBookSnapshot]):
+        while True:
+            await asyncio.sleep(self.interval)
+            self.persist(order_books)
+
+    def start(self, order_books: Mapping[str, OrderBookSnapshot]):
+        """Starts writing given order books every interval on running event loop"""
+        if self.store is None:
+            self.open()
+        self.task = asyncio.create_task(self._run(order_books))
+
+    async def stop(self, order_books: Optional[Mapping[str, OrderBookSnapshot]] = None):
+        """Stops periodic writes, writes given order books a last time and closes file"""
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+        if self.store is None:
+            return
+
+        if order_books is not None:
+            self.persist(order_books)
+
+        self.store = None
+        self.buffer.release()
+        self.mmap.flush()
+        self.mmap.close()
+        self.file.close()
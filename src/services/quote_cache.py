@@ -0,0 +1,106 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, NamedTuple, Optional, Set
+from models.order_book import OrderBookSnapshot
+from models.quote import QuoteRequest, QuoteResponse
+
+class QuoteCacheEntry(NamedTuple):
+    """Cached quote and the order book snapshot it is priced against"""
+    snapshot: OrderBookSnapshot
+    response: QuoteResponse
+
+
+class QuoteCache:
+    """Bounded LRU cache of quote responses. Entries are valid only for the order book version they are priced against
+    and are invalidated per symbol when a new order book is published. Unchanged order books do not invalidate them"""
+
+    def __init__(self, max_size=10000):
+        self.max_size = max_size
+        """Maximum number of cached quotes, least recently used quotes are evicted first"""
+
+        self.entries: "OrderedDict[Hashable, QuoteCacheEntry]" = OrderedDict()
+        """Cached quotes by request key in least recently used order"""
+
+        self.keys_by_symbol: Dict[str, Set[Hashable]] = {}
+        """Request keys of cached quotes by order book symbol"""
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+        self.lock = threading.Lock()
+        """Guards entries that are shared by http threads and websocket thread"""
+
+    @staticmethod
+    def get_key(request: QuoteRequest) -> Hashable:
+        """Cache key of request. Currencies are case insensitive. Freshness parameters are checked on hit instead"""
+        return (request.action, request.base_currency.upper(), request.quote_currency.upper(), request.amount,
+            request.venue_breakdown)
+
+    def get(self, request: QuoteRequest, order_books: Dict[str, OrderBookSnapshot]) -> Optional[QuoteCacheEntry]:
+        """Gets cached quote if it is priced against currently published order book"""
+        key = QuoteCache.get_key(request)
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            # order book may be replaced after quote is calculated but before it is cached.
+            # An unchanged order book is republished with the same version and levels and a new receive time
+            snapshot = order_books.get(entry.snapshot.symbol)
+            if snapshot is not entry.snapshot and (snapshot is None or snapshot.version != entry.snapshot.version
+                or snapshot.bids is not entry.snapshot.bids or snapshot.asks is not entry.snapshot.asks):
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry if snapshot is entry.snapshot else QuoteCacheEntry(snapshot, entry.response)
+
+    def put(self, request: QuoteRequest, snapshot: OrderBookSnapshot, response: QuoteResponse):
+        """Caches quote priced against given order book snapshot"""
+        key = QuoteCache.get_key(request)
+
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self._discard_key(previous.snapshot.symbol, key)
+
+            self.entries[key] = QuoteCacheEntry(snapshot, response)
+            self.keys_by_symbol.setdefault(snapshot.symbol, set()).add(key)
+
+            while len(self.entries) > self.max_size:
+                evicted_key, evicted = self.entries.popitem(last=False)
+                self._discard_key(evicted.snapshot.symbol, evicted_key)
+                self.evictions += 1
+
+    def _discard_key(self, symbol: str, key: Hashable):
+        keys = self.keys_by_symbol.get(symbol)
+        if keys is not None:
+            keys.discard(key)
+
+    def invalidate(self, symbol: str):
+        """Removes all quotes priced against given symbol's order book"""
+        with self.lock:
+            keys = self.keys_by_symbol.pop(symbol, None)
+            if not keys:
+                return
+
+            for key in keys:
+                self.entries.pop(key, None)
+
+            self.invalidations += len(keys)
+
+    def get_stats(self) -> Dict[str, int]:
+        """Hit, miss, eviction and invalidation counters and current size"""
+        return {
+            "size": len(self.entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
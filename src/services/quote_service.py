@@ -1,135 +1,441 @@
-from typing import List, Dict, Union
-from models.quote import QuoteRequest, QuoteResponse
-from models.order_book import LimitOrder, LimitOrderBook
+import time
+from dataclasses import replace
+from decimal import Decimal
+from typing import Dict, List, Mapping, Optional, Set, Tuple, Union
+from models.quote import QuoteRequest, QuoteResponse, PriceImpactRequest, PriceImpactResponse, PriceImpactPoint
+from models.order_book import LimitOrderBook, OrderBookSnapshot, PriceLevels, VenuePriceLevels, FixedPointPriceLevels
 from services.price_service import OrderBookObserver
+from services.quote_cache import QuoteCache
+from services.history_service import OrderBookHistoryService
+from services.route_service import CurrencyRouter, RouteHop
+from services.tracing_service import current_trace
 
-class QuoteService(OrderBookObserver):
-    """Stores order books in memory and calculates best price for given quote request"""
-    def __init__(self):
-        self.order_books: Dict[str, LimitOrderBook] = {}
-        
-    def on_order_book_received(self, order_book:LimitOrderBook):
-        self.order_books[order_book.symbol] = order_book
+class QuoteCalculator:
+    """Calculates best price for given quote request on order books that another component publishes"""
+    def __init__(self, cache: QuoteCache = None, router: CurrencyRouter = None, history: OrderBookHistoryService = None):
+        self.order_books: Dict[str, OrderBookSnapshot] = {}
+        """Latest published order book snapshots by symbol. 
+        Snapshots are immutable and replaced with a single assignment, so readers need no locking"""
+
+        self.cache = cache
+        """Caches quotes until their order book is replaced. Disabled when None"""
+
+        self.router = router
+        """Finds routes through intermediate currencies for pairs without an order book. Disabled when None"""
+
+        self.history = history
+        """Recent order books of each symbol that windowed quotes are averaged over. Disabled when None.
+        Must be notified of order books by the same source as quote service"""
+
+        self.quoted_symbols: Optional[Set[str]] = None
+        """Symbols quoted since it was last replaced, so that idle symbols can be unsubscribed. Not recorded when None"""
+
+    def get_order_book(self, symbol: str, min_version: int = None, max_age: float = None, allow_stale=False) -> Union[OrderBookSnapshot, str]:
+        """Gets latest snapshot of symbol. Returns error message str if it does not exist, is older than 
+        given minimum version or maximum age in seconds, or is restored and stale order books are not allowed"""
+        snapshot = self.order_books.get(symbol)
+
+        if snapshot is None:
+            return f"Order book '{symbol}' is not received"
+
+        return QuoteCalculator._check_freshness(snapshot, min_version, max_age, allow_stale) or snapshot
+
+    def _get_order_books_view(self) -> Mapping[str, OrderBookSnapshot]:
+        """Order books that a multi book calculation reads from"""
+
+        # order books are replaced on update, so a shallow copy is a consistent view of all symbols
+        return dict(self.order_books)
 
     @staticmethod
-    def _get_total_quantity(orders: List[LimitOrder])-> float:
-        """Total quantity in orders"""
-        return sum(order.quantity for order in orders)
-    
-    @staticmethod
-    def _get_total_volume(orders: List[LimitOrder])-> float:
-        """Total quantity*price of orders"""
-        return sum(order.price * order.quantity for order in orders)
-    
-    @staticmethod
-    def _get_weighted_avg_price(orders: List[LimitOrder])-> float:
-        """Avg filled price"""
-        total_quantity = QuoteService._get_total_quantity(orders)
-        total_volume = QuoteService._get_total_volume(orders)
+    def _check_freshness(snapshot: OrderBookSnapshot, min_version: Optional[int], max_age: Optional[float], allow_stale=False) -> Optional[str]:
+        """Returns error message when snapshot is older than given minimum version or maximum age,
+        or when it is restored from a previous run and stale order books are not allowed"""
+        if snapshot.restored and not allow_stale:
+            return f"Order book '{snapshot.symbol}' is restored from a previous run and not updated yet. " + \
+                "Set allow_stale to accept it"
 
-        if total_quantity == 0:
-            return 0
+        if min_version is not None and snapshot.version < min_version:
+            return f"Order book '{snapshot.symbol}' version {snapshot.version} is older than requested minimum version {min_version}"
 
-        return total_volume / total_quantity
+        if max_age is not None:
+            age = snapshot.get_age()
+            if age > max_age:
+                return f"Order book '{snapshot.symbol}' is {age:.3f} seconds old, older than requested maximum age {max_age}"
 
-        
-    def quote(self, request:QuoteRequest) -> Union[QuoteResponse, str]:
-        """Calculates weighted avg price that fills given quote request. 
-        Returns calculation result QuoteResponse or error message str"""
+        return None
+
+    @staticmethod
+    def _resolve(request: QuoteRequest, order_books: Mapping[str, OrderBookSnapshot]) -> Union[Tuple[OrderBookSnapshot, bool], str]:
+        """Finds order book of requested symbol. 
+        Returns order book and wether it uses reversed symbol or error message str"""
 
         symbol = request.get_symbol()
         symbol_reversed = request.get_symbol(reversed=True)
 
-        if symbol in self.order_books:
-            order_book = self.order_books[symbol]
-            uses_reverse_symbol = False
+        if symbol in order_books:
+            order_book, uses_reverse_symbol = order_books[symbol], False
 
-        elif symbol_reversed in self.order_books:
-            order_book = self.order_books[symbol_reversed]
-            uses_reverse_symbol = True
+        elif symbol_reversed in order_books:
+            order_book, uses_reverse_symbol = order_books[symbol_reversed], True
 
         # when given symbol is not exist on order books
         else:
-            valid_symbols = list(self.order_books.keys())
+            valid_symbols = list(order_books.keys())
 
             # error message
             return \
                 f"Quote requested symbol '{symbol}' or '{symbol_reversed}' is not valid or not configured on watchlist. " + \
                 f"Current order book symbols are '{','.join(valid_symbols)}'"
 
-        # current best offers on order book due to action
+        return QuoteCalculator._check_freshness(order_book, request.min_version, request.max_age, request.allow_stale) or \
+            (order_book, uses_reverse_symbol)
+
+    @staticmethod
+    def _get_offers(request: QuoteRequest, order_book: OrderBookSnapshot) -> PriceLevels:
+        """Current best offers on order book due to action"""
         if request.action == "buy":
-            offers = order_book.asks
+            return order_book.asks
         else:
-            offers = order_book.bids
-        
-        # order book depth
-        levels = len(offers)
+            return order_book.bids
+
+    @staticmethod
+    def _to_response(request: QuoteRequest, fill: Optional[Tuple[float, float]], uses_reverse_symbol: bool, version: int) -> Union[QuoteResponse, str]:
+        """Converts filled (quantity, volume) to quote response"""
+
+        # error on no match
+        if fill is None:
+            return f"Order book is not liquid enough to fill your request. "
+
+        # total quantity and volume of filled orders that cover request
+        total_fill_quantity, total_fill_volume = fill
+
+        # avg fill price of filled orders that cover request
+        # amount of zero or below one quantity step fills nothing, fixed point prices stay Decimals
+        if total_fill_quantity != 0:
+            avg_fill_price = total_fill_volume / total_fill_quantity
+        else:
+            avg_fill_price = Decimal(0) if isinstance(total_fill_volume, Decimal) else 0
+
+        if uses_reverse_symbol:
+            return QuoteResponse(total_fill_quantity, avg_fill_price, request.quote_currency, version)
+        else:
+            return QuoteResponse(total_fill_volume, avg_fill_price, request.quote_currency, version)
+
+    @staticmethod
+    def _flag_stale(response: Union[QuoteResponse, str], order_book: OrderBookSnapshot):
+        """Adds age of a restored order book to response"""
+        if order_book.restored and isinstance(response, QuoteResponse):
+            response.stale_age = order_book.get_age()
+
+    @staticmethod
+    def _round_price(response: Union[QuoteResponse, str], offers: PriceLevels):
+        """Rounds average price of a fixed point order book to its tick precision"""
+        if isinstance(offers, FixedPointPriceLevels) and isinstance(response, QuoteResponse):
+            response.price = offers.round_price(response.price)
+
+    @staticmethod
+    def _add_venue_breakdown(request: QuoteRequest, response: Union[QuoteResponse, str], offers: PriceLevels, uses_reverse_symbol: bool):
+        """Splits response's fill by venue when requested and order book is consolidated"""
+        if not request.venue_breakdown or not isinstance(offers, VenuePriceLevels) or not isinstance(response, QuoteResponse):
+            return
+
+        fills = offers.fill_by_venue(request.amount, by_volume=uses_reverse_symbol)
+
+        # (amount, total) in requested currencies like response total
+        response.venues = {venue: (volume, quantity) if uses_reverse_symbol else (quantity, volume)
+            for venue, (quantity, volume) in fills.items()}
+
+    def quote(self, request:QuoteRequest) -> Union[QuoteResponse, str]:
+        """Calculates weighted avg price that fills given quote request. 
+        Returns calculation result QuoteResponse or error message str"""
+
+        if request.window is not None:
+            return self._quote_window(request)
+
+        # stages are marked only for sampled requests
+        trace = current_trace.get()
+
+        # same request on the same order book version
+        if self.cache is not None:
+            cached = self.cache.get(request, self.order_books)
+            if cached is not None and QuoteCalculator._check_freshness(cached.snapshot, request.min_version, request.max_age, request.allow_stale) is None:
+                if trace is not None:
+                    trace.mark("cache")
+                if self.quoted_symbols is not None:
+                    self.quoted_symbols.add(cached.snapshot.symbol)
+
+                # key is case insensitive, response currency is spelled as requested like uncached quotes
+                if cached.response.currency != request.quote_currency:
+                    return replace(cached.response, currency=request.quote_currency)
+                return cached.response
+
+        resolved = QuoteCalculator._resolve(request, self.order_books)
+        if trace is not None:
+            trace.mark("resolve")
+
+        if isinstance(resolved, str):
+            response = self._quote_route(request, resolved, self._get_order_books_view())
+            if trace is not None:
+                trace.mark("route")
+            return response
+
+        order_book, uses_reverse_symbol = resolved
+        offers = QuoteCalculator._get_offers(request, order_book)
+        if self.quoted_symbols is not None:
+            self.quoted_symbols.add(order_book.symbol)
+
+        # when using reversed symbol fill calcuations based on volume (quantity*price)
+        # when using standard symbol fill calculations based on quantity
+        fill = offers.fill(request.amount, by_volume=uses_reverse_symbol)
 
-        # aggregated quantity and amount sizes in order book
-        total_quantity = 0
-        total_volume = 0
+        response = QuoteCalculator._to_response(request, fill, uses_reverse_symbol, order_book.version)
+        QuoteCalculator._round_price(response, offers)
+        QuoteCalculator._add_venue_breakdown(request, response, offers, uses_reverse_symbol)
+        QuoteCalculator._flag_stale(response, order_book)
+        if trace is not None:
+            trace.mark("fill")
 
-        # aggregated quantity and amount sizes completely covered request
-        is_fill_completed = False
+        # age of a restored order book changes while it is cached
+        if self.cache is not None and isinstance(response, QuoteResponse) and not order_book.restored:
+            self.cache.put(request, order_book, response)
 
-        # matched price levels that fill request
-        filled_orders: List[LimitOrder] = []
+        return response
 
-        for i in range(levels):
-            total_quantity += offers[i].quantity
-            total_volume += offers[i].quantity * offers[i].price
+    def quote_batch(self, requests: List[QuoteRequest]) -> List[Union[QuoteResponse, str]]:
+        """Calculates quotes of all requests against the same order book of each symbol.
+        Requests on the same order book side are filled with a single pass over its levels.
+        Returns QuoteResponse or error message str for each request in given order"""
 
-            # when using reversed symbol fill calcuations based on volume (quantity*price)
-            if uses_reverse_symbol:
-                # check at current level reached sufficient amount of volume (quantity*price) to fill request
-                is_fill_completed = total_volume >= request.amount
+        order_books = self._get_order_books_view()
+        responses: List[Union[QuoteResponse, str]] = [None] * len(requests)
 
-                if is_fill_completed:
-                    # last required partial volume to complete request
-                    volume_left = request.amount - QuoteService._get_total_volume(filled_orders)
+        # request indexes grouped by (symbol, action, uses reversed symbol)
+        groups: Dict[Tuple[str, str, bool], List[int]] = {}
 
-                    # last required quantity to complete request
-                    quantity_left = volume_left / offers[i].price
+        for index, request in enumerate(requests):
+            if request.window is not None:
+                responses[index] = self._quote_window(request)
+                continue
 
-                    # current last price level partially added
-                    filled_orders.append(LimitOrder(offers[i].price, quantity_left))
+            resolved = QuoteCalculator._resolve(request, order_books)
+            if isinstance(resolved, str):
+                responses[index] = self._quote_route(request, resolved, order_books)
+                continue
 
-                else:
-                    # current price level completely added
-                    filled_orders.append(offers[i])
+            order_book, uses_reverse_symbol = resolved
+            groups.setdefault((order_book.symbol, request.action, uses_reverse_symbol), []).append(index)
 
-            # when using standard symbol fill calculations based on quantity
+        if self.quoted_symbols is not None:
+            self.quoted_symbols.update(symbol for symbol, _, _ in groups)
+
+        for (symbol, action, uses_reverse_symbol), indexes in groups.items():
+            offers = QuoteCalculator._get_offers(requests[indexes[0]], order_books[symbol])
+            fills = offers.fill_many([requests[index].amount for index in indexes], by_volume=uses_reverse_symbol)
+
+            for index, fill in zip(indexes, fills):
+                responses[index] = QuoteCalculator._to_response(requests[index], fill, uses_reverse_symbol, order_books[symbol].version)
+                QuoteCalculator._round_price(responses[index], offers)
+                QuoteCalculator._add_venue_breakdown(requests[index], responses[index], offers, uses_reverse_symbol)
+                QuoteCalculator._flag_stale(responses[index], order_books[symbol])
+
+        return responses
+
+    def _quote_window(self, request: QuoteRequest) -> Union[QuoteResponse, str]:
+        """Averages fills of request over order books of the requested history window, either weighted by
+        seconds each order book was live or equally per order book. Routes are not supported"""
+        if self.history is None:
+            return "Order book history is disabled"
+
+        symbol = request.get_symbol()
+        history, uses_reverse_symbol = self.history.get_history(symbol), False
+        if history is None:
+            history, uses_reverse_symbol = self.history.get_history(request.get_symbol(reversed=True)), True
+
+        if history is None:
+            return f"Order book history of '{symbol}' or '{request.get_symbol(reversed=True)}' is not recorded"
+
+        # buyer fills asks, seller fills bids
+        end_time = time.time()
+        fills = history.fill_window(1 if request.action == "buy" else 0, request.amount, uses_reverse_symbol,
+            end_time - request.window, end_time, request.window_average == "twap")
+
+        if not fills:
+            return f"No order book of '{history.symbol}' is recorded in the last {request.window} seconds"
+
+        if any(fill is None for _, fill in fills):
+            return "Order book is not liquid enough to fill your request at every order book of window. "
+
+        responses = [(weight, QuoteCalculator._to_response(request, fill, uses_reverse_symbol, None)) for weight, fill in fills]
+
+        # a single order book received at window end has no live time
+        total_weight = sum(weight for weight, _ in responses)
+        if total_weight == 0:
+            responses = [(1, response) for _, response in responses]
+            total_weight = len(responses)
+
+        total = sum(weight * response.total for weight, response in responses) / total_weight
+        price = sum(weight * response.price for weight, response in responses) / total_weight
+        return QuoteResponse(total, price, request.quote_currency, snapshots=len(responses))
+
+    def price_impact(self, request: PriceImpactRequest) -> Union[PriceImpactResponse, str]:
+        """Fills each requested amount on one side of symbol's order book with a single pass over its levels.
+        Returns average price, total and slippage against top of book of each amount or error message str"""
+        order_book = self.get_order_book(request.symbol, request.min_version, request.max_age)
+        if isinstance(order_book, str):
+            return order_book
+
+        offers = order_book.asks if request.action == "buy" else order_book.bids
+        if len(offers) == 0:
+            return f"Order book '{request.symbol}' has no offers to {request.action}"
+
+        top_price = offers[0].price
+        fixed_point = isinstance(offers, FixedPointPriceLevels)
+        points = []
+
+        for amount, fill in zip(request.amounts, offers.fill_many(request.amounts)):
+            if fill is None:
+                points.append(PriceImpactPoint(amount))
+                continue
+
+            # amount below one quantity step fills nothing at top of book
+            quantity, volume = fill
+            if quantity != 0:
+                price = volume / quantity
             else:
-                # check at current level reached sufficient amount of quantity to fill request
-                is_fill_completed = total_quantity >= request.amount
+                price = Decimal(repr(top_price)) if fixed_point else top_price
 
-                if is_fill_completed:
-                    # last required partial quantity to complete request
-                    quantity_left = request.amount - QuoteService._get_total_quantity(filled_orders)
+            if fixed_point:
+                price = offers.round_price(price)
 
-                    # current last price level partially added
-                    filled_orders.append(LimitOrder(offers[i].price, quantity_left))
+            # buyer pays more and seller receives less than top of book
+            difference = float(price) - top_price if request.action == "buy" else top_price - float(price)
+            points.append(PriceImpactPoint(amount, volume, price, difference / top_price))
 
-                else:
-                    # current price level completely added
-                    filled_orders.append(offers[i])
+        return PriceImpactResponse(request.symbol, request.action, top_price, points, order_book.version)
 
+    def _quote_route(self, request: QuoteRequest, error_message: str, order_books: Mapping[str, OrderBookSnapshot]) -> Union[QuoteResponse, str]:
+        """Quotes request through intermediate currencies when pair has no order book.
+        Returns best route's response or given error message when there is no route"""
 
-            if is_fill_completed:
-                # avg fill price of filled orders that cover request
-                avg_fill_price = QuoteService._get_weighted_avg_price(filled_orders)
+        # pair has an order book but it is rejected by freshness parameters
+        if self.router is None or request.get_symbol() in order_books or request.get_symbol(reversed=True) in order_books:
+            return error_message
 
-                # total volume of filled orders that cover request
-                total_fill_volume = QuoteService._get_total_volume(filled_orders)
+        routes = self.router.get_routes(request.base_currency, request.quote_currency)
+        best_response: Optional[QuoteResponse] = None
 
-                # total quantity amount of filled orders that cover request
-                total_fill_quantity = QuoteService._get_total_quantity(filled_orders)
+        for route in routes:
+            response = QuoteCalculator._fill_route(request, route, order_books)
+            if isinstance(response, str):
+                error_message = response
+                continue
 
-                if uses_reverse_symbol:
-                    return QuoteResponse(total_fill_quantity, avg_fill_price, request.quote_currency)
-                else:
-                    return QuoteResponse(total_fill_volume, avg_fill_price, request.quote_currency)
-        
-        # error on no match
-        return f"Order book is not liquid enough to fill your request. "
\ No newline at end of file
+            # buyer pays the least, seller receives the most
+            if best_response is None or \
+                (response.total < best_response.total if request.action == "buy" else response.total > best_response.total):
+                best_response = response
+
+        if best_response is None:
+            return error_message
+
+        if self.quoted_symbols is not None:
+            self.quoted_symbols.update(best_response.route)
+
+        return best_response
+
+    @staticmethod
+    def _get_hop_offers(action: str, order_book: OrderBookSnapshot, uses_reverse_symbol: bool) -> PriceLevels:
+        """Offers that a route step converts on. A buy step receives its from currency and a sell step spends it.
+        On a reversed symbol from currency is the order book's quote currency, so the other side is taken"""
+        receives_base = (action == "buy") != uses_reverse_symbol
+        return order_book.asks if receives_base else order_book.bids
+
+    @staticmethod
+    def _fill_route(request: QuoteRequest, route: List[RouteHop], order_books: Mapping[str, OrderBookSnapshot]) -> Union[QuoteResponse, str]:
+        """Chains fills of route's order books. Each step's total is the next step's amount"""
+        amount = request.amount
+        versions: Dict[str, int] = {}
+        stale_age: Optional[float] = None
+
+        for hop in route:
+            hop_request = QuoteRequest(request.action, hop.from_currency, hop.to_currency, amount,
+                request.min_version, request.max_age, allow_stale=request.allow_stale)
+
+            resolved = QuoteCalculator._resolve(hop_request, order_books)
+            if isinstance(resolved, str):
+                return resolved
+
+            order_book, uses_reverse_symbol = resolved
+            fill = QuoteCalculator._get_hop_offers(request.action, order_book, uses_reverse_symbol).fill(amount, by_volume=uses_reverse_symbol)
+
+            if fill is None:
+                return f"Order book '{order_book.symbol}' is not liquid enough to fill your request. "
+
+            # received quantity on reversed symbol, received volume on standard symbol
+            quantity, volume = fill
+            amount = quantity if uses_reverse_symbol else volume
+            versions[order_book.symbol] = order_book.version
+
+            if order_book.restored:
+                stale_age = max(stale_age or 0, order_book.get_age())
+
+        # per unit price of base currency in quote currency, fixed point fills are exact decimals
+        requested_amount = Decimal(repr(request.amount)) if isinstance(amount, Decimal) else request.amount
+        price = amount / requested_amount if request.amount != 0 else 0
+        return QuoteResponse(amount, price, request.quote_currency, route=versions, stale_age=stale_age)
+
+
+class QuoteService(QuoteCalculator, OrderBookObserver):
+    """Stores order books in memory and calculates best price for given quote request"""
+
+    def on_order_book_received(self, order_book:LimitOrderBook):
+        previous = self.order_books.get(order_book.symbol)
+
+        # unchanged levels keep their version and cached quotes, only receive time is renewed
+        change = order_book.change
+        if change is not None and not change.is_changed() and previous is not None and not previous.restored:
+            self.order_books[order_book.symbol] = replace(previous,
+                event_time=order_book.event_time,
+                received_time=order_book.received_time if order_book.received_time is not None else time.time())
+            return
+
+        # cumulative sums are computed once per update instead of once per quote
+        snapshot = OrderBookSnapshot(
+            order_book.symbol,
+            PriceLevels.of(order_book.bids),
+            PriceLevels.of(order_book.asks),
+            previous.version + 1 if previous else 1,
+            order_book.event_time,
+            order_book.received_time if order_book.received_time is not None else time.time())
+
+        # atomic publish
+        self.order_books[order_book.symbol] = snapshot
+
+        # routes are rebuilt only when a new symbol is added
+        if previous is None and self.router is not None:
+            self.router.update_symbols(list(self.order_books.keys()))
+
+        if self.cache is not None:
+            self.cache.invalidate(order_book.symbol)
+
+    def restore(self, snapshot: OrderBookSnapshot):
+        """Publishes an order book persisted by a previous run until its symbol's first update.
+        Restored order books are quoted only for requests that allow stale order books"""
+        if snapshot.symbol in self.order_books:
+            return
+
+        self.order_books[snapshot.symbol] = replace(snapshot, restored=True)
+
+        if self.router is not None:
+            self.router.update_symbols(list(self.order_books.keys()))
+
+    def remove(self, symbol: str):
+        """Drops order book of a symbol that is no longer watched"""
+        if self.order_books.pop(symbol, None) is None:
+            return
+
+        if self.router is not None:
+            self.router.update_symbols(list(self.order_books.keys()))
+
+        if self.cache is not None:
+            self.cache.invalidate(symbol)
@@ -0,0 +1,114 @@
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+class RouteHop(NamedTuple):
+    """One conversion step of a route"""
+    from_currency: str
+    to_currency: str
+    symbol: str
+    """Order book symbol that step is filled on"""
+
+
+class CurrencyGraph:
+    """Conversion steps between currencies of a fixed symbol set and routes found on them"""
+
+    def __init__(self, symbols: frozenset, edges: Dict[str, List[RouteHop]]):
+        self.symbols = symbols
+        """Symbols that graph is built from"""
+
+        self.edges = edges
+        """Conversion steps by source currency"""
+
+        self.routes: Dict[Tuple[str, str], List[List[RouteHop]]] = {}
+        """Calculated routes by (from currency, to currency)"""
+
+    def get_routes(self, from_currency: str, to_currency: str, max_hops: int) -> List[List[RouteHop]]:
+        """Gets all routes from one currency to another up to maximum hops, shortest routes first"""
+        key = (from_currency, to_currency)
+        routes = self.routes.get(key)
+
+        if routes is None:
+            routes = self._find_routes(from_currency, to_currency, max_hops)
+            self.routes[key] = routes
+
+        return routes
+
+    def _find_routes(self, from_currency: str, to_currency: str, max_hops: int) -> List[List[RouteHop]]:
+        """Depth first search of routes that does not visit a currency twice"""
+        routes: List[List[RouteHop]] = []
+        path: List[RouteHop] = []
+        visited = {from_currency}
+
+        def visit(currency: str):
+            for hop in self.edges.get(currency, []):
+                if hop.to_currency in visited:
+                    continue
+
+                path.append(hop)
+
+                if hop.to_currency == to_currency:
+                    routes.append(list(path))
+                elif len(path) < max_hops:
+                    visited.add(hop.to_currency)
+                    visit(hop.to_currency)
+                    visited.discard(hop.to_currency)
+
+                path.pop()
+
+        visit(from_currency)
+        routes.sort(key=len)
+        return routes
+
+
+class CurrencyRouter:
+    """Builds a currency graph from order book symbols and finds conversion routes through intermediate currencies.
+    Routes are calculated once per currency pair and kept until the symbol set changes"""
+
+    def __init__(self, max_hops=2):
+        self.max_hops = max_hops
+        """Maximum number of order books that a route passes through"""
+
+        self.quote_currencies = ["USDT", "USDC", "FDUSD", "BUSD", "TUSD", "DAI",
+            "TRY", "EUR", "GBP", "BRL", "JPY", "BTC", "ETH", "BNB"]
+        """Known quote currencies used to split symbol names into base and quote currency"""
+
+        self.symbol_currencies: Dict[str, Tuple[str, str]] = {}
+        """Explicit (base currency, quote currency) of symbols that can not be split by known quote currencies"""
+
+        self.graph = CurrencyGraph(frozenset(), {})
+        """Currency graph of current symbol set. Replaced as a whole when symbol set changes"""
+
+    def split_symbol(self, symbol: str) -> Optional[Tuple[str, str]]:
+        """Splits symbol to (base currency, quote currency). Returns None if quote currency is unknown"""
+        if symbol in self.symbol_currencies:
+            return self.symbol_currencies[symbol]
+
+        # longest match first, 'FDUSD' is checked before 'USD' like currencies
+        for quote_currency in sorted(self.quote_currencies, key=len, reverse=True):
+            if symbol.endswith(quote_currency) and len(symbol) > len(quote_currency):
+                return symbol[:-len(quote_currency)], quote_currency
+
+        return None
+
+    def update_symbols(self, symbols: Iterable[str]):
+        """Rebuilds currency graph when symbol set is changed"""
+        symbols = frozenset(symbols)
+        if symbols == self.graph.symbols:
+            return
+
+        edges: Dict[str, List[RouteHop]] = {}
+        for symbol in sorted(symbols):
+            currencies = self.split_symbol(symbol)
+            if currencies is None:
+                continue
+
+            base_currency, quote_currency = currencies
+
+            # every order book converts in both directions
+            edges.setdefault(base_currency, []).append(RouteHop(base_currency, quote_currency, symbol))
+            edges.setdefault(quote_currency, []).append(RouteHop(quote_currency, base_currency, symbol))
+
+        self.graph = CurrencyGraph(symbols, edges)
+
+    def get_routes(self, from_currency: str, to_currency: str) -> List[List[RouteHop]]:
+        """Gets all routes from one currency to another up to maximum hops, shortest routes first"""
+        return self.graph.get_routes(from_currency.upper(), to_currency.upper(), self.max_hops)
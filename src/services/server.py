@@ -1,9 +1,31 @@
-import asyncio
+import asyncio, multiprocessing
+from functools import partial
+from multiprocessing.process import BaseProcess
+from multiprocessing.shared_memory import SharedMemory
 from typing import List
 from flask import Flask
-from services.exchange_service import BinanceSpotWebSocketClient
+from werkzeug.serving import BaseWSGIServer, make_server
+from services.exchange_service import ExchangeWebSocketClient, BinanceSpotWebSocketClient
+from utils.exchange_parser import get_fast_json_decoder
+from utils.feed_recorder import FeedRecorder
 from services.quote_service import QuoteService
-from controllers.quote_controller import create_controller
+from services.quote_cache import QuoteCache
+from services.route_service import CurrencyRouter
+from services.metrics_service import ServiceMetrics
+from services.subscription_service import QuoteSubscriptionService
+from services.ingestion_service import ShardedIngestion, INGESTION_MODES, create_binance_client
+from services.consolidation_service import OrderBookConsolidator
+from services.depth_service import SymbolPrecisionProvider, BinanceSpotPrecisionProvider
+from services.order_book_store import OrderBookStore, OrderBookStoreWriter
+from services.persistence_service import OrderBookPersister
+from services.history_service import OrderBookHistoryService
+from services.tracing_service import Tracer
+from services.watchlist_service import WatchlistService
+from services.worker_service import run_quote_worker
+from controllers.quote_controller import QuoteController, create_controller
+from controllers.http_server import AsyncHttpServer
+from controllers.subscription_server import QuoteSubscriptionServer
+from controllers.binary_server import BinaryQuoteServer
 from concurrent.futures import ThreadPoolExecutor
 
 class QuoteServer:
@@ -15,8 +37,63 @@ class QuoteServer:
         self.port = 5000
         """HTTP request controller's served port"""
 
+        self.quote_cache_size = 10000
+        """Maximum number of cached quotes per order book version. Cache is disabled when 0"""
+
+        self.max_route_hops = 2
+        """Maximum order books that a quote can be routed through when pair has no order book. Routing is disabled when 1"""
+
+        self.lazy_decoding = False
+        """Keeps received order book levels as raw strings until first quote and decodes messages with the fastest installed json library"""
+
+        self.conflate = False
+        """Processes only latest received order book of each stream when processing falls behind receiving"""
+
+        self.feed_recorder: FeedRecorder = None
+        """Records received websocket frames for replay. Disabled when None"""
+
+        self.metrics_enabled = True
+        """Serves in-process metrics at /metrics"""
+
+        self.metrics: ServiceMetrics = None
+        """Quote, ingestion and order book metrics of this process"""
+
+        self.fixed_point = False
+        """Stores order book levels as integers scaled by symbol precision and quotes exact decimals"""
+
+        self.precision_provider: SymbolPrecisionProvider = None
+        """Provides tick and step size decimals of symbols in fixed point mode"""
+
+        self.full_depth = False
+        """Maintains full depth local order books instead of listening partial order books"""
+
+        self.ingestion_shards = 1
+        """Number of websocket connections that watched symbols are split across. 
+        More connections are used when symbols exceed streams limit of one connection"""
+
+        self.ingestion_mode = "task"
+        """Where shard connections receive and parse: 'task' on the event loop, 'thread' on own threads, 'process' in own processes"""
+
+        self.ingestion: ShardedIngestion = None
+        """Websocket connections of all shards"""
+
+        self.redundant_connections = 1
+        """Parallel connections of each shard receiving the same streams, first arrival of each update wins"""
+
+        self.change_detection = False
+        """Skips conversion and republishing of order books whose levels equal previous order book of their symbol"""
+
         self.binance_client: BinanceSpotWebSocketClient = None
-        """Manages websocket connection to Binance - Spot Markets"""
+        """Manages websocket connection to Binance - Spot Markets. First shard's client, None in process mode"""
+
+        self.venue_clients: List[ExchangeWebSocketClient] = []
+        """Clients of other exchanges whose order books are consolidated with Binance order books"""
+
+        self.max_venue_age: float = None
+        """Seconds after which a venue is left out of consolidated order books. Never when None"""
+
+        self.consolidator: OrderBookConsolidator = None
+        """Merges order books of all venues per symbol when other venues are added"""
 
         self.quote_service: QuoteService = None
         """Stores order books in memory and calculates best price for given quote request"""
@@ -24,8 +101,93 @@ class QuoteServer:
         self.quote_controller: Flask = None
         """Handles with HTTP requests and redirects to quote service"""
 
+        self.http_server_mode = "flask"
+        """HTTP server that serves quote controller. 'flask' runs in a worker thread, 'asyncio' runs in the websocket event loop"""
+
+        self.http_server: AsyncHttpServer = None
+        """Serves quote controller on event loop when asyncio mode is selected"""
+
+        self.subscription_port: int = None
+        """Websocket port of streaming quote subscriptions. Disabled when None"""
+
+        self.subscription_server: QuoteSubscriptionServer = None
+        """Pushes changed results of standing quote requests"""
+
+        self.binary_port: int = None
+        """TCP port of binary quote protocol. Disabled when None"""
+
+        self.binary_socket_path: str = None
+        """Unix domain socket path of binary quote protocol. Disabled when None"""
+
+        self.binary_server: BinaryQuoteServer = None
+        """Serves quotes to co-located callers over length prefixed binary frames"""
+
         self.quote_controller_executor = ThreadPoolExecutor(max_workers=1)
 
+        self.quote_controller_server: BaseWSGIServer = None
+        """Flask development server running in executor, kept to be shut down on stop"""
+
+        self.worker_processes = 0
+        """Number of quote worker processes reading order books from shared memory. 
+        Quotes are served by this process when 0"""
+
+        self.shared_max_depth = 1000
+        """Maximum order book depth stored in shared memory"""
+
+        self.shared_max_symbols = 0
+        """Maximum number of symbols stored in shared memory. Number of watched symbols when 0"""
+
+        self.shared_memory: SharedMemory = None
+        """Order books written by this process and read by quote workers"""
+
+        self.workers: List[BaseProcess] = []
+        """Quote worker processes"""
+
+        self.warm_start_path: str = None
+        """File that latest order books are persisted to and restored from on start. Disabled when None"""
+
+        self.warm_start_interval = 1.0
+        """Seconds between writes of changed order books to warm start file"""
+
+        self.warm_start_max_depth = 1000
+        """Maximum order book depth persisted to warm start file"""
+
+        self.persister: OrderBookPersister = None
+        """Persists latest order books to a memory-mapped file and restores them on start"""
+
+        self.history_capacity = 0
+        """Recent order books kept per symbol for windowed quotes and history lookups. Disabled when 0"""
+
+        self.history_max_depth = 100
+        """Levels kept per order book side in history"""
+
+        self.trace_sample_rate = 0.0
+        """Fraction of quote requests and feed messages whose stage timings are traced. Disabled when 0"""
+
+        self.trace_capacity = 1000
+        """Latest traces kept for /admin/traces"""
+
+        self.tracer: Tracer = None
+        """Samples stage timings of quote requests and feed messages of this process"""
+
+        self.lazy_subscriptions = False
+        """Subscribes pairs on their first quote and unsubscribes them when they are not quoted for idle timeout"""
+
+        self.lazy_wait = 2.0
+        """Seconds first quote of a lazily subscribed pair waits for its order book"""
+
+        self.lazy_idle_timeout = 300.0
+        """Seconds without quotes after which a lazily subscribed symbol is unsubscribed"""
+
+        self.max_lazy_symbols = 200
+        """Maximum symbols subscribed by quotes at the same time"""
+
+        self.max_lazy_rate = 2.0
+        """Maximum lazy subscriptions per second"""
+
+        self.watchlist: WatchlistService = None
+        """Subscribes and unsubscribes symbols at runtime. None with process shards"""
+
     def set_symbols(self, symbols: List[str]):
         """Sets watchlist, will connect streams of given symbols"""
         self.symbols = symbols
@@ -36,29 +198,375 @@ class QuoteServer:
         self.port = port
         return self
 
+    def set_quote_cache_size(self, quote_cache_size: int):
+        """Sets maximum number of cached quotes. 0 disables quote cache"""
+        self.quote_cache_size = quote_cache_size
+        return self
+
+    def set_max_route_hops(self, max_route_hops: int):
+        """Sets maximum order books that a quote can be routed through. 1 disables routing"""
+        self.max_route_hops = max_route_hops
+        return self
+
+    def set_lazy_decoding(self, lazy_decoding: bool = True):
+        """Defers order book level conversion until first read and uses orjson when it is installed"""
+        self.lazy_decoding = lazy_decoding
+        return self
+
+    def set_conflation(self, conflate: bool = True):
+        """Decouples receiving from processing and drops superseded order book messages"""
+        self.conflate = conflate
+        return self
+
+    def set_feed_recording(self, path: str, compress: bool = False, max_bytes: int = None):
+        """Records received websocket frames to given log file, optionally gzip compressed and rotated after max bytes"""
+        self.feed_recorder = FeedRecorder(path, compress, max_bytes)
+        return self
+
+    def set_metrics(self, metrics_enabled: bool = True):
+        """Enables /metrics endpoint in Prometheus text format"""
+        self.metrics_enabled = metrics_enabled
+        return self
+
+    def set_fixed_point(self, fixed_point: bool = True, precision_provider: SymbolPrecisionProvider = None):
+        """Enables fixed point order books scaled by each symbol's tick and step size from Binance exchange info
+        unless another provider is given. Symbols without provided precision use decimals of received levels"""
+        self.fixed_point = fixed_point
+        self.precision_provider = precision_provider or BinanceSpotPrecisionProvider()
+        return self
+
+    def set_full_depth(self, full_depth: bool = True):
+        """Enables full depth local order books built from diff depth streams and snapshots"""
+        self.full_depth = full_depth
+        return self
+
+    def set_http_server_mode(self, mode: str):
+        """Selects HTTP server: 'flask' or 'asyncio'"""
+        if mode not in ("flask", "asyncio"):
+            raise ValueError(f"'{mode}' is not valid http server mode")
+
+        self.http_server_mode = mode
+        return self
+
+    def set_subscription_port(self, subscription_port: int):
+        """Serves streaming quote subscriptions over websocket at given port"""
+        self.subscription_port = subscription_port
+        return self
+
+    def set_binary_server(self, port: int = None, path: str = None):
+        """Serves quotes over binary protocol on given local TCP port and/or Unix domain socket path"""
+        self.binary_port = port
+        self.binary_socket_path = path
+        return self
+
+    def set_ingestion_shards(self, shards: int, mode: str = "task"):
+        """Splits watched symbols across given number of websocket connections with independent reconnects.
+        Shards run as event loop tasks, on own threads ('thread') or in own processes ('process')"""
+        if mode not in INGESTION_MODES:
+            raise ValueError(f"'{mode}' is not valid ingestion mode")
+
+        self.ingestion_shards = shards
+        self.ingestion_mode = mode
+        return self
+
+    def set_redundant_connections(self, connections: int = 2):
+        """Keeps given number of hot standby connections per shard for the same streams. Messages are deduplicated
+        by update id, so a dropped connection does not stall order books while it reconnects with backoff"""
+        self.redundant_connections = connections
+        return self
+
+    def set_change_detection(self, change_detection: bool = True):
+        """Compares raw levels of each received order book with previous one of its symbol. Unchanged order books
+        only renew receive time, changed ones tell observers which sides changed and whether top of book moved"""
+        self.change_detection = change_detection
+        return self
+
+    def add_venue(self, client: ExchangeWebSocketClient, max_venue_age: float = None):
+        """Adds an exchange whose order books are merged with Binance order books of the same symbol.
+        Quotes fill across venues at best combined prices. Client must have a distinct venue name"""
+        self.venue_clients.append(client)
+        if max_venue_age is not None:
+            self.max_venue_age = max_venue_age
+        return self
+
+    def set_worker_processes(self, worker_processes: int, max_depth: int = 1000, max_symbols: int = 0):
+        """Serves quotes from given number of worker processes sharing the port. This process only listens
+        websockets and writes order books to shared memory, workers read them without copying"""
+        self.worker_processes = worker_processes
+        self.shared_max_depth = max_depth
+        self.shared_max_symbols = max_symbols
+        return self
+
+    def set_warm_start(self, path: str, interval: float = 1.0, max_depth: int = 1000):
+        """Persists latest order books to given file every interval seconds and restores them on start.
+        Restored order books are quoted only for requests with allow_stale until their first update"""
+        self.warm_start_path = path
+        self.warm_start_interval = interval
+        self.warm_start_max_depth = max_depth
+        return self
+
+    def set_history(self, capacity: int = 600, max_depth: int = 100):
+        """Keeps given number of recent order books per symbol in fixed memory ring buffers,
+        so quotes can be averaged over a time window and order books can be looked up as of a time"""
+        self.history_capacity = capacity
+        self.history_max_depth = max_depth
+        return self
+
+    def set_tracing(self, sample_rate: float = 0.01, capacity: int = 1000):
+        """Traces stage timings of given fraction of quote requests and feed messages. Latest traces
+        are served at /admin/traces"""
+        self.trace_sample_rate = sample_rate
+        self.trace_capacity = capacity
+        return self
+
+    def set_lazy_subscriptions(self, lazy: bool = True, wait: float = 2.0, idle_timeout: float = 300.0,
+        max_symbols: int = 200, max_rate: float = 2.0):
+        """Subscribes a pair without order book on its first /quote request, which waits up to given seconds
+        for the first order book. Lazily subscribed symbols not quoted for idle timeout seconds are unsubscribed.
+        At most max symbols are lazily subscribed at a time and at most max rate subscriptions are sent per second"""
+        self.lazy_subscriptions = lazy
+        self.lazy_wait = wait
+        self.lazy_idle_timeout = idle_timeout
+        self.max_lazy_symbols = max_symbols
+        self.max_lazy_rate = max_rate
+        return self
+
+    async def subscribe(self, symbols: List[str]) -> List[str]:
+        """Subscribes given symbols on open websocket connections. Returns symbols that were not watched"""
+        if self.watchlist is None:
+            raise ValueError("Runtime subscriptions are not supported by process shards")
+        return await self.watchlist.subscribe(symbols)
+
+    async def unsubscribe(self, symbols: List[str]) -> List[str]:
+        """Unsubscribes given symbols and drops their order books. Returns symbols that were watched"""
+        if self.watchlist is None:
+            raise ValueError("Runtime subscriptions are not supported by process shards")
+        return await self.watchlist.unsubscribe(symbols)
+
     def build(self):
         """Initializes all required services"""
 
-        self.quote_service: QuoteService = QuoteService()
-        self.quote_controller: Flask = create_controller(self.quote_service)
+        quote_cache = QuoteCache(self.quote_cache_size) if self.quote_cache_size > 0 else None
+        router = CurrencyRouter(self.max_route_hops) if self.max_route_hops > 1 else None
+        history = OrderBookHistoryService(self.history_capacity, self.history_max_depth) if self.history_capacity > 0 else None
+        self.quote_service: QuoteService = QuoteService(quote_cache, router, history)
+        self.metrics = ServiceMetrics() if self.metrics_enabled else None
+        self.tracer = Tracer(self.trace_sample_rate, self.trace_capacity) if self.trace_sample_rate > 0 else None
+
+        # integer levels are not supported by float based full depth books, venue merge, shared memory and shard transfer
+        if self.fixed_point and (self.full_depth or self.venue_clients or self.worker_processes > 0 or self.ingestion_mode == "process"):
+            raise ValueError("Fixed point mode does not support full depth, venues, worker processes or process shards")
+
+        # history is kept in this process as float arrays
+        if history and (self.fixed_point or self.worker_processes > 0):
+            raise ValueError("History does not support fixed point mode or worker processes")
+
+        # traces are kept and served by this process, workers serve http
+        if self.tracer and self.worker_processes > 0:
+            raise ValueError("Tracing does not support worker processes")
+
+        # lazy subscriptions are triggered by quotes served in this process
+        if self.lazy_subscriptions and (self.worker_processes > 0 or self.ingestion_mode == "process"):
+            raise ValueError("Lazy subscriptions do not support worker processes or process shards")
+
+        # workers read order books written by this process only
+        if self.warm_start_path and (self.fixed_point or self.worker_processes > 0):
+            raise ValueError("Warm start does not support fixed point mode or worker processes")
+
+        # picklable so that process shards create the same client
+        client_factory = partial(create_binance_client,
+            lazy_decoding=self.lazy_decoding,
+            json_decoder=get_fast_json_decoder() if self.lazy_decoding else None,
+            conflate=self.conflate,
+            full_depth=self.full_depth,
+            fixed_point=self.fixed_point,
+            redundant_connections=self.redundant_connections,
+            detect_changes=self.change_detection)
+
+        self.ingestion = ShardedIngestion(client_factory, self.symbols, self.ingestion_shards, self.ingestion_mode,
+            BinanceSpotWebSocketClient().max_streams_per_connection)
+        clients = self.ingestion.get_clients()
+        self.binance_client = clients[0] if clients else None
+
+        # a recorder is written from a single thread
+        if self.feed_recorder:
+            if self.ingestion_mode != "task":
+                raise ValueError("Feed recording requires 'task' ingestion mode")
+            for client in clients:
+                client.set_recorder(self.feed_recorder)
+
+        # consolidated order books are published instead of each venue's order book
+        observers = self.ingestion.observers
+        if self.venue_clients:
+            self.consolidator = OrderBookConsolidator()
+            self.consolidator.set_max_venue_age(self.max_venue_age)
+            self.ingestion.observers.append(self.consolidator)
 
-        self.binance_client: BinanceSpotWebSocketClient = BinanceSpotWebSocketClient()
-        self.binance_client.set_symbols(self.symbols)
-        self.binance_client.observers.append(self.quote_service)
+            for client in self.venue_clients:
+                client.observers.append(self.consolidator)
+            observers = self.consolidator.observers
+
+        observers.append(self.quote_service)
+        if history:
+            observers.append(history)
+
+        # shard connections of other processes can not be changed at runtime
+        if self.ingestion_mode != "process":
+            self.watchlist = WatchlistService(self.ingestion, self.quote_service, self.lazy_subscriptions,
+                self.lazy_wait, self.lazy_idle_timeout, self.max_lazy_symbols, self.max_lazy_rate)
+            observers.append(self.watchlist)
+
+        # in worker mode the quote workers serve http, so the main process builds no http server
+        if self.worker_processes == 0:
+            if self.http_server_mode == "asyncio":
+                routes = QuoteController(self.quote_service, self.metrics, self.tracer, self.watchlist).get_routes()
+                self.http_server = AsyncHttpServer(routes, "0.0.0.0", self.port)
+            else:
+                self.quote_controller: Flask = create_controller(self.quote_service, self.metrics, self.tracer, self.watchlist)
+
+        # subscriptions are recomputed after quote service publishes order book
+        if self.subscription_port is not None:
+            subscription_service = QuoteSubscriptionService(self.quote_service)
+            observers.append(subscription_service)
+            self.subscription_server = QuoteSubscriptionServer(subscription_service, "0.0.0.0", self.subscription_port)
+
+        if self.binary_port is not None or self.binary_socket_path is not None:
+            self.binary_server = BinaryQuoteServer(self.quote_service, "127.0.0.1", self.binary_port, self.binary_socket_path)
+
+        if self.change_detection:
+            for client in self.venue_clients:
+                client.set_change_detection()
+
+        # messages of process shards are parsed in their processes and not traced
+        if self.tracer:
+            for client in clients + self.venue_clients:
+                client.set_tracer(self.tracer)
+
+        if self.metrics:
+            self.ingestion.set_metrics(self.metrics)
+            for client in self.venue_clients:
+                client.set_metrics(self.metrics)
+            self.metrics.set_order_books(lambda: self.quote_service.order_books)
+            self.metrics.ingestion.set_callback(self._get_ingestion_counts)
+            self.metrics.reconnects.set_callback(lambda: {(): self.ingestion.get_stats().reconnects})
+
+        if self.worker_processes > 0:
+            max_symbols = self.shared_max_symbols or len(self.symbols)
+            self.shared_memory = SharedMemory(create=True, size=OrderBookStore.get_size(max_symbols, self.shared_max_depth))
+            store = OrderBookStore(self.shared_memory.buf, max_symbols, self.shared_max_depth)
+            observers.append(OrderBookStoreWriter(store))
+
+        if self.warm_start_path:
+            self.persister = OrderBookPersister(self.warm_start_path, max(len(self.symbols), 1),
+                self.warm_start_max_depth, self.warm_start_interval)
 
         return self
 
+    def _restore_order_books(self):
+        """Publishes order books persisted by previous run as stale until their first update"""
+        snapshots = self.persister.load(set(symbol.upper() for symbol in self.symbols))
+        for snapshot in snapshots:
+            self.quote_service.restore(snapshot)
+
+        if snapshots:
+            print(f"Restored {len(snapshots)} order books from '{self.persister.path}'")
+
+    async def _load_precisions(self):
+        """Sets symbol precisions of fixed point parsers"""
+        try:
+            precisions = await self.precision_provider.get_precisions(self.symbols)
+        except Exception as e:
+            print(f"Symbol precision error: {e}. Decimals of received levels are used")
+            return
+
+        for client in self.ingestion.get_clients():
+            client.parser.set_fixed_point(precisions)
+
+    def _get_ingestion_counts(self):
+        stats = self.ingestion.get_stats()
+        return {("received", ): stats.received, ("processed", ): stats.processed, ("conflated", ): stats.conflated,
+            ("duplicate", ): stats.duplicates, ("unchanged", ): stats.unchanged}
+
     async def start(self):
         """Connects stock exchange websockets and starts serving quote service"""
         print("Server started")
-        await self.binance_client.start()
-        loop = asyncio.get_event_loop()
-        loop.run_in_executor(self.quote_controller_executor, self.quote_controller.run, "0.0.0.0", self.port)
+
+        if self.fixed_point:
+            await self._load_precisions()
+
+        # restored order books are served while websockets connect
+        if self.persister:
+            self._restore_order_books()
+            self.persister.start(self.quote_service.order_books)
+
+        if self.watchlist:
+            self.watchlist.start()
+
+        await self.ingestion.start()
+        for client in self.venue_clients:
+            await client.start()
+
+        if self.subscription_server:
+            await self.subscription_server.start()
+
+        if self.binary_server:
+            await self.binary_server.start()
+
+        if self.worker_processes > 0:
+            context = multiprocessing.get_context("spawn")
+            for _ in range(self.worker_processes):
+                worker = context.Process(
+                    target=run_quote_worker,
+                    args=(self.shared_memory.name, "0.0.0.0", self.port, self.max_route_hops, self.metrics_enabled),
+                    daemon=True)
+                worker.start()
+                self.workers.append(worker)
+
+        elif self.http_server:
+            await self.http_server.start()
+        else:
+            loop = asyncio.get_event_loop()
+            self.quote_controller_server = make_server("0.0.0.0", self.port, self.quote_controller, threaded=True)
+            loop.run_in_executor(self.quote_controller_executor, self.quote_controller_server.serve_forever)
         return self
 
     async def stop(self):
         """Disconnects stock exchange websockets and stops serving quote service"""
-        self.binance_client.stop()
+        if self.watchlist:
+            await self.watchlist.stop()
+
+        await self.ingestion.stop()
+        for client in self.venue_clients:
+            await client.stop()
+
+        if self.persister:
+            await self.persister.stop(self.quote_service.order_books)
+
+        if self.http_server:
+            await self.http_server.stop()
+
+        if self.subscription_server:
+            await self.subscription_server.stop()
+
+        if self.binary_server:
+            await self.binary_server.stop()
+
+        if self.quote_controller_server:
+            # shutdown blocks until serve_forever polls again, so it must not block the event loop
+            await asyncio.to_thread(self.quote_controller_server.shutdown)
+            self.quote_controller_server = None
+
         self.quote_controller_executor.shutdown(wait=False)
+
+        for worker in self.workers:
+            worker.terminate()
+            worker.join()
+        self.workers = []
+
+        if self.shared_memory:
+            self.shared_memory.close()
+            self.shared_memory.unlink()
+            self.shared_memory = None
+
         print("Server stopped")
         return self
\ No newline at end of file
@@ -0,0 +1,146 @@
+from typing import Callable, Dict, FrozenSet, List, Optional, Set, Tuple, Union
+from models.order_book import LimitOrderBook
+from models.quote import QuoteRequest, QuoteResponse
+from services.price_service import OrderBookObserver
+from services.quote_service import QuoteService
+
+SubscriptionKey = Tuple[str, str, str, float]
+"""(action, base currency, quote currency, amount)"""
+
+Subscriber = Callable[[SubscriptionKey, Union[QuoteResponse, str]], None]
+"""Receives subscription key and changed quote response or error message"""
+
+class QuoteSubscription:
+    """Standing quote request shared by all of its subscribers"""
+
+    def __init__(self, request: QuoteRequest):
+        self.request = request
+
+        self.subscribers: List[Subscriber] = []
+
+        self.symbols: FrozenSet[str] = frozenset()
+        """Order book symbols that quote may be priced on, directly or through a route"""
+
+        self.result: Union[QuoteResponse, str, None] = None
+        """Latest pushed response or error message"""
+
+    def update(self, result: Union[QuoteResponse, str]) -> bool:
+        """Stores result. Returns wether it differs from previous result, order book versions are not compared"""
+        changed = QuoteSubscription._get_value(result) != QuoteSubscription._get_value(self.result)
+        self.result = result
+        return changed
+
+    @staticmethod
+    def _get_value(result: Union[QuoteResponse, str, None]):
+        if isinstance(result, QuoteResponse):
+            return result.total, result.price, result.currency, None if result.route is None else tuple(result.route)
+
+        return result
+
+
+class QuoteSubscriptionService(OrderBookObserver):
+    """Recomputes standing quote requests when an order book they depend on is received and pushes changed results.
+    Each subscription is computed once per order book update no matter how many subscribers share it.
+    Must be notified after quote service publishes the order book"""
+
+    def __init__(self, quote_service: QuoteService):
+        self.quote_service = quote_service
+
+        self.subscriptions: Dict[SubscriptionKey, QuoteSubscription] = {}
+
+        self.subscriptions_by_symbol: Dict[str, Set[SubscriptionKey]] = {}
+        """Keys of subscriptions that depend on order book by symbol"""
+
+        self.symbol_count = 0
+        """Number of order book symbols that dependencies are calculated from"""
+
+    @staticmethod
+    def get_key(request: QuoteRequest) -> SubscriptionKey:
+        return request.action, request.base_currency.upper(), request.quote_currency.upper(), request.amount
+
+    def _get_symbols(self, request: QuoteRequest) -> FrozenSet[str]:
+        """Order book symbols that request can be priced on"""
+        symbols = {request.get_symbol(), request.get_symbol(reversed=True)}
+
+        router = self.quote_service.router
+        if router is not None:
+            for route in router.get_routes(request.base_currency, request.quote_currency):
+                symbols.update(hop.symbol for hop in route)
+
+        return frozenset(symbols)
+
+    def _index(self, key: SubscriptionKey):
+        subscription = self.subscriptions[key]
+        for symbol in subscription.symbols:
+            keys = self.subscriptions_by_symbol.get(symbol)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.subscriptions_by_symbol[symbol]
+
+        subscription.symbols = self._get_symbols(subscription.request)
+        for symbol in subscription.symbols:
+            self.subscriptions_by_symbol.setdefault(symbol, set()).add(key)
+
+    def subscribe(self, request: QuoteRequest, subscriber: Subscriber) -> SubscriptionKey:
+        """Adds subscriber to standing request and sends current result to it. Returns subscription key"""
+        key = QuoteSubscriptionService.get_key(request)
+        subscription = self.subscriptions.get(key)
+
+        if subscription is None:
+            # freshness parameters do not apply to standing requests, every update is the freshest
+            subscription = self.subscriptions[key] = QuoteSubscription(QuoteRequest(*key))
+            self._index(key)
+            subscription.update(self.quote_service.quote(subscription.request))
+
+        subscription.subscribers.append(subscriber)
+        subscriber(key, subscription.result)
+        return key
+
+    def unsubscribe(self, key: SubscriptionKey, subscriber: Subscriber):
+        """Removes subscriber. Subscription is dropped with its last subscriber"""
+        subscription = self.subscriptions.get(key)
+        if subscription is None or subscriber not in subscription.subscribers:
+            return
+
+        subscription.subscribers.remove(subscriber)
+        if subscription.subscribers:
+            return
+
+        for symbol in subscription.symbols:
+            keys = self.subscriptions_by_symbol[symbol]
+            keys.discard(key)
+            if not keys:
+                del self.subscriptions_by_symbol[symbol]
+
+        del self.subscriptions[key]
+
+    def on_order_book_received(self, order_book: LimitOrderBook):
+        # a new symbol may add routes to any subscription
+        if len(self.quote_service.order_books) != self.symbol_count:
+            self.symbol_count = len(self.quote_service.order_books)
+            for key in self.subscriptions:
+                self._index(key)
+            keys = list(self.subscriptions)
+
+        # quotes of unchanged levels equal pushed results
+        elif order_book.change is not None and not order_book.change.is_changed():
+            return
+        else:
+            keys = list(self.subscriptions_by_symbol.get(order_book.symbol, ()))
+
+        if keys:
+            self._recompute(keys)
+
+    def _recompute(self, keys: List[SubscriptionKey]):
+        """Quotes subscriptions as a batch and pushes changed results"""
+        subscriptions = [self.subscriptions[key] for key in keys]
+        results = self.quote_service.quote_batch([subscription.request for subscription in subscriptions])
+
+        for key, subscription, result in zip(keys, subscriptions, results):
+            if subscription.update(result):
+                for subscriber in list(subscription.subscribers):
+                    subscriber(key, result)
+
+    def get_subscription(self, key: SubscriptionKey) -> Optional[QuoteSubscription]:
+        return self.subscriptions.get(key)
@@ -0,0 +1,179 @@
+import os, random, sys, threading, time
+from collections import deque
+from concurrent.futures import Future
+from contextvars import ContextVar, Token
+from typing import Deque, Dict, List, Optional, Tuple
+
+class Trace:
+    """Stage timings of one sampled quote request or feed message. Stages are contiguous,
+    each mark ends the stage that started at previous mark"""
+
+    __slots__ = ("kind", "start_time", "last", "cpu_start", "cpu_time", "spans", "attributes", "token")
+
+    def __init__(self, kind: str):
+        self.kind = kind
+        self.start_time = time.time()
+        self.last = time.perf_counter()
+        self.cpu_start = time.thread_time()
+
+        self.cpu_time: float = None
+        """CPU seconds of tracing thread between start and finish. Much less than duration when thread waits
+        for the GIL or is preempted"""
+
+        self.spans: List[Tuple[str, float]] = []
+        """(stage, seconds) in order"""
+
+        self.attributes: Dict[str, str] = {}
+        self.token: Token = None
+
+    def mark(self, stage: str):
+        """Ends given stage"""
+        now = time.perf_counter()
+        self.spans.append((stage, now - self.last))
+        self.last = now
+
+    def add(self, stage: str, duration: float):
+        """Adds a stage measured before trace started, e.g. from a receive timestamp"""
+        self.spans.append((stage, duration))
+
+    def get_duration(self) -> float:
+        return sum(duration for _, duration in self.spans)
+
+    def to_json(self) -> dict:
+        return {
+            "kind": self.kind,
+            "time": self.start_time,
+            "duration": self.get_duration(),
+            "cpu_time": self.cpu_time,
+            "spans": [{"stage": stage, "duration": duration} for stage, duration in self.spans],
+            **self.attributes}
+
+
+current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+"""Trace of the request being handled, so that services can mark stages without a trace parameter"""
+
+
+class Tracer:
+    """Samples a fraction of quote requests and feed messages and keeps their stage timings in a ring buffer.
+    Requests that are not sampled cost a random number and a comparison"""
+
+    def __init__(self, sample_rate: float = 0.01, capacity: int = 1000):
+        self.sample_rate = sample_rate
+        """Fraction of requests and messages that are traced"""
+
+        self.traces: Deque[Trace] = deque(maxlen=capacity)
+        """Finished traces, oldest are dropped when full"""
+
+    def start(self, kind: str) -> Optional[Trace]:
+        """Starts a trace of given kind when sampled and makes it current. Returns None when not sampled"""
+        if random.random() >= self.sample_rate:
+            return None
+
+        trace = Trace(kind)
+        trace.token = current_trace.set(trace)
+        return trace
+
+    def finish(self, trace: Trace):
+        """Stores trace and restores previous current trace"""
+        trace.cpu_time = time.thread_time() - trace.cpu_start
+        current_trace.reset(trace.token)
+        trace.token = None
+
+        # deque append is atomic, traces are finished by http and websocket threads
+        self.traces.append(trace)
+
+    def get_traces(self, kind: str = None, limit: int = None) -> List[Trace]:
+        """Latest finished traces of given kind (all when None), oldest first"""
+        traces = [trace for trace in list(self.traces) if kind is None or trace.kind == kind]
+        return traces[-limit:] if limit else traces
+
+    def get_summary(self, kind: str = None) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """Count and percentiles in seconds of each stage by trace kind, over buffered traces"""
+        durations: Dict[str, Dict[str, List[float]]] = {}
+        for trace in self.get_traces(kind):
+            stages = durations.setdefault(trace.kind, {})
+            for stage, duration in trace.spans + [("total", trace.get_duration())]:
+                stages.setdefault(stage, []).append(duration)
+
+        return {trace_kind: {stage: Tracer._summarize(values) for stage, values in stages.items()}
+            for trace_kind, stages in durations.items()}
+
+    @staticmethod
+    def _summarize(values: List[float]) -> Dict[str, float]:
+        values = sorted(values)
+        def percentile(fraction: float) -> float:
+            return values[min(int(fraction * len(values)), len(values) - 1)]
+
+        return {"count": len(values), "p50": percentile(0.5), "p99": percentile(0.99), "max": values[-1]}
+
+
+class SamplingProfiler:
+    """Samples stacks of all threads of the live process at an interval for a limited time and aggregates
+    them into collapsed stacks ('thread;outer;...;inner count' lines) that flame graph tools read.
+    Only one profile runs at a time"""
+
+    max_duration = 60
+    """Maximum profile seconds"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.running = False
+
+    def start(self, duration: float, interval: float = 0.005) -> Future:
+        """Starts profiling on a background thread. Returns future of collapsed stacks text.
+        Raises RuntimeError when a profile is already running"""
+        with self.lock:
+            if self.running:
+                raise RuntimeError("A profile is already running")
+            self.running = True
+
+        future = Future()
+        threading.Thread(target=self._run, args=(future, min(duration, SamplingProfiler.max_duration), interval),
+            name="sampling-profiler", daemon=True).start()
+        return future
+
+    def profile(self, duration: float, interval: float = 0.005) -> str:
+        """Profiles for given seconds and returns collapsed stacks"""
+        return self.start(duration, interval).result()
+
+    def _run(self, future: Future, duration: float, interval: float):
+        try:
+            future.set_result(SamplingProfiler.format(self._sample(duration, interval)))
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            with self.lock:
+                self.running = False
+
+    @staticmethod
+    def _sample(duration: float, interval: float) -> Dict[str, int]:
+        """Sample counts by collapsed stack"""
+        own_thread = threading.get_ident()
+        counts: Dict[str, int] = {}
+        deadline = time.perf_counter() + duration
+
+        while time.perf_counter() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_thread:
+                    continue
+
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+
+                stack.append(names.get(thread_id, str(thread_id)))
+                key = ";".join(reversed(stack))
+                counts[key] = counts.get(key, 0) + 1
+
+            time.sleep(interval)
+
+        return counts
+
+    @staticmethod
+    def format(counts: Dict[str, int]) -> str:
+        """Collapsed stacks text, most sampled stack first"""
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(counts.items(), key=lambda item: -item[1]))
@@ -0,0 +1,201 @@
+import asyncio, threading, time
+from collections import deque
+from concurrent.futures import Future
+from typing import Deque, Dict, List, Optional, Set
+from models.order_book import LimitOrderBook
+from models.quote import QuoteRequest
+from services.price_service import OrderBookObserver
+from services.ingestion_service import ShardedIngestion
+from services.quote_service import QuoteService
+
+class WatchlistService(OrderBookObserver):
+    """Changes watched symbols at runtime over open websocket connections. In lazy mode the first quote of a pair
+    without order book subscribes both of its possible symbols and waits briefly for the first order book,
+    and lazily subscribed symbols that are not quoted for idle timeout are unsubscribed"""
+
+    max_currency_length = 16
+    """Longest currency name that is lazily subscribed"""
+
+    def __init__(self, ingestion: ShardedIngestion, quote_service: QuoteService, lazy=False, wait: float = 2.0,
+        idle_timeout: float = 300.0, max_lazy_symbols: int = 200, max_lazy_rate: float = 2.0):
+        self.ingestion = ingestion
+        self.quote_service = quote_service
+
+        self.lazy = lazy
+        """Subscribes pairs on first quote"""
+
+        self.wait = wait
+        """Seconds a quote waits for first order book of a lazily subscribed pair"""
+
+        self.idle_timeout = idle_timeout
+        """Seconds without quotes after which a lazily subscribed symbol is unsubscribed"""
+
+        self.max_lazy_symbols = max_lazy_symbols
+        """Maximum symbols subscribed by quotes at the same time"""
+
+        self.max_lazy_rate = max_lazy_rate
+        """Maximum lazy subscriptions per second. Each sends up to two control messages, which exchanges rate limit"""
+
+        self.lazy_times: Deque[float] = deque()
+        """Monotonic times of lazy subscriptions during last second"""
+
+        self.lazy_lock = threading.Lock()
+        """Guards lazy subscription times checked by http threads"""
+
+        self.lazy_symbols: Set[str] = set()
+        """Symbols subscribed by quotes. Configured and explicitly subscribed symbols are kept when idle"""
+
+        self.waiters: Dict[str, List[asyncio.Future]] = {}
+        """Quotes waiting for first order book by symbol"""
+
+        self.rejected: Dict[str, float] = {}
+        """Symbols that sent no order book when lazily subscribed, by monotonic time until they are not retried"""
+
+        self.loop: asyncio.AbstractEventLoop = None
+        self.idle_task: asyncio.Task = None
+
+    def start(self):
+        """Starts idle symbol checks in lazy mode on the running loop, which is the loop that order books are notified on"""
+        self.loop = asyncio.get_running_loop()
+
+        if self.lazy:
+            self.quote_service.quoted_symbols = set()
+            self.idle_task = asyncio.create_task(self._unsubscribe_idle())
+
+    async def stop(self):
+        if self.idle_task is not None:
+            self.idle_task.cancel()
+            self.idle_task = None
+
+        for waiters in self.waiters.values():
+            for waiter in waiters:
+                waiter.cancel()
+        self.waiters = {}
+
+    def get_symbols(self) -> List[str]:
+        return self.ingestion.get_symbols()
+
+    async def subscribe(self, symbols: List[str]) -> List[str]:
+        """Subscribes given symbols and keeps them when idle. Returns symbols that were not watched"""
+        symbols = [symbol.upper() for symbol in symbols]
+        added = await self.ingestion.subscribe(symbols)
+
+        self.lazy_symbols.difference_update(symbols)
+        for symbol in symbols:
+            self.rejected.pop(symbol, None)
+        return added
+
+    async def unsubscribe(self, symbols: List[str]) -> List[str]:
+        """Unsubscribes given symbols and drops their order books. Returns symbols that were watched"""
+        removed = await self.ingestion.unsubscribe([symbol.upper() for symbol in symbols])
+
+        for symbol in removed:
+            self.lazy_symbols.discard(symbol)
+            self.quote_service.remove(symbol)
+        return removed
+
+    def run(self, coroutine) -> Future:
+        """Runs coroutine on loop of order books from any thread"""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    def subscribe_missing(self, request: QuoteRequest) -> Optional[Future]:
+        """Lazily subscribes pair of quote request when neither of its symbols has an order book.
+        Returns future that completes when an order book is received or wait is over, None when nothing is subscribed"""
+        if not self.lazy or self.loop is None:
+            return None
+
+        # quote requests are not authenticated, only names that can be symbols reach the exchange
+        if not all(WatchlistService._is_currency(currency) for currency in (request.base_currency, request.quote_currency)):
+            return None
+
+        symbols = [request.get_symbol(), request.get_symbol(reversed=True)]
+        order_books = self.quote_service.order_books
+        if any(symbol in order_books for symbol in symbols):
+            return None
+
+        now = time.monotonic()
+        symbols = [symbol for symbol in symbols if self.rejected.get(symbol, 0) <= now]
+        if not symbols or len(self.lazy_symbols) + len(symbols) > self.max_lazy_symbols or not self._acquire_rate(now):
+            return None
+
+        return self.run(self._subscribe_lazily(symbols))
+
+    @staticmethod
+    def _is_currency(currency: str) -> bool:
+        return 0 < len(currency) <= WatchlistService.max_currency_length and currency.isascii() and currency.isalnum()
+
+    def _acquire_rate(self, now: float) -> bool:
+        """Records a lazy subscription unless maximum rate is reached during last second"""
+        with self.lazy_lock:
+            while self.lazy_times and self.lazy_times[0] <= now - 1:
+                self.lazy_times.popleft()
+
+            if len(self.lazy_times) >= self.max_lazy_rate:
+                return False
+
+            self.lazy_times.append(now)
+            return True
+
+    async def _subscribe_lazily(self, symbols: List[str]):
+        """Subscribes candidate symbols of a pair and waits for first order book of any.
+        Candidates that sent nothing, e.g. reversed symbol of an existing pair, are unsubscribed"""
+        waiter = self.loop.create_future()
+        for symbol in symbols:
+            self.waiters.setdefault(symbol, []).append(waiter)
+
+        try:
+            added = await self.ingestion.subscribe(symbols)
+            self.lazy_symbols.update(added)
+            await asyncio.wait_for(waiter, self.wait)
+
+        except asyncio.TimeoutError:
+            pass
+        except Exception as e:
+            print(f"Lazy subscription error of {symbols}: {e}")
+        finally:
+            for symbol in symbols:
+                waiters = self.waiters.get(symbol)
+                if waiters is not None and waiter in waiters:
+                    waiters.remove(waiter)
+                    if not waiters:
+                        del self.waiters[symbol]
+
+        silent = [symbol for symbol in symbols if symbol in self.lazy_symbols and symbol not in self.quote_service.order_books]
+        if not silent:
+            return
+
+        retry_time = time.monotonic() + self.idle_timeout
+        for symbol in silent:
+            self.rejected[symbol] = retry_time
+
+        try:
+            await self.unsubscribe(silent)
+        except Exception as e:
+            print(f"Unsubscribe error of {silent}: {e}")
+
+    def on_order_book_received(self, order_book: LimitOrderBook):
+        waiters = self.waiters.pop(order_book.symbol, None)
+        if waiters is None:
+            return
+
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(order_book.symbol)
+
+    async def _unsubscribe_idle(self):
+        """Unsubscribes lazily subscribed symbols that are not quoted during a whole idle timeout"""
+        while True:
+            await asyncio.sleep(self.idle_timeout)
+
+            quoted, self.quote_service.quoted_symbols = self.quote_service.quoted_symbols, set()
+            idle = [symbol for symbol in self.lazy_symbols if symbol not in quoted and symbol not in self.waiters]
+
+            now = time.monotonic()
+            self.rejected = {symbol: retry_time for symbol, retry_time in self.rejected.items() if retry_time > now}
+
+            if idle:
+                try:
+                    await self.unsubscribe(idle)
+                    print(f"Unsubscribed idle symbols {idle}")
+                except Exception as e:
+                    print(f"Unsubscribe error of idle symbols {idle}: {e}")
@@ -0,0 +1,102 @@
+import asyncio, sys
+from multiprocessing.shared_memory import SharedMemory
+from typing import Callable, List, Union
+from models.quote import QuoteRequest, QuoteResponse, PriceImpactRequest, PriceImpactResponse
+from services.order_book_store import OrderBookStore, OrderBookStoreView
+from services.quote_service import QuoteCalculator
+from services.route_service import CurrencyRouter
+from services.metrics_service import ServiceMetrics
+from controllers.quote_controller import QuoteController
+from controllers.http_server import AsyncHttpServer
+
+class StoreQuoteService(QuoteCalculator):
+    """Calculates quotes directly on an order book store written by another process.
+    A calculation is repeated when any order book it read is rewritten meanwhile"""
+
+    def __init__(self, order_books: OrderBookStoreView, router: CurrencyRouter = None):
+        super().__init__(router=router)
+        self.order_books = order_books
+        """Order book snapshots read from store without copying"""
+
+        self.max_retries = 100
+        """Maximum calculation attempts when order books are rewritten during calculation"""
+
+        self.symbol_count = 0
+        """Number of symbols that router graph is built from"""
+
+    def _get_order_books_view(self) -> OrderBookStoreView:
+        # every read is validated at the end of calculation, so no copy is needed
+        return self.order_books
+
+    def _read_consistent(self, calculate: Callable):
+        """Runs calculation until all order books it read are unchanged at the end"""
+
+        # new symbols are allocated by writer
+        if self.router is not None and len(self.order_books) != self.symbol_count:
+            self.symbol_count = len(self.order_books)
+            self.router.update_symbols(list(self.order_books))
+
+        for _ in range(self.max_retries):
+            self.order_books.begin_read()
+            try:
+                result = calculate()
+
+            # a torn read may produce invalid numbers, error is valid only if nothing changed
+            except Exception:
+                if self.order_books.end_read():
+                    raise
+                continue
+
+            if self.order_books.end_read():
+                return result
+
+        return "Order books are updated too frequently to read a consistent snapshot"
+
+    def quote(self, request: QuoteRequest) -> Union[QuoteResponse, str]:
+        return self._read_consistent(lambda: super(StoreQuoteService, self).quote(request))
+
+    def quote_batch(self, requests: List[QuoteRequest]) -> List[Union[QuoteResponse, str]]:
+        return self._read_consistent(lambda: super(StoreQuoteService, self).quote_batch(requests))
+
+    def price_impact(self, request: PriceImpactRequest) -> Union[PriceImpactResponse, str]:
+        return self._read_consistent(lambda: super(StoreQuoteService, self).price_impact(request))
+
+
+def attach_shared_memory(name: str) -> SharedMemory:
+    """Attaches an existing shared memory block without taking its ownership"""
+    if sys.version_info >= (3, 13):
+        return SharedMemory(name, track=False)
+
+    return SharedMemory(name)
+
+
+async def serve_quote_worker(shared_memory_name: str, host: str, port: int, max_route_hops: int, metrics_enabled=True):
+    """Serves quote requests from shared memory order books. Workers share the port.
+    Metrics of a worker cover its own quotes, so a scrape reaches one of the workers"""
+    shared_memory = attach_shared_memory(shared_memory_name)
+    store = OrderBookStore(shared_memory.buf)
+
+    router = CurrencyRouter(max_route_hops) if max_route_hops > 1 else None
+    quote_service = StoreQuoteService(OrderBookStoreView(store), router)
+
+    metrics = None
+    if metrics_enabled:
+        metrics = ServiceMetrics()
+        metrics.set_order_books(lambda: quote_service.order_books)
+
+    http_server = AsyncHttpServer(QuoteController(quote_service, metrics).get_routes(), host, port)
+    http_server.reuse_port = True
+    await http_server.start()
+
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await http_server.stop()
+
+
+def run_quote_worker(shared_memory_name: str, host: str, port: int, max_route_hops: int, metrics_enabled=True):
+    """Quote worker process entry point"""
+    try:
+        asyncio.run(serve_quote_worker(shared_memory_name, host, port, max_route_hops, metrics_enabled))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,76 @@
+import json, websockets
+from urllib.parse import parse_qs, urlparse
+from models.order_book import LimitOrder, LimitOrderBook
+from services.depth_service import OrderBookSnapshotProvider
+from services.price_service import OrderBookObserver
+from services.quote_service import QuoteService
+
+def raw_message(symbol: str, price: float, stream="depth5@100ms", update_id=1) -> str:
+    return json.dumps({
+        "stream": f"{symbol.lower()}@{stream}",
+        "data": {"lastUpdateId": update_id, "bids": [[str(price - 1), "1"]], "asks": [[str(price), "1"]]}},
+        separators=(",", ":"))
+
+class RecordingObserver(OrderBookObserver):
+    def __init__(self):
+        self.order_books = []
+
+    def on_order_book_received(self, order_book: LimitOrderBook):
+        self.order_books.append(order_book)
+
+def create_order_book(symbol="ETHUSDT", price=2000, received_time=None, depth=2, bid=None) -> LimitOrderBook:
+    """Order book of given depth with asks from price upwards and bids from bid (100 below price by default)
+    downwards, levels are 100 apart"""
+    bid = price - 100 if bid is None else bid
+    return LimitOrderBook(
+        symbol=symbol,
+        asks=[LimitOrder(price + 100 * index, 15 if index % 2 else 10) for index in range(depth)],
+        bids=[LimitOrder(bid - 100 * index, 20 if index % 2 else 10) for index in range(depth)],
+        received_time=received_time)
+
+def create_quote_service() -> QuoteService:
+    quote_service = QuoteService()
+    quote_service.on_order_book_received(LimitOrderBook(
+        symbol="ETHUSDT",
+        asks=[LimitOrder(2000, 10), LimitOrder(2100, 15)],
+        bids=[LimitOrder(1900, 10)]))
+    return quote_service
+
+class FixedSnapshotProvider(OrderBookSnapshotProvider):
+    """Serves the same snapshot for every symbol. Module level so that process shards can unpickle it"""
+
+    async def get_snapshot(self, symbol: str) -> dict:
+        return {"lastUpdateId": 100, "bids": [["99", "1"]], "asks": [["100", "1"]]}
+
+class StreamFeed:
+    """Local stand-in of Binance combined streams that sends one order book of each requested stream"""
+
+    def __init__(self):
+        self.paths = []
+        self.server = None
+
+    async def _serve(self, websocket):
+        path = getattr(websocket, "path", None) or websocket.request.path
+        self.paths.append(path)
+
+        try:
+            for stream in parse_qs(urlparse(path).query)["streams"][0].split("/"):
+                symbol = stream.split("@")[0].upper()
+
+                # full depth streams get a diff that follows the fixed snapshot
+                if "@depth@" in stream:
+                    await websocket.send(json.dumps({"stream": stream, "data": {"e": "depthUpdate", "E": 0, "s": symbol,
+                        "U": 101, "u": 101, "b": [], "a": [["101", "2"]]}}))
+                else:
+                    await websocket.send(raw_message(symbol, 100))
+            await websocket.wait_closed()
+        except websockets.ConnectionClosed:
+            pass
+
+    async def start(self) -> str:
+        self.server = await websockets.serve(self._serve, "127.0.0.1", 0)
+        return f"ws://127.0.0.1:{self.server.sockets[0].getsockname()[1]}"
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
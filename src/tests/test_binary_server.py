@@ -0,0 +1,119 @@
+import asyncio, pytest, struct
+from models.quote import QuoteRequest, QuoteResponse
+from controllers.binary_server import BinaryQuoteServer
+from tests.helpers import create_quote_service
+from utils.binary_protocol import (BinaryQuoteClient, CurrencyTable, REQUEST_HEADER, FRAME_HEADER, QUOTE_REQUEST, QUOTE,
+    INTERN_RESPONSE, encode_intern_request)
+
+async def with_server(test, port=0, path=None):
+    """Runs test(server) against a started binary server"""
+    server = await BinaryQuoteServer(create_quote_service(), port=port, path=path).start()
+    try:
+        return await test(server)
+    finally:
+        await server.stop()
+
+class TestBinaryQuoteServer:
+    """Tests binary quote protocol over TCP and Unix domain socket"""
+
+    def test_tcp_quote_matches_json_quote(self):
+        async def test(server: BinaryQuoteServer):
+            client = await BinaryQuoteClient.connect("127.0.0.1", server.port)
+            response = await client.quote("buy", "eth", "usdt", 20)
+            await client.close()
+            return response, server.service.quote(QuoteRequest("buy", "ETH", "USDT", 20))
+
+        response, expected = asyncio.run(with_server(test))
+        assert response == QuoteResponse(41000, 2050, "USDT", 1)
+        assert (response.total, response.price, response.version) == (expected.total, expected.price, expected.version)
+
+    def test_unix_socket_quote(self, tmp_path):
+        path = str(tmp_path / "quote.sock")
+
+        async def test(server: BinaryQuoteServer):
+            client = await BinaryQuoteClient.connect_unix(path)
+            response = await client.quote("sell", "ETH", "USDT", 5)
+            await client.close()
+            return response
+
+        response = asyncio.run(with_server(test, port=None, path=path))
+        assert response.total == 9500
+        assert not (tmp_path / "quote.sock").exists()
+
+    def test_pipelined_requests(self):
+        async def test(server: BinaryQuoteServer):
+            client = await BinaryQuoteClient.connect("127.0.0.1", server.port)
+            responses = await asyncio.gather(*(client.quote("buy", "ETH", "USDT", amount) for amount in range(1, 201)))
+            await client.close()
+            return responses
+
+        responses = asyncio.run(with_server(test))
+        assert [response.total for response in responses[:10]] == [2000 * amount for amount in range(1, 11)]
+        assert responses[-1].startswith("Order book is not liquid enough")
+
+    def test_errors(self):
+        async def test(server: BinaryQuoteServer):
+            client = await BinaryQuoteClient.connect("127.0.0.1", server.port)
+            unknown = await client.quote("buy", "XRP", "USDT", 1)
+            invalid_amount = await client.quote("buy", "ETH", "USDT", float("nan"))
+
+            # quote with currency ids that were never interned
+            not_interned = await client._send(lambda request_id: QUOTE_REQUEST.pack(
+                QUOTE_REQUEST.size - FRAME_HEADER.size, QUOTE, request_id, 0, 500, 501, 1))
+
+            # unknown message type gets an error response and connection stays usable
+            invalid_type = await client._send(lambda request_id: REQUEST_HEADER.pack(
+                REQUEST_HEADER.size - FRAME_HEADER.size, 9, request_id))
+            response = await client.quote("buy", "ETH", "USDT", 1)
+
+            await client.close()
+            return unknown, invalid_amount, not_interned, invalid_type, response
+
+        unknown, invalid_amount, not_interned, invalid_type, response = asyncio.run(with_server(test))
+        assert "'XRPUSDT'" in unknown
+        assert invalid_amount == "'nan' is not valid amount"
+        assert not_interned == "Currency id is not interned"
+        assert invalid_type.startswith("Invalid message type 9")
+        assert response.total == 2000
+
+    def test_oversized_frame_closes_connection(self):
+        async def test(server: BinaryQuoteServer):
+            reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+            writer.write(struct.pack("<I", 1 << 30))
+            data = await reader.read()
+            writer.close()
+            return data
+
+        assert asyncio.run(with_server(test)) == b""
+
+    def test_requests_before_invalid_frame_are_answered(self):
+        async def test(server: BinaryQuoteServer):
+            reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+            writer.write(encode_intern_request(7, "ETH") + struct.pack("<I", 1 << 30))
+            data = await reader.read()
+            writer.close()
+            return data
+
+        data = asyncio.run(with_server(test))
+        assert INTERN_RESPONSE.unpack(data)[2:] == (7, 0, 0)
+
+    def test_currency_table_is_limited_per_connection(self, monkeypatch):
+        monkeypatch.setattr(CurrencyTable, "max_currencies", 2)
+
+        async def test(server: BinaryQuoteServer):
+            first = await BinaryQuoteClient.connect("127.0.0.1", server.port)
+            first_ids = [await first.intern("ETH"), await first.intern("USDT")]
+            with pytest.raises(ValueError, match="can not be interned"):
+                await first.intern("BTC")
+
+            # another connection has its own table
+            second = await BinaryQuoteClient.connect("127.0.0.1", server.port)
+            second_ids = [await second.intern("BTC"), await second.intern("ETH")]
+            with pytest.raises(ValueError, match="can not be interned"):
+                await second.intern("A" * (CurrencyTable.max_currency_length + 1))
+
+            await first.close()
+            await second.close()
+            return first_ids, second_ids
+
+        assert asyncio.run(with_server(test)) == ([0, 1], [0, 1])
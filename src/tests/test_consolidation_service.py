@@ -0,0 +1,139 @@
+import asyncio, time
+from models.order_book import LimitOrder, LimitOrderBook, OrderBookChange, PriceLevels, VenuePriceLevels, UNCHANGED
+from models.quote import QuoteRequest
+from services.consolidation_service import OrderBookConsolidator
+from services.exchange_service import BinanceSpotWebSocketClient
+from services.quote_service import QuoteService
+from utils.quote_parser import QuoteParser
+from tests.helpers import RecordingObserver, StreamFeed
+
+class TestVenuePriceLevels:
+    """Tests k-way merge of venue price levels"""
+
+    def test_merge(self):
+        asks = VenuePriceLevels.merge({
+            "binance": PriceLevels([100, 102, 104], [1, 1, 1]),
+            "local": PriceLevels([101, 102], [2, 2])}, descending=False)
+
+        assert list(asks.prices) == [100, 101, 102, 102, 104]
+        assert [asks.venue_names[venue] for venue in asks.venues] == ["binance", "local", "binance", "local", "binance"]
+
+        bids = VenuePriceLevels.merge({"binance": PriceLevels([99, 97], [1, 1]), "local": PriceLevels([98], [1])}, descending=True)
+        assert list(bids.prices) == [99, 98, 97]
+
+        assert len(VenuePriceLevels.merge({}, descending=False)) == 0
+
+    def test_fill_by_venue(self):
+        asks = VenuePriceLevels.merge({
+            "binance": PriceLevels([100, 102], [1, 1]),
+            "local": PriceLevels([101], [2])}, descending=False)
+
+        assert asks.fill_by_venue(3.5) == {"binance": (1.5, 151), "local": (2, 202)}
+        assert asks.fill_by_venue(302, by_volume=True) == {"binance": (1, 100), "local": (2, 202)}
+        assert asks.fill_by_venue(5) is None
+
+
+class TestOrderBookConsolidator:
+    """Tests consolidated quotes across venues"""
+
+    def setup_method(self):
+        self.consolidator = OrderBookConsolidator()
+        self.quote_service = QuoteService()
+        self.consolidator.observers.append(self.quote_service)
+
+    def publish(self, venue: str, asks, received_time=None):
+        order_book = LimitOrderBook("ETHUSDT", [LimitOrder(price - 10, quantity) for price, quantity in asks],
+            [LimitOrder(price, quantity) for price, quantity in asks], received_time=received_time or time.time(), venue=venue)
+        self.consolidator.on_order_book_received(order_book)
+
+    def test_quote_fills_across_venues(self):
+        self.publish("binance", [(2000, 1), (2010, 5)])
+        self.publish("local", [(2005, 1)])
+
+        response = self.quote_service.quote(QuoteRequest("buy", "ETH", "USDT", 2, venue_breakdown=True))
+        assert response.total == 4005
+        assert response.venues == {"binance": (1, 2000), "local": (1, 2005)}
+        assert response.version == 2
+
+        json = QuoteParser.to_response_json(response)
+        assert json["venues"] == {"binance": {"amount": "1.0", "total": "2000.0"}, "local": {"amount": "1.0", "total": "2005.0"}}
+
+        # venue update replaces only its own levels
+        self.publish("local", [(2001, 3)])
+        response = self.quote_service.quote(QuoteRequest("buy", "ETH", "USDT", 2))
+        assert response.total == 4001
+        assert response.venues is None
+
+    def test_reversed_symbol_breakdown(self):
+        self.publish("binance", [(2000, 1)])
+        self.publish("local", [(2000, 1)])
+
+        response = self.quote_service.quote(QuoteRequest("buy", "USDT", "ETH", 3000, venue_breakdown=True))
+        assert response.total == 1.5
+        assert response.venues == {"binance": (2000, 1), "local": (1000, 0.5)}
+
+    def test_stale_venue_is_left_out(self):
+        self.consolidator.set_max_venue_age(5)
+        self.publish("local", [(1900, 1)], received_time=time.time() - 10)
+        self.publish("binance", [(2000, 1)])
+
+        response = self.quote_service.quote(QuoteRequest("buy", "ETH", "USDT", 1))
+        assert response.total == 2000
+
+    def test_unchanged_venue_is_not_merged_again(self):
+        observer = RecordingObserver()
+        self.consolidator.observers.append(observer)
+        received = observer.order_books
+
+        self.publish("binance", [(2000, 1)])
+        self.publish("local", [(2005, 1)])
+        self.consolidator.on_order_book_received(LimitOrderBook("ETHUSDT", [], [], received_time=time.time(),
+            venue="local", change=UNCHANGED))
+        assert self.quote_service.order_books["ETHUSDT"].version == 2
+
+        self.consolidator.on_order_book_received(LimitOrderBook("ETHUSDT", [LimitOrder(1995, 1)], [LimitOrder(2006, 1)],
+            received_time=time.time(), venue="local", change=OrderBookChange(bids=False, asks=True, top=True)))
+
+        assert received[2].change == UNCHANGED and received[2].asks is received[1].asks
+
+        # top of local venue is behind best binance level
+        assert received[3].change == OrderBookChange(bids=False, asks=True, top=False)
+        assert list(received[3].asks.prices) == [2000, 2006]
+
+
+class TestVenueClients:
+    """Tests venue clients feeding one consolidator"""
+
+    def test_local_venue(self):
+        consolidator = OrderBookConsolidator()
+        quote_service = QuoteService()
+        consolidator.observers.append(quote_service)
+
+        async def run():
+            feed = StreamFeed()
+            uri = await feed.start()
+
+            clients = []
+            for venue in ["binance", "local"]:
+                client = BinanceSpotWebSocketClient()
+                client.base_uri = uri
+                client.set_venue(venue)
+                client.set_symbols(["ETHUSDT"])
+                client.observers.append(consolidator)
+                await client.start()
+                clients.append(client)
+
+            deadline = time.time() + 5
+            while quote_service.order_books.get("ETHUSDT") is None or quote_service.order_books["ETHUSDT"].version < 2:
+                if time.time() > deadline:
+                    break
+                await asyncio.sleep(0.01)
+
+            for client in clients:
+                await client.stop()
+            await feed.stop()
+
+        asyncio.run(run())
+        asks = quote_service.order_books["ETHUSDT"].asks
+        assert sorted(asks.venue_names) == ["binance", "local"]
+        assert list(asks.prices) == [100, 100]
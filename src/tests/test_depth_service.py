@@ -0,0 +1,122 @@
+import asyncio
+from models.order_book import LimitOrder, OrderBookChange, OrderBookUpdate, PriceLevels
+from services.depth_service import OrderBookSnapshotProvider, LocalOrderBookSynchronizer, BinanceSpotPrecisionProvider
+from services.exchange_service import BinanceSpotWebSocketClient
+from services.quote_service import QuoteService
+
+class LocalSnapshotProvider(OrderBookSnapshotProvider):
+    """Serves fixed snapshots instead of requesting exchange"""
+
+    def __init__(self, snapshot: dict):
+        self.snapshot = snapshot
+        self.requests = 0
+
+    async def get_snapshot(self, symbol: str) -> dict:
+        self.requests += 1
+        return self.snapshot
+
+def diff_message(first_update_id, last_update_id, bids=[], asks=[]):
+    return {
+        "stream": "ethusdt@depth@100ms",
+        "data": {"e": "depthUpdate", "E": 0, "s": "ETHUSDT", "U": first_update_id, "u": last_update_id, "b": bids, "a": asks}}
+
+class TestLocalOrderBookSynchronizer:
+    """Tests local order book synchronization with update id sequences"""
+
+    def setup_method(self):
+        self.synchronizer = LocalOrderBookSynchronizer("ETHUSDT")
+        self.snapshot = OrderBookUpdate("ETHUSDT", 100, 100,
+            bids=[(1900, 10), (1800, 20)],
+            asks=[(2000, 10), (2100, 15)])
+
+    def test_buffers_until_snapshot(self):
+        assert self.synchronizer.on_update(OrderBookUpdate("ETHUSDT", 95, 101, asks=[(2000, 5)])) is None
+        assert self.synchronizer.needs_snapshot()
+
+        order_book = self.synchronizer.on_snapshot(self.snapshot)
+        assert order_book.asks[0].quantity == 5
+        assert self.synchronizer.order_book.last_update_id == 101
+
+    def test_drops_updates_contained_in_snapshot(self):
+        self.synchronizer.on_update(OrderBookUpdate("ETHUSDT", 90, 99, asks=[(2000, 1)]))
+        self.synchronizer.on_update(OrderBookUpdate("ETHUSDT", 100, 102, asks=[(2050, 1)]))
+
+        order_book = self.synchronizer.on_snapshot(self.snapshot)
+        assert [order.price for order in order_book.asks] == [2000, 2050, 2100]
+        assert order_book.asks[0].quantity == 10
+
+    def test_old_snapshot_is_rejected(self):
+        self.synchronizer.on_update(OrderBookUpdate("ETHUSDT", 105, 106))
+        assert self.synchronizer.on_snapshot(self.snapshot) is None
+        assert not self.synchronizer.synced
+
+    def test_applies_levels_sorted(self):
+        self.synchronizer.on_update(OrderBookUpdate("ETHUSDT", 101, 101))
+        self.synchronizer.on_snapshot(self.snapshot)
+
+        order_book = self.synchronizer.on_update(OrderBookUpdate("ETHUSDT", 102, 103,
+            bids=[(1950, 3), (1800, 0)],
+            asks=[(2100, 0), (1990, 2)]))
+
+        assert [(order.price, order.quantity) for order in order_book.bids] == [(1950, 3), (1900, 10)]
+        assert [(order.price, order.quantity) for order in order_book.asks] == [(1990, 2), (2000, 10)]
+
+    def test_publishes_incrementally(self):
+        self.synchronizer.on_update(OrderBookUpdate("ETHUSDT", 101, 101))
+        first = self.synchronizer.on_snapshot(self.snapshot)
+
+        # only second ask level changes, bids are published as is
+        order_book = self.synchronizer.on_update(OrderBookUpdate("ETHUSDT", 102, 102, asks=[(2100, 5), (2200, 1)]))
+        assert order_book.change == OrderBookChange(bids=False, asks=True, top=False)
+        assert order_book.bids is first.bids
+
+        expected = PriceLevels.of([LimitOrder(2000, 10), LimitOrder(2100, 5), LimitOrder(2200, 1)])
+        assert list(order_book.asks.cumulative_quantities) == list(expected.cumulative_quantities)
+        assert list(order_book.asks.cumulative_volumes) == list(expected.cumulative_volumes)
+
+        order_book = self.synchronizer.on_update(OrderBookUpdate("ETHUSDT", 103, 103, bids=[(1900, 10)]))
+        assert order_book.change == OrderBookChange(bids=False, asks=False, top=False)
+
+    def test_resync_on_gap(self):
+        self.synchronizer.on_update(OrderBookUpdate("ETHUSDT", 101, 101))
+        self.synchronizer.on_snapshot(self.snapshot)
+
+        assert self.synchronizer.on_update(OrderBookUpdate("ETHUSDT", 105, 106)) is None
+        assert not self.synchronizer.synced
+        assert self.synchronizer.needs_snapshot()
+
+def test_full_depth_client_feeds_quote_service():
+    async def run():
+        provider = LocalSnapshotProvider({
+            "lastUpdateId": 100,
+            "bids": [["1900", "10"]],
+            "asks": [[str(2000 + i), "1"] for i in range(100)]})
+
+        client = BinanceSpotWebSocketClient()
+        client.set_symbols(["ETHUSDT"])
+        client.set_full_depth(provider)
+        quote_service = QuoteService()
+        client.observers.append(quote_service)
+
+        assert "ethusdt@depth@100ms" in client.get_uri()
+
+        client.on_message(diff_message(99, 101, asks=[["2000", "2"]]))
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+
+        client.on_message(diff_message(102, 102, bids=[["1950", "1"]]))
+        return provider, quote_service
+
+    provider, quote_service = asyncio.run(run())
+
+    assert provider.requests == 1
+    order_book = quote_service.order_books["ETHUSDT"]
+    assert len(order_book.asks) == 100
+    assert order_book.asks[0].quantity == 2
+    assert order_book.bids[0].price == 1950
+
+def test_parse_symbol_precisions():
+    exchange_info = {"symbols": [{"symbol": "ETHUSDT", "filters": [
+        {"filterType": "PRICE_FILTER", "tickSize": "0.01000000"},
+        {"filterType": "LOT_SIZE", "stepSize": "0.00010000"}]}]}
+    assert BinanceSpotPrecisionProvider.parse_precisions(exchange_info) == {"ETHUSDT": (2, 4)}
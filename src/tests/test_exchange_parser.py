@@ -0,0 +1,59 @@
+import json
+from decimal import Decimal
+from models.quote import QuoteRequest
+from models.order_book import LimitOrder, PriceLevels, RawPriceLevels, FixedPointPriceLevels
+from services.quote_service import QuoteService
+from utils.exchange_parser import BinanceSpotWebSocketMessageParser, get_fast_json_decoder
+
+message = {
+    "stream": "ethusdt@depth5@100ms",
+    "data": {
+        "lastUpdateId": 160,
+        "bids": [["1900.00", "10.0"], ["1800.00", "20.0"]],
+        "asks": [["2000.00", "10.0"], ["2100.00", "15.0"]]}}
+
+def test_convert_order_book():
+    order_book = BinanceSpotWebSocketMessageParser().convert_order_book(message)
+    assert order_book.symbol == "ETHUSDT"
+    assert isinstance(order_book.asks, PriceLevels)
+    assert list(order_book.asks) == [LimitOrder(2000, 10), LimitOrder(2100, 15)]
+    assert list(order_book.bids.cumulative_quantities) == [10, 30]
+
+def test_convert_order_book_lazy():
+    order_book = BinanceSpotWebSocketMessageParser(lazy=True).convert_order_book(message)
+    assert isinstance(order_book.asks, RawPriceLevels)
+    assert len(order_book.asks) == 2
+    assert not order_book.asks.is_materialized()
+
+    quote_service = QuoteService()
+    quote_service.on_order_book_received(order_book)
+    assert not order_book.asks.is_materialized()
+
+    response = quote_service.quote(QuoteRequest("buy", "ETH", "USDT", 20))
+    assert response.total == 41000
+    assert order_book.asks.is_materialized()
+    assert not order_book.bids.is_materialized()
+    assert list(order_book.asks.cumulative_volumes) == [20000, 51500]
+
+def test_fast_json_decoder():
+    assert get_fast_json_decoder()(json.dumps(message)) == message
+
+def test_convert_order_book_fixed_point():
+    parser = BinanceSpotWebSocketMessageParser()
+    parser.set_fixed_point({"ETHUSDT": (2, 4)})
+    order_book = parser.convert_order_book(message)
+    assert isinstance(order_book.asks, FixedPointPriceLevels)
+    assert list(order_book.asks.prices) == [200000, 210000]
+    assert list(order_book.bids.cumulative_quantities) == [100000, 300000]
+
+    quote_service = QuoteService()
+    quote_service.on_order_book_received(order_book)
+    response = quote_service.quote(QuoteRequest("buy", "ETH", "USDT", 0.3))
+    assert response.total == Decimal("600.00")
+    assert response.price == Decimal("2000.00")
+
+def test_fixed_point_precision_of_level_strings():
+    parser = BinanceSpotWebSocketMessageParser()
+    parser.set_fixed_point()
+    parser.convert_order_book(message)
+    assert parser.precisions["ETHUSDT"] == (2, 1)
@@ -0,0 +1,284 @@
+import asyncio, json, time, websockets
+from models.order_book import LimitOrderBook, OrderBookChange, UNCHANGED
+from models.quote import QuoteRequest
+from services.price_service import OrderBookObserver
+from services.exchange_service import BinanceSpotWebSocketClient
+from services.metrics_service import ServiceMetrics
+from services.quote_cache import QuoteCache
+from services.quote_service import QuoteService
+from services.subscription_service import QuoteSubscriptionService
+from tests.helpers import RecordingObserver, raw_message
+
+class TestConflation:
+    """Tests latest-only processing of received messages"""
+
+    def setup_method(self):
+        self.client = BinanceSpotWebSocketClient()
+        self.client.set_conflation()
+        self.observer = RecordingObserver()
+        self.client.observers.append(self.observer)
+
+    def test_stream_key(self):
+        parser = self.client.parser
+        assert parser.get_stream_key(raw_message("ETHUSDT", 1)) == "ethusdt@depth5@100ms"
+        assert parser.get_stream_key(raw_message("ETHUSDT", 1).encode()) == "ethusdt@depth5@100ms"
+        assert parser.get_stream_key(raw_message("ETHUSDT", 1, "depth@100ms")) is None
+
+    def test_superseded_messages_are_dropped(self):
+        async def run():
+            for price in [2000, 2001, 2002]:
+                self.client._enqueue(raw_message("ETHUSDT", price), 0)
+            self.client._enqueue(raw_message("BTCUSDT", 60000), 0)
+
+            process_task = asyncio.create_task(self.client._process())
+            await asyncio.sleep(0.01)
+            process_task.cancel()
+
+        asyncio.run(run())
+
+        assert [(order_book.symbol, order_book.asks[0].price) for order_book in self.observer.order_books] == \
+            [("ETHUSDT", 2002), ("BTCUSDT", 60000)]
+        assert self.client.stats.conflated == 2
+        assert self.client.stats.processed == 2
+        assert self.client.stats.max_lag > 0
+
+    def test_messages_received_while_processing_are_conflated(self):
+        client = self.client
+
+        class EnqueueingObserver(OrderBookObserver):
+            def on_order_book_received(self, order_book: LimitOrderBook):
+                # newer messages arrive while observer is busy
+                if order_book.asks[0].price == 2000:
+                    client._enqueue(raw_message("ETHUSDT", 2001), 0)
+                    client._enqueue(raw_message("ETHUSDT", 2002), 0)
+
+        client.observers.insert(0, EnqueueingObserver())
+
+        async def run():
+            client._enqueue(raw_message("ETHUSDT", 2000), 0)
+            process_task = asyncio.create_task(client._process())
+            await asyncio.sleep(0.01)
+            process_task.cancel()
+
+        asyncio.run(run())
+
+        assert [order_book.asks[0].price for order_book in self.observer.order_books] == [2000, 2002]
+        assert client.stats.conflated == 1
+
+
+class TestIngestionMetrics:
+    """Tests per symbol metrics of processed messages"""
+
+    def test_parse_time_is_recorded(self):
+        client = BinanceSpotWebSocketClient()
+        metrics = ServiceMetrics()
+        client.set_metrics(metrics)
+
+        client._process_message(raw_message("ETHUSDT", 2000), 0)
+        client._notify(LimitOrderBook("BTCUSDT", [], []))
+
+        assert metrics.order_books.get("ETHUSDT") == 1
+        assert metrics.parse_time.get_count("ETHUSDT") == 1
+
+        # snapshot order books are not parsed from a received message
+        assert metrics.order_books.get("BTCUSDT") == 1
+        assert metrics.parse_time.get_count("BTCUSDT") == 0
+
+
+def depth_message(symbol: str, bids: list, asks: list) -> str:
+    return json.dumps({"stream": f"{symbol.lower()}@depth5@100ms", "data": {"lastUpdateId": 1, "bids": bids, "asks": asks}})
+
+class TestChangeDetection:
+    """Tests skipping conversion and republishing of unchanged order books"""
+
+    bids = [["1999.00", "1.0"], ["1998.00", "2.0"]]
+    asks = [["2000.00", "1.0"], ["2001.00", "2.0"]]
+
+    def setup_method(self):
+        self.client = BinanceSpotWebSocketClient()
+        self.client.set_change_detection()
+        self.observer = RecordingObserver()
+        self.client.observers.append(self.observer)
+
+    def test_changed_sides(self):
+        for bids, asks in [
+            (self.bids, self.asks),
+            (self.bids, self.asks),
+            (self.bids, [self.asks[0], ["2001.00", "3.0"]]),
+            ([["1999.50", "1.0"]] + self.bids[1:], [self.asks[0], ["2001.00", "3.0"]])]:
+            self.client._process_message(depth_message("ETHUSDT", bids, asks), 0)
+
+        first, unchanged, asks_changed, top_changed = self.observer.order_books
+        assert first.change is None
+        assert unchanged.change == UNCHANGED and unchanged.asks is first.asks and unchanged.received_time == 0
+        assert asks_changed.change == OrderBookChange(bids=False, asks=True, top=False)
+        assert asks_changed.asks[1].quantity == 3
+        assert top_changed.change == OrderBookChange(bids=True, asks=False, top=True)
+        assert self.client.stats.unchanged == 1
+
+    def test_unchanged_order_book_keeps_version_and_cache(self):
+        cache = QuoteCache()
+        quote_service = QuoteService(cache)
+        subscription_service = QuoteSubscriptionService(quote_service)
+        self.client.observers = [quote_service, subscription_service]
+
+        results = []
+        self.client._process_message(depth_message("ETHUSDT", self.bids, self.asks), time.time() - 10)
+        subscription_service.subscribe(QuoteRequest("buy", "ETH", "USDT", 1), lambda key, result: results.append(result))
+        first = quote_service.quote(QuoteRequest("buy", "ETH", "USDT", 1))
+
+        hits, batches = cache.hits, []
+        quote_batch = quote_service.quote_batch
+        quote_service.quote_batch = lambda requests: batches.append(requests) or quote_batch(requests)
+
+        self.client._process_message(depth_message("ETHUSDT", self.bids, self.asks), time.time())
+        snapshot = quote_service.order_books["ETHUSDT"]
+        assert snapshot.version == 1 and snapshot.get_age() < 1
+
+        # cached quote is served for a fresh book
+        assert quote_service.quote(QuoteRequest("buy", "ETH", "USDT", 1, max_age=5)) is first
+        assert cache.hits == hits + 1 and cache.invalidations == 0
+        assert batches == [] and len(results) == 1
+
+        self.client._process_message(depth_message("ETHUSDT", self.bids, [["2002.00", "1.0"]]), time.time())
+        assert quote_service.order_books["ETHUSDT"].version == 2
+        assert len(batches) == 1 and results[-1].total == 2002
+
+    def test_unsubscribed_symbol_is_compared_again(self):
+        async def run():
+            self.client.symbols = ["ETHUSDT"]
+            self.client._process_message(depth_message("ETHUSDT", self.bids, self.asks), 0)
+            await self.client.unsubscribe(["ETHUSDT"])
+            await self.client.subscribe(["ETHUSDT"])
+            self.client._process_message(depth_message("ETHUSDT", self.bids, self.asks), 0)
+
+        asyncio.run(run())
+        assert [order_book.change for order_book in self.observer.order_books] == [None, None]
+
+
+class BroadcastFeed:
+    """Local stand-in of an exchange that sends the same messages to every open connection and can drop them"""
+
+    def __init__(self):
+        self.websockets = []
+        self.connection_count = 0
+        self.server = None
+
+    async def _serve(self, websocket):
+        self.websockets.append(websocket)
+        self.connection_count += 1
+        try:
+            await websocket.wait_closed()
+        finally:
+            self.websockets.remove(websocket)
+
+    async def broadcast(self, message: str):
+        for websocket in list(self.websockets):
+            try:
+                await websocket.send(message)
+            except websockets.ConnectionClosed:
+                pass
+
+    def drop(self, index: int):
+        """Aborts connection without a close handshake like a network failure"""
+        self.websockets[index].transport.abort()
+
+    async def start(self) -> str:
+        self.server = await websockets.serve(self._serve, "127.0.0.1", 0)
+        return f"ws://127.0.0.1:{self.server.sockets[0].getsockname()[1]}"
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+
+class TestRedundantConnections:
+    """Tests deduplication and failover of hot standby connections"""
+
+    def setup_method(self):
+        self.client = BinanceSpotWebSocketClient()
+        self.client.set_symbols(["ETHUSDT"])
+        self.client.set_redundancy(2, reconnect_backoff=0.01)
+        self.observer = RecordingObserver()
+        self.client.observers.append(self.observer)
+
+    def test_message_id(self):
+        assert self.client.parser.get_message_id(raw_message("ETHUSDT", 2000, update_id=42)) == ("ethusdt@depth5@100ms", 42)
+
+    @staticmethod
+    async def wait_until(condition):
+        for _ in range(500):
+            if condition():
+                return
+            await asyncio.sleep(0.01)
+        raise TimeoutError
+
+    def test_first_arrival_wins_and_failover(self):
+        wait_until = TestRedundantConnections.wait_until
+
+        async def run():
+            feed = BroadcastFeed()
+            self.client.base_uri = await feed.start()
+            await self.client.start()
+            await wait_until(lambda: len(feed.websockets) == 2)
+
+            for update_id in range(1, 6):
+                await feed.broadcast(raw_message("ETHUSDT", 2000 + update_id, update_id=update_id))
+            await wait_until(lambda: self.client.stats.received == 10)
+
+            # surviving connection keeps delivering while dropped one reconnects
+            feed.drop(0)
+            for update_id in range(6, 11):
+                await feed.broadcast(raw_message("ETHUSDT", 2000 + update_id, update_id=update_id))
+            await wait_until(lambda: len(self.observer.order_books) == 10)
+            await wait_until(lambda: feed.connection_count == 3)
+
+            await self.client.stop()
+            await feed.stop()
+
+        asyncio.run(run())
+        assert [order_book.asks[0].price for order_book in self.observer.order_books] == list(range(2001, 2011))
+        assert self.client.stats.duplicates >= 5
+        assert self.client.stats.reconnects >= 1
+
+    def test_identical_frames_are_dropped(self):
+        async def run():
+            feed = BroadcastFeed()
+            self.client.base_uri = await feed.start()
+            await self.client.start()
+            await TestRedundantConnections.wait_until(lambda: len(feed.websockets) == 2)
+
+            # every frame arrives on both connections with the same update id
+            for update_id in range(1, 21):
+                await feed.broadcast(raw_message("ETHUSDT", 2000 + update_id, update_id=update_id))
+            await TestRedundantConnections.wait_until(lambda: self.client.stats.received == 40)
+
+            pinging = all(connection.ping_task is not None for connection in self.client.connections)
+            await self.client.stop()
+            await feed.stop()
+            return pinging
+
+        assert asyncio.run(run())
+        assert self.client.stats.duplicates == 20
+        assert self.client.stats.processed == 20
+        assert [order_book.asks[0].price for order_book in self.observer.order_books] == list(range(2001, 2021))
+
+    def test_conflation(self):
+        self.client.set_conflation()
+
+        async def run():
+            feed = BroadcastFeed()
+            self.client.base_uri = await feed.start()
+            await self.client.start()
+            await TestRedundantConnections.wait_until(lambda: len(feed.websockets) == 2)
+
+            for update_id in range(1, 11):
+                await feed.broadcast(raw_message("ETHUSDT", 2000 + update_id, update_id=update_id))
+            await TestRedundantConnections.wait_until(
+                lambda: self.observer.order_books and self.observer.order_books[-1].asks[0].price == 2010)
+
+            await self.client.stop()
+            await feed.stop()
+
+        asyncio.run(run())
+        assert self.client.stats.processed + self.client.stats.conflated == 10
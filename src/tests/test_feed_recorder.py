@@ -0,0 +1,110 @@
+import asyncio, os
+from services.exchange_service import BinanceSpotWebSocketClient
+from services.feed_replay import FeedReplayServer
+from utils.feed_recorder import FeedRecorder, get_feed_files, read_feed
+from tests.helpers import RecordingObserver, raw_message
+
+class TestFeedRecorder:
+    """Tests recording and reading of raw feed frames"""
+
+    def test_round_trip(self, tmp_path):
+        path = str(tmp_path / "feed.log")
+        recorder = FeedRecorder(path)
+        recorder.write(raw_message("ETHUSDT", 2000), 1.5)
+        recorder.write(raw_message("BTCUSDT", 60000).encode(), 2.25)
+        recorder.close()
+
+        assert list(read_feed(path)) == [
+            (1_500_000_000, raw_message("ETHUSDT", 2000)),
+            (2_250_000_000, raw_message("BTCUSDT", 60000))]
+
+    def test_compressed_append(self, tmp_path):
+        path = str(tmp_path / "feed.log")
+        for price in [2000, 2001]:
+            recorder = FeedRecorder(path, compress=True)
+            recorder.write(raw_message("ETHUSDT", price), 1)
+            recorder.close()
+
+        assert get_feed_files(path) == [path + ".gz"]
+        assert [message for _, message in read_feed(path)] == [raw_message("ETHUSDT", 2000), raw_message("ETHUSDT", 2001)]
+
+    def test_written_bytes_are_bytes_on_disk(self, tmp_path):
+        path = str(tmp_path / "feed.log")
+        recorder = FeedRecorder(path, compress=True)
+        recorder.write(raw_message("ETHUSDT", 2000), 1)
+        recorder.close()
+
+        # appending continues from compressed size of the existing file
+        recorder = FeedRecorder(path, compress=True)
+        recorder.write(raw_message("ETHUSDT", 2001), 2)
+        recorder.flush()
+        assert recorder.written_bytes == os.path.getsize(path + ".gz")
+        recorder.close()
+
+    def test_writes_are_buffered(self, tmp_path):
+        path = str(tmp_path / "feed.log")
+        recorder = FeedRecorder(path, buffer_size=1024, flush_interval=60)
+        recorder.write(raw_message("ETHUSDT", 2000), 1)
+        assert not os.path.exists(path)
+
+        recorder.write("x" * 1024, 2)
+        recorder.flush()
+        assert len(list(read_feed(path))) == 2
+        recorder.close()
+
+    def test_rotation(self, tmp_path):
+        path = str(tmp_path / "feed.log")
+        message = raw_message("ETHUSDT", 2000)
+        recorder = FeedRecorder(path, max_bytes=len(message) * 2)
+        for index in range(5):
+            recorder.write(message, index)
+        recorder.close()
+
+        assert get_feed_files(path) == [path, path + ".00001", path + ".00002"]
+        assert [timestamp for timestamp, _ in read_feed(path)] == [index * 1_000_000_000 for index in range(5)]
+
+    def test_truncated_record_is_skipped(self, tmp_path):
+        path = str(tmp_path / "feed.log")
+        recorder = FeedRecorder(path)
+        recorder.write(raw_message("ETHUSDT", 2000), 1)
+        recorder.write(raw_message("ETHUSDT", 2001), 2)
+        recorder.close()
+
+        with open(path, "r+b") as file:
+            file.truncate(os.path.getsize(path) - 5)
+
+        assert [message for _, message in read_feed(path)] == [raw_message("ETHUSDT", 2000)]
+
+
+class TestFeedReplay:
+    """Tests replaying a recorded feed to an unmodified exchange client"""
+
+    def test_replay_to_client(self, tmp_path):
+        path = str(tmp_path / "feed.log")
+        recorder = FeedRecorder(path)
+        for index, price in enumerate([2000, 2001, 2002]):
+            recorder.write(raw_message("ETHUSDT", price), 100 + index * 0.01)
+        recorder.close()
+
+        observer = RecordingObserver()
+
+        async def run():
+            replay_server = FeedReplayServer(path, speed=10)
+            await replay_server.start()
+
+            client = BinanceSpotWebSocketClient()
+            client.base_uri = replay_server.get_uri()
+            client.set_symbols(["ETHUSDT"])
+            client.observers.append(observer)
+            await client.start()
+
+            await asyncio.wait_for(replay_server.finished.wait(), 5)
+            while client.stats.processed < 3:
+                await asyncio.sleep(0.01)
+
+            await client.stop()
+            await replay_server.stop()
+            return replay_server.sent_frames
+
+        assert asyncio.run(run()) == 3
+        assert [order_book.asks[0].price for order_book in observer.order_books] == [2000, 2001, 2002]
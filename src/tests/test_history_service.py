@@ -0,0 +1,80 @@
+import time
+from models.quote import QuoteRequest
+from models.order_book import LimitOrder
+from services.history_service import OrderBookHistory, OrderBookHistoryService
+from services.quote_service import QuoteService
+from controllers.quote_controller import create_controller
+from tests.helpers import create_order_book
+
+class TestOrderBookHistory:
+    """Tests ring buffer of recent order books"""
+
+    def setup_method(self):
+        self.history_service = OrderBookHistoryService(capacity=3, max_depth=1)
+        for index, price in enumerate([1000, 2000, 3000, 4000]):
+            self.history_service.on_order_book_received(create_order_book("ETHUSDT", price, 100 + index))
+        self.history: OrderBookHistory = self.history_service.get_history("ETHUSDT")
+
+    def test_oldest_is_overwritten(self):
+        assert self.history.size == 3
+        assert self.history.get_snapshot(100.5) is None
+        assert self.history.get_snapshot(101).asks[0] == LimitOrder(2000, 10)
+        assert self.history.get_snapshot(102.9).asks[0] == LimitOrder(3000, 10)
+        assert self.history.get_snapshot(1000).received_time == 103
+
+    def test_levels_are_truncated_to_max_depth(self):
+        snapshot = self.history.get_snapshot(103)
+        assert len(snapshot.asks) == 1
+        assert list(snapshot.asks.cumulative_volumes) == [40000]
+
+    def test_time_weighted_fills(self):
+        fills = self.history.fill_window(1, 1, False, 101.5, 103.5, time_weighted=True)
+        assert fills == [(0.5, (1, 2000)), (1, (1, 3000)), (0.5, (1, 4000))]
+
+    def test_snapshot_fills(self):
+        fills = self.history.fill_window(1, 20, False, 102.5, 104, time_weighted=False)
+        assert fills == [(1, None), (1, None)]
+
+
+class TestWindowQuote:
+    """Tests quotes averaged over a history window"""
+
+    def setup_method(self):
+        self.history = OrderBookHistoryService()
+        self.quote_service = QuoteService(history=self.history)
+
+        now = time.time()
+        for price, received_time in [(1000, now - 100), (2000, now - 30), (3000, now - 10)]:
+            order_book = create_order_book("ETHUSDT", price, received_time)
+            self.quote_service.on_order_book_received(order_book)
+            self.history.on_order_book_received(order_book)
+
+    def test_twap(self):
+        response = self.quote_service.quote(QuoteRequest("buy", "ETH", "USDT", 1, window=40))
+        assert response.snapshots == 3
+
+        # 10 seconds of 1000, 20 seconds of 2000 and 10 seconds of 3000
+        assert abs(response.price - 2000) < 1
+        assert abs(response.total - 2000) < 1
+
+    def test_snapshot_average(self):
+        response = self.quote_service.quote(QuoteRequest("buy", "ETH", "USDT", 1, window=20, window_average="snapshot"))
+        assert response.snapshots == 2
+        assert response.price == 2500
+
+    def test_reversed_symbol(self):
+        response = self.quote_service.quote(QuoteRequest("sell", "USDT", "ETH", 1900, window=20, window_average="snapshot"))
+        assert response.total == (1900 / 1900 + 1900 / 2900) / 2
+
+    def test_disabled_history(self):
+        assert QuoteService().quote(QuoteRequest("buy", "ETH", "USDT", 1, window=10)) == "Order book history is disabled"
+
+    def test_history_endpoint(self):
+        client = create_controller(self.quote_service).test_client()
+
+        response = client.get("/history", query_string={"symbol": "ethusdt", "time": time.time() - 20})
+        assert response.status_code == 200
+        assert response.get_json()["asks"][0] == ["2000.0", "10.0"]
+
+        assert client.get("/history", query_string={"symbol": "ETHUSDT", "time": 0}).status_code == 404
+        assert client.get("/history", query_string={"symbol": "ETHUSDT", "time": "x"}).status_code == 400
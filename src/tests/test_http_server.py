@@ -0,0 +1,94 @@
+import asyncio, json
+from models.order_book import LimitOrder, LimitOrderBook
+from services.quote_service import QuoteService
+from controllers.quote_controller import QuoteController
+from controllers.http_server import AsyncHttpServer
+
+def create_request(body, connection=None) -> bytes:
+    content = json.dumps(body).encode()
+    header = f"POST /quote HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\nContent-Length: {len(content)}\r\n"
+    if connection:
+        header += f"Connection: {connection}\r\n"
+    return header.encode() + b"\r\n" + content
+
+async def read_response(reader: asyncio.StreamReader):
+    """Reads one response. Returns status code, headers and json body"""
+    status_line = await reader.readline()
+    headers = {}
+    while True:
+        line = (await reader.readline()).decode().strip()
+        if line == "":
+            break
+        name, _, value = line.partition(":")
+        headers[name.lower()] = value.strip()
+
+    body = await reader.readexactly(int(headers["content-length"]))
+    return int(status_line.split()[1]), headers, json.loads(body)
+
+def run_with_server(client):
+    """Runs client coroutine against an http server listening an ephemeral port"""
+    async def run():
+        quote_service = QuoteService()
+        quote_service.on_order_book_received(LimitOrderBook(
+            symbol="ETHUSDT",
+            asks=[LimitOrder(2000, 10), LimitOrder(2100, 15)],
+            bids=[LimitOrder(1900, 10)]))
+
+        server = AsyncHttpServer(QuoteController(quote_service).get_routes(), "127.0.0.1", 0)
+        await server.start()
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+            result = await client(reader, writer)
+            writer.close()
+            return result
+        finally:
+            await server.stop()
+
+    return asyncio.run(run())
+
+def test_quote():
+    async def client(reader, writer):
+        writer.write(create_request({"action": "buy", "base_currency": "ETH", "quote_currency": "USDT", "amount": "20"}))
+        return await read_response(reader)
+
+    status, headers, body = run_with_server(client)
+    assert status == 200
+    assert headers["connection"] == "keep-alive"
+    assert body == {"total": "41000.0", "price": "2050.0", "currency": "USDT", "version": 1}
+
+def test_pipelined_requests_answered_in_order():
+    async def client(reader, writer):
+        writer.write(
+            create_request({"action": "buy", "base_currency": "ETH", "quote_currency": "USDT", "amount": "1"}) +
+            create_request({"action": "buy", "base_currency": "ETH", "quote_currency": "USDT"}) +
+            create_request({"action": "sell", "base_currency": "ETH", "quote_currency": "USDT", "amount": "1"}, "close"))
+        return [await read_response(reader) for _ in range(3)] + [await reader.read()]
+
+    first, second, third, rest = run_with_server(client)
+    assert first[0] == 200 and first[2]["price"] == "2000.0"
+    assert second[0] == 400 and second[2] == "Missing parameter 'amount'"
+    assert third[0] == 200 and third[2]["price"] == "1900.0"
+    assert third[1]["connection"] == "close"
+    assert rest == b""
+
+def test_invalid_json_and_unknown_route():
+    async def client(reader, writer):
+        writer.write(b"POST /quote HTTP/1.1\r\nContent-Length: 3\r\n\r\n{x}")
+        writer.write(b"GET /unknown HTTP/1.1\r\n\r\n")
+        writer.write(b"GET /quote HTTP/1.1\r\n\r\n")
+        return [await read_response(reader) for _ in range(3)]
+
+    invalid_json, unknown, not_allowed = run_with_server(client)
+    assert invalid_json[0] == 400
+    assert unknown[0] == 404
+    assert not_allowed[0] == 405
+
+def test_negative_content_length_closes_connection():
+    async def client(reader, writer):
+        # a negative length would leave header bytes to be parsed as the next request
+        writer.write(b"POST /quote HTTP/1.1\r\nContent-Length: -30\r\nX: GET /ready HTTP/1.1\r\n\r\n")
+        return await read_response(reader), await reader.read()
+
+    (status, headers, body), rest = run_with_server(client)
+    assert status == 400 and body == "Invalid content length"
+    assert rest == b""
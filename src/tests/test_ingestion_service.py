@@ -0,0 +1,107 @@
+import asyncio, pytest, time
+from functools import partial
+from queue import SimpleQueue
+from models.order_book import LimitOrder, LimitOrderBook
+from services.exchange_service import IngestionStats
+from services.ingestion_service import (ShardedIngestion, QueueWriter, create_binance_client, decode_order_book,
+    encode_order_book, shard_symbols)
+from services.server import QuoteServer
+from utils.feed_recorder import FeedRecorder, read_feed
+from tests.helpers import FixedSnapshotProvider, RecordingObserver, StreamFeed
+
+def run_ingestion(mode: str, symbols, shard_count: int, recorder: FeedRecorder = None, **client_options):
+    observer = RecordingObserver()
+
+    async def run():
+        feed = StreamFeed()
+        uri = await feed.start()
+
+        ingestion = ShardedIngestion(partial(create_binance_client, base_uri=uri, **client_options), symbols, shard_count, mode)
+        ingestion.observers.append(observer)
+        for client in ingestion.get_clients():
+            client.set_recorder(recorder)
+        await ingestion.start()
+
+        deadline = time.time() + 20
+        while len(observer.order_books) < len(symbols) and time.time() < deadline:
+            await asyncio.sleep(0.01)
+
+        await ingestion.stop()
+        await feed.stop()
+        return feed.paths, ingestion.get_stats()
+
+    paths, stats = asyncio.run(run())
+    return sorted(observer.order_books, key=lambda order_book: order_book.symbol), paths, stats
+
+
+class TestShardedIngestion:
+    """Tests splitting watched symbols across websocket connections"""
+
+    symbols = ["BTCUSDT", "ETHUSDT", "LTCUSDT", "BNBUSDT", "USDTTRY"]
+
+    def test_shard_symbols(self):
+        assert shard_symbols(self.symbols, 2) == [["BTCUSDT", "LTCUSDT", "USDTTRY"], ["ETHUSDT", "BNBUSDT"]]
+        assert shard_symbols(self.symbols, 1, max_streams=2) == [["BTCUSDT", "BNBUSDT"], ["ETHUSDT", "USDTTRY"], ["LTCUSDT"]]
+        assert shard_symbols(["BTCUSDT"], 4) == [["BTCUSDT"]]
+
+    def test_order_book_transfer(self):
+        order_book = LimitOrderBook("ETHUSDT", [LimitOrder(1900, 2)], [LimitOrder(2000, 1), LimitOrder(2100, 3)], 5, 6.5)
+        decoded, stats = decode_order_book(encode_order_book(order_book, IngestionStats(received=3)))
+
+        assert (decoded.symbol, decoded.event_time, decoded.received_time, stats.received) == ("ETHUSDT", 5, 6.5, 3)
+        assert list(decoded.asks.cumulative_volumes) == [2000, 8300]
+        assert decoded.bids[0] == LimitOrder(1900, 2)
+        assert decode_order_book(encode_order_book(order_book))[1] is None
+
+    def test_stats_are_sent_periodically(self):
+        queue = SimpleQueue()
+        writer = QueueWriter(queue, IngestionStats(received=1), stats_interval=60)
+        order_book = LimitOrderBook("ETHUSDT", [LimitOrder(1900, 2)], [LimitOrder(2000, 1)])
+
+        writer.on_order_book_received(order_book)
+        writer.on_order_book_received(order_book)
+        assert [decode_order_book(queue.get())[1] for _ in range(2)] == [IngestionStats(received=1), None]
+
+        writer.stats_interval = 0
+        writer.on_order_book_received(order_book)
+        assert decode_order_book(queue.get())[1] == IngestionStats(received=1)
+
+    def test_task_shards(self):
+        order_books, paths, stats = run_ingestion("task", self.symbols, 2)
+        assert [order_book.symbol for order_book in order_books] == sorted(self.symbols)
+        assert len(paths) == 2
+        assert stats.processed == 5
+
+    def test_thread_shards(self):
+        order_books, paths, stats = run_ingestion("thread", self.symbols, 3)
+        assert [order_book.symbol for order_book in order_books] == sorted(self.symbols)
+        assert len(paths) == 3
+        assert stats.processed == 5
+
+    def test_process_shards(self):
+        order_books, paths, _ = run_ingestion("process", self.symbols[:2], 2)
+        assert [order_book.symbol for order_book in order_books] == ["BTCUSDT", "ETHUSDT"]
+        assert len(paths) == 2
+
+    @pytest.mark.parametrize("mode", ["thread", "process"])
+    def test_full_depth_shards(self, mode):
+        order_books, paths, _ = run_ingestion(mode, self.symbols[:2], 2, full_depth=True,
+            snapshot_provider=FixedSnapshotProvider())
+
+        assert [order_book.symbol for order_book in order_books] == ["BTCUSDT", "ETHUSDT"]
+        assert all("@depth@100ms" in path for path in paths)
+        assert all(list(order_book.asks) == [LimitOrder(100, 1), LimitOrder(101, 2)] for order_book in order_books)
+
+    def test_task_shards_recording(self, tmp_path):
+        path = str(tmp_path / "feed.log")
+        recorder = FeedRecorder(path)
+        run_ingestion("task", self.symbols, 2, recorder)
+        recorder.close()
+
+        assert len(list(read_feed(path))) == len(self.symbols)
+
+    @pytest.mark.parametrize("mode", ["thread", "process"])
+    def test_recording_requires_task_shards(self, mode, tmp_path):
+        server = QuoteServer().set_symbols(self.symbols).set_ingestion_shards(2, mode).set_feed_recording(str(tmp_path / "feed.log"))
+        with pytest.raises(ValueError, match="requires 'task' ingestion mode"):
+            server.build()
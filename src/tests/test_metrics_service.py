@@ -0,0 +1,74 @@
+from models.order_book import LimitOrder, LimitOrderBook
+from services.metrics_service import Counter, Histogram, ServiceMetrics
+from services.quote_service import QuoteService
+from controllers.quote_controller import create_controller
+
+class TestMetrics:
+    """Tests metric recording and Prometheus text rendering"""
+
+    def test_counter(self):
+        counter = Counter("errors_total", "Errors", ("reason",))
+        counter.inc("invalid_amount")
+        counter.inc("invalid_amount", amount=2)
+
+        assert counter.get("invalid_amount") == 3
+        assert counter.render() == [
+            "# HELP errors_total Errors",
+            "# TYPE errors_total counter",
+            'errors_total{reason="invalid_amount"} 3']
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = Histogram("latency_seconds", "Latency", ("symbol",), buckets=(0.1, 1))
+        for value in [0.05, 0.1, 0.5, 2]:
+            histogram.observe(value, "ETHUSDT")
+
+        assert histogram.get_count("ETHUSDT") == 4
+        assert histogram.render()[2:] == [
+            'latency_seconds_bucket{symbol="ETHUSDT",le="0.1"} 2',
+            'latency_seconds_bucket{symbol="ETHUSDT",le="1"} 3',
+            'latency_seconds_bucket{symbol="ETHUSDT",le="+Inf"} 4',
+            'latency_seconds_sum{symbol="ETHUSDT"} 2.65',
+            'latency_seconds_count{symbol="ETHUSDT"} 4']
+
+    def test_order_book_metrics(self):
+        metrics = ServiceMetrics()
+        order_book = LimitOrderBook("ETHUSDT", [LimitOrder(1900, 1)], [LimitOrder(2000, 1)], 1000_000, 1000.25)
+        metrics.on_order_book(order_book, 0.0001)
+
+        quote_service = QuoteService()
+        quote_service.on_order_book_received(order_book)
+        metrics.set_order_books(lambda: quote_service.order_books)
+
+        assert metrics.order_books.get("ETHUSDT") == 1
+        assert metrics.parse_time.get_count("ETHUSDT") == 1
+        assert metrics.feed_latency.sums[("ETHUSDT", )] == 0.25
+        assert 'order_book_age_seconds{symbol="ETHUSDT"}' in metrics.render()
+
+
+class TestMetricsEndpoint:
+    """Tests /metrics endpoint"""
+
+    def setup_method(self):
+        self.quote_service = QuoteService()
+        self.quote_service.on_order_book_received(LimitOrderBook("ETHUSDT", [LimitOrder(1900, 10)], [LimitOrder(2000, 10)]))
+        self.metrics = ServiceMetrics()
+        self.client = create_controller(self.quote_service, self.metrics).test_client()
+
+    def test_quote_metrics(self):
+        self.client.post('/quote', json={"action": "buy", "base_currency": "ETH", "quote_currency": "USDT", "amount": "1"})
+        self.client.post('/quote', json={"action": "buy", "base_currency": "ETH", "quote_currency": "USDT", "amount": "x"})
+        self.client.post('/quotes', json=[{"action": "buy", "base_currency": "ETH", "quote_currency": "USDT", "amount": "100"}])
+
+        response = self.client.get('/metrics')
+        assert response.status_code == 200
+        assert response.content_type == ServiceMetrics.content_type
+
+        text = response.get_data(as_text=True)
+        assert 'quote_latency_seconds_count{symbol="ETHUSDT",action="buy"} 1' in text
+        assert 'quote_errors_total{reason="invalid_amount"} 1' in text
+        assert 'quote_errors_total{reason="quote_failed"} 1' in text
+        assert "quote_batch_latency_seconds_count 1" in text
+
+    def test_metrics_disabled(self):
+        client = create_controller(self.quote_service).test_client()
+        assert client.get('/metrics').status_code == 404
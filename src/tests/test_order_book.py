@@ -0,0 +1,81 @@
+from decimal import Decimal
+from models.order_book import LimitOrder, LimitOrderBook, PriceLevels, FixedPointPriceLevels, get_decimals, to_scaled_int
+from models.quote import QuoteRequest, PriceImpactRequest
+from services.quote_service import QuoteService
+
+class TestPriceLevels:
+    """Tests cumulative price level calculations"""
+
+    def setup_method(self):
+        self.levels = PriceLevels.of([
+            LimitOrder(2000, 10),
+            LimitOrder(2100, 15),
+            LimitOrder(2200, 10)])
+
+    def test_cumulative_sums(self):
+        assert list(self.levels.cumulative_quantities) == [10, 25, 35]
+        assert list(self.levels.cumulative_volumes) == [20000, 51500, 73500]
+
+    def test_sequence_access(self):
+        assert len(self.levels) == 3
+        assert self.levels[1] == LimitOrder(2100, 15)
+        assert self.levels[-1] == LimitOrder(2200, 10)
+        assert PriceLevels.of(self.levels) is self.levels
+
+    def test_fill_quantity_exact_level(self):
+        assert self.levels.fill(25) == (25, 51500)
+
+    def test_fill_quantity_partial_level(self):
+        assert self.levels.fill(30) == (30, 62500)
+
+    def test_fill_volume_partial_level(self):
+        assert self.levels.fill(24200, by_volume=True) == (12, 24200)
+
+    def test_fill_not_liquid(self):
+        assert self.levels.fill(35.1) is None
+        assert self.levels.fill(80000, by_volume=True) is None
+
+    def test_empty_levels(self):
+        assert PriceLevels.of([]).fill(1) is None
+
+
+class TestFixedPointPriceLevels:
+    """Tests exact integer fills of scaled price levels"""
+
+    def setup_method(self):
+        self.levels = FixedPointPriceLevels.from_raw([
+            ["2000.01000000", "0.10000000"],
+            ["2100.00000000", "0.20000000"]], 2, 4)
+
+    def test_scaled_values(self):
+        assert to_scaled_int("2000.01000000", 2) == 200001
+        assert get_decimals("0.00010000") == 4
+        assert list(self.levels.prices) == [200001, 210000]
+        assert list(self.levels.cumulative_quantities) == [1000, 3000]
+        assert self.levels[0] == LimitOrder(2000.01, 0.1)
+
+    def test_fill_quantity_is_exact(self):
+        assert self.levels.fill(0.3) == (Decimal("0.3"), Decimal("620.001"))
+
+    def test_fill_volume_rounds_quantity_down(self):
+        quantity, volume = self.levels.fill(300, by_volume=True)
+        assert volume == Decimal(300)
+        assert quantity == Decimal("0.1476")
+
+    def test_not_liquid(self):
+        assert self.levels.fill(0.4) is None
+
+    def test_round_price(self):
+        assert self.levels.round_price(Decimal("620.001") / Decimal("0.3")) == Decimal("2066.67")
+
+    def test_amount_below_one_step(self):
+        quote_service = QuoteService()
+        quote_service.on_order_book_received(LimitOrderBook("ETHUSDT", self.levels, self.levels))
+
+        for amount in [0, 0.00001]:
+            response = quote_service.quote(QuoteRequest("buy", "ETH", "USDT", amount))
+            assert (response.total, response.price) == (Decimal(0), Decimal(0))
+
+        point = quote_service.price_impact(PriceImpactRequest("ETHUSDT", "buy", [0.00001])).points[0]
+        assert point.price == Decimal("2000.01")
+        assert point.slippage == 0
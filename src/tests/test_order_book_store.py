@@ -0,0 +1,94 @@
+from multiprocessing.shared_memory import SharedMemory
+from models.quote import QuoteRequest, QuoteResponse
+from models.order_book import LimitOrder
+from services.order_book_store import OrderBookStore, OrderBookStoreView, OrderBookStoreWriter
+from services.quote_service import QuoteService
+from services.worker_service import StoreQuoteService, attach_shared_memory
+from tests.helpers import create_order_book
+
+class TestOrderBookStore:
+    """Tests shared order book layout and consistent reads"""
+
+    def setup_method(self):
+        buffer = memoryview(bytearray(OrderBookStore.get_size(max_symbols=2, max_depth=3)))
+        self.store = OrderBookStore(buffer, max_symbols=2, max_depth=3)
+        self.writer = OrderBookStoreWriter(self.store)
+        self.view = OrderBookStoreView(OrderBookStore(buffer))
+        self.quote_service = StoreQuoteService(self.view)
+
+    def test_write_and_read(self):
+        order_book = create_order_book(depth=3)
+        order_book.event_time = 123
+        self.writer.on_order_book_received(order_book)
+
+        snapshot = self.view["ETHUSDT"]
+        assert snapshot.version == 1
+        assert snapshot.event_time == 123
+        assert list(snapshot.asks.prices) == [2000, 2100, 2200]
+        assert list(snapshot.asks.cumulative_volumes) == [20000, 51500, 73500]
+        assert list(snapshot.bids.quantities) == [10, 20, 10]
+        assert self.store.get_sequence(0) == 2
+
+    def test_quotes_match_in_process_service(self):
+        quote_service = QuoteService()
+        for order_book in [create_order_book(depth=3), create_order_book("BTCUSDT", 60000, depth=3)]:
+            self.writer.on_order_book_received(order_book)
+            quote_service.on_order_book_received(order_book)
+
+        requests = [
+            QuoteRequest("buy", "ETH", "USDT", 20),
+            QuoteRequest("sell", "USDT", "BTC", 100000),
+            QuoteRequest("buy", "LTC", "USDT", 1)]
+
+        for request in requests:
+            assert self.quote_service.quote(request) == quote_service.quote(request)
+
+        assert self.quote_service.quote_batch(requests) == quote_service.quote_batch(requests)
+
+    def test_full_store(self):
+        for symbol in ["ETHUSDT", "BTCUSDT", "LTCUSDT"]:
+            self.writer.on_order_book_received(create_order_book(symbol, depth=3))
+
+        assert list(self.view) == ["ETHUSDT", "BTCUSDT"]
+
+    def test_depth_is_truncated(self):
+        order_book = create_order_book(depth=3)
+        order_book.asks.append(LimitOrder(2300, 1))
+        self.writer.on_order_book_received(order_book)
+        assert len(self.view["ETHUSDT"].asks) == 3
+
+    def test_retries_when_rewritten_during_read(self):
+        self.writer.on_order_book_received(create_order_book(depth=3))
+        end_read = self.view.end_read
+        writes = []
+
+        # order book is rewritten after first calculation read it
+        def rewrite_once():
+            if not writes:
+                writes.append(True)
+                self.writer.on_order_book_received(create_order_book(price=3000, depth=3))
+            return end_read()
+
+        self.view.end_read = rewrite_once
+        response = self.quote_service.quote(QuoteRequest("buy", "ETH", "USDT", 1))
+        assert isinstance(response, QuoteResponse)
+        assert response.price == 3000
+        assert response.version == 2
+
+def test_shared_memory_attach():
+    size = OrderBookStore.get_size(max_symbols=1, max_depth=3)
+    shared_memory = SharedMemory(create=True, size=size)
+    attached = None
+    try:
+        OrderBookStoreWriter(OrderBookStore(shared_memory.buf, 1, 3)).on_order_book_received(create_order_book(depth=3))
+
+        attached = attach_shared_memory(shared_memory.name)
+        quote_service = StoreQuoteService(OrderBookStoreView(OrderBookStore(attached.buf)))
+        response = quote_service.quote(QuoteRequest("buy", "ETH", "USDT", 20))
+        assert response.total == 41000
+        del quote_service, response
+    finally:
+        if attached is not None:
+            attached.close()
+        shared_memory.close()
+        shared_memory.unlink()
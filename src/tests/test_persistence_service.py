@@ -0,0 +1,79 @@
+import asyncio, time
+from models.quote import QuoteRequest, QuoteResponse
+from models.order_book import LimitOrder
+from services.order_book_store import OrderBookStore
+from services.persistence_service import OrderBookPersister
+from services.quote_service import QuoteService
+from tests.helpers import create_order_book
+
+class TestOrderBookPersister:
+    """Tests persisting order books to a mapped file and restoring them as stale"""
+
+    def setup_method(self):
+        self.quote_service = QuoteService()
+        self.quote_service.on_order_book_received(create_order_book(received_time=time.time() - 5))
+        self.quote_service.on_order_book_received(create_order_book("BTCUSDT", 60000))
+
+    def persist(self, path) -> OrderBookPersister:
+        persister = OrderBookPersister(str(path), max_symbols=2, max_depth=10).open()
+        persister.persist(self.quote_service.order_books)
+        asyncio.run(persister.stop())
+        return persister
+
+    def test_load_persisted(self, tmp_path):
+        persister = self.persist(tmp_path / "books.bin")
+
+        snapshots = {snapshot.symbol: snapshot for snapshot in persister.load()}
+        assert list(snapshots) == ["ETHUSDT", "BTCUSDT"]
+        assert list(snapshots["ETHUSDT"].asks.cumulative_volumes) == [20000, 51500]
+        assert snapshots["ETHUSDT"].received_time == self.quote_service.order_books["ETHUSDT"].received_time
+        assert [snapshot.symbol for snapshot in persister.load({"BTCUSDT"})] == ["BTCUSDT"]
+
+    def test_interrupted_write_is_skipped(self, tmp_path):
+        persister = self.persist(tmp_path / "books.bin")
+
+        # odd sequence left by a crash during write
+        with open(persister.path, "r+b") as file:
+            file.seek(OrderBookStore.header.size + OrderBookStore.sequence_offset)
+            file.write((3).to_bytes(8, "little"))
+
+        assert [snapshot.symbol for snapshot in persister.load()] == ["BTCUSDT"]
+
+    def test_missing_file(self, tmp_path):
+        assert OrderBookPersister(str(tmp_path / "missing.bin"), 2).load() == []
+
+    def test_reopen_keeps_slots(self, tmp_path):
+        persister = self.persist(tmp_path / "books.bin")
+        self.quote_service.on_order_book_received(create_order_book(price=2500))
+
+        persister = OrderBookPersister(persister.path, max_symbols=2, max_depth=10).open()
+        persister.persist(self.quote_service.order_books)
+        asyncio.run(persister.stop())
+
+        snapshots = {snapshot.symbol: snapshot for snapshot in persister.load()}
+        assert len(snapshots) == 2
+        assert snapshots["ETHUSDT"].version == 2
+        assert snapshots["ETHUSDT"].asks[0] == LimitOrder(2500, 10)
+
+    def test_restored_quotes_require_allow_stale(self, tmp_path):
+        persister = self.persist(tmp_path / "books.bin")
+        quote_service = QuoteService()
+        for snapshot in persister.load():
+            quote_service.restore(snapshot)
+
+        assert "allow_stale" in quote_service.quote(QuoteRequest("buy", "ETH", "USDT", 1))
+
+        response = quote_service.quote(QuoteRequest("buy", "ETH", "USDT", 1, allow_stale=True))
+        assert isinstance(response, QuoteResponse)
+        assert response.total == 2000
+        assert response.version == 1
+        assert response.stale_age >= 5
+
+        # restored books are still subject to max age
+        assert "seconds old" in quote_service.quote(QuoteRequest("buy", "ETH", "USDT", 1, max_age=1, allow_stale=True))
+
+        # first update replaces restored book
+        quote_service.on_order_book_received(create_order_book())
+        response = quote_service.quote(QuoteRequest("buy", "ETH", "USDT", 1))
+        assert response.stale_age is None
+        assert response.version == 2
@@ -0,0 +1,66 @@
+from models.quote import QuoteRequest
+from models.order_book import LimitOrder, LimitOrderBook
+from services.quote_cache import QuoteCache
+from services.quote_service import QuoteService
+
+class TestQuoteCache:
+    """Tests quote caching per order book version"""
+
+    def setup_method(self):
+        self.cache = QuoteCache(max_size=2)
+        self.quote_service = QuoteService(self.cache)
+        self.publish("ETHUSDT", 2000)
+        self.publish("BTCUSDT", 60000)
+
+    def publish(self, symbol, price):
+        self.quote_service.on_order_book_received(LimitOrderBook(
+            symbol, bids=[LimitOrder(price - 100, 10)], asks=[LimitOrder(price, 10)]))
+
+    def request(self, base="ETH", amount=1):
+        return QuoteRequest(action="buy", base_currency=base, quote_currency="USDT", amount=amount)
+
+    def test_hit_on_same_version(self):
+        first = self.quote_service.quote(self.request())
+        second = self.quote_service.quote(self.request())
+        assert second is first
+        assert self.cache.hits == 1
+        assert self.cache.misses == 1
+
+    def test_currencies_are_case_insensitive(self):
+        first = self.quote_service.quote(self.request())
+        second = self.quote_service.quote(QuoteRequest(action="buy", base_currency="eth", quote_currency="usdt", amount=1))
+        assert self.cache.hits == 1
+        assert (second.total, second.price, second.version) == (first.total, first.price, first.version)
+        assert (first.currency, second.currency) == ("USDT", "usdt")
+
+    def test_invalidated_on_new_order_book(self):
+        self.quote_service.quote(self.request())
+        self.quote_service.quote(self.request(base="BTC"))
+
+        self.publish("ETHUSDT", 2500)
+        assert self.cache.get_stats()["size"] == 1
+        assert self.cache.invalidations == 1
+
+        response = self.quote_service.quote(self.request())
+        assert response.price == 2500
+        assert response.version == 2
+
+    def test_lru_eviction(self):
+        self.quote_service.quote(self.request(amount=1))
+        self.quote_service.quote(self.request(amount=2))
+        self.quote_service.quote(self.request(amount=1))
+        self.quote_service.quote(self.request(amount=3))
+
+        assert self.cache.evictions == 1
+        assert QuoteCache.get_key(self.request(amount=2)) not in self.cache.entries
+        assert QuoteCache.get_key(self.request(amount=1)) in self.cache.entries
+
+    def test_errors_are_not_cached(self):
+        self.quote_service.quote(self.request(amount=100))
+        assert self.cache.get_stats()["size"] == 0
+
+    def test_freshness_checked_on_hit(self):
+        self.quote_service.quote(self.request())
+        request = self.request()
+        request.min_version = 2
+        assert isinstance(self.quote_service.quote(request), str)
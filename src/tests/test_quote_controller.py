@@ -0,0 +1,79 @@
+from models.order_book import LimitOrder, LimitOrderBook
+from services.quote_service import QuoteService
+from controllers.quote_controller import create_controller
+
+class TestQuoteController:
+    """Tests http endpoints"""
+
+    def setup_method(self):
+        order_book = LimitOrderBook(
+            symbol="ETHUSDT",
+            asks = [
+                LimitOrder(2000, 10),
+                LimitOrder(2100, 15),
+                LimitOrder(2200, 10)],
+            bids = [
+                LimitOrder(1900, 10),
+                LimitOrder(1800, 20),
+                LimitOrder(1700, 10)])
+
+        self.quote_service = QuoteService()
+        self.quote_service.on_order_book_received(order_book)
+        self.client = create_controller(self.quote_service).test_client()
+
+    def test_quote(self):
+        response = self.client.post('/quote', json={"action": "buy", "base_currency": "ETH", "quote_currency": "USDT", "amount": "20"})
+        assert response.status_code == 200
+        assert response.get_json() == {"total": "41000.0", "price": "2050.0", "currency": "USDT", "version": 1}
+
+    def test_quote_invalid(self):
+        response = self.client.post('/quote', json={"action": "buy", "base_currency": "ETH", "quote_currency": "USDT"})
+        assert response.status_code == 400
+        assert response.get_json() == "Missing parameter 'amount'"
+
+    def test_quotes_batch(self):
+        response = self.client.post('/quotes', json=[
+            {"action": "buy", "base_currency": "ETH", "quote_currency": "USDT", "amount": "20"},
+            {"action": "buy", "base_currency": "ETH", "quote_currency": "USDT", "amount": "1.5"},
+            {"action": "sell", "base_currency": "USDT", "quote_currency": "ETH", "amount": "3800"},
+            {"action": "buy", "base_currency": "ETH", "quote_currency": "USDT", "amount": "100"},
+            {"action": "buy", "base_currency": "LTC", "quote_currency": "USDT", "amount": "1"},
+            {"action": "buy", "base_currency": "ETH", "quote_currency": "USDT"},
+            "invalid"])
+
+        assert response.status_code == 200
+        results = response.get_json()
+        assert results[0] == {"total": "41000.0", "price": "2050.0", "currency": "USDT", "version": 1}
+        assert results[1] == {"total": "3000.0", "price": "2000.0", "currency": "USDT", "version": 1}
+        assert results[2] == {"total": "2.0", "price": "1900.0", "currency": "ETH", "version": 1}
+        assert "not liquid" in results[3]["error"]
+        assert "not valid" in results[4]["error"]
+        assert results[5] == {"error": "Missing parameter 'amount'"}
+        assert results[6] == {"error": "Quote request must be an object"}
+
+    def test_price_impact(self):
+        response = self.client.post('/impact', json={"symbol": "ETHUSDT", "action": "buy", "start": "10", "stop": "40", "step": "10"})
+        assert response.status_code == 200
+        result = response.get_json()
+        assert result["top_price"] == "2000.0"
+        assert [point["price"] for point in result["points"][:3]] == ["2000.0", "2050.0", "2083.3333333333335"]
+        assert "not liquid" in result["points"][3]["error"]
+
+    def test_price_impact_invalid(self):
+        response = self.client.post('/impact', json={"symbol": "LTCUSDT", "action": "buy", "amounts": [1]})
+        assert response.status_code == 400
+        assert "not received" in response.get_json()
+
+        response = self.client.post('/impact', json={"symbol": "ETHUSDT", "action": "buy", "start": "1e-300", "stop": "1e300", "step": "1e-300"})
+        assert response.status_code == 400
+
+    def test_ready(self):
+        response = self.client.get('/ready')
+        assert response.status_code == 200
+        assert response.get_json() == {"order_books": 1, "restored": []}
+
+        assert create_controller(QuoteService()).test_client().get('/ready').status_code == 503
+
+    def test_quotes_batch_not_list(self):
+        response = self.client.post('/quotes', json={"action": "buy"})
+        assert response.status_code == 400
@@ -68,4 +68,88 @@ def test_to_response_json():
         "total": "150.0",
         "price": "1.5",
         "currency": "EUR"
-    }
\ No newline at end of file
+    }
+
+def test_validate_request_invalid_max_age():
+    json = {
+        "action": "buy",
+        "base_currency": "USD",
+        "quote_currency": "EUR",
+        "amount": "100",
+        "max_age": "-1"
+    }
+    assert QuoteParser.validate_request(json) == "'-1' is not valid max_age"
+
+def test_to_request_freshness():
+    json = {
+        "action": "buy",
+        "base_currency": "USD",
+        "quote_currency": "EUR",
+        "amount": "100",
+        "min_version": "3",
+        "max_age": "0.5"
+    }
+    request = QuoteParser.to_request(json)
+    assert request.min_version == 3
+    assert request.max_age == 0.5
+
+def test_to_response_json_version():
+    response = QuoteResponse(total=150.0, price=1.5, currency="EUR", version=7)
+    assert QuoteParser.to_response_json(response)["version"] == 7
+
+def test_get_validation_error_reason():
+    json = {
+        "action": "exchange",
+        "base_currency": "USD",
+        "quote_currency": "EUR",
+        "amount": "100"
+    }
+    assert QuoteParser.get_validation_error(json) == ("invalid_action", "'exchange' is not valid action")
+    assert QuoteParser.get_validation_error({"action": "buy"})[0] == "missing_base_currency"
+
+def test_venue_breakdown():
+    json = {
+        "action": "buy",
+        "base_currency": "ETH",
+        "quote_currency": "USDT",
+        "amount": "1",
+        "venues": "yes"
+    }
+    assert QuoteParser.validate_request(json) == "'yes' is not valid venues"
+
+    json["venues"] = True
+    assert QuoteParser.to_request(json).venue_breakdown
+
+def test_impact_amounts_range():
+    json = {"symbol": "ethusdt", "action": "buy", "start": "5", "stop": "20", "step": "5"}
+    assert QuoteParser.get_impact_validation_error(json) == ("", "")
+    assert QuoteParser.to_impact_request(json).amounts == [5, 10, 15, 20]
+    assert QuoteParser.to_impact_request(json).symbol == "ETHUSDT"
+
+    json["step"] = "0.0001"
+    assert QuoteParser.get_impact_validation_error(json)[0] == "invalid_amounts"
+
+    json.update({"start": "1e-300", "stop": "1e300", "step": "1e-300"})
+    assert QuoteParser.get_impact_validation_error(json)[0] == "invalid_amounts"
+
+def test_impact_amounts_list():
+    json = {"symbol": "ETHUSDT", "action": "sell", "amounts": ["1", 2, "-1"]}
+    assert QuoteParser.get_impact_validation_error(json) == ("invalid_amounts", "'-1' is not valid amount")
+    assert QuoteParser.get_impact_validation_error({"symbol": "ETHUSDT", "action": "sell"})[0] == "invalid_amounts"
+
+def test_allow_stale():
+    json = {"action": "buy", "base_currency": "ETH", "quote_currency": "USDT", "amount": "1", "allow_stale": "true"}
+    assert QuoteParser.to_request(json).allow_stale
+
+    response = QuoteResponse(total=2000.0, price=2000.0, currency="USDT", stale_age=12.3456)
+    assert QuoteParser.to_response_json(response)["stale_age"] == 12.346
+
+def test_window():
+    json = {"action": "buy", "base_currency": "ETH", "quote_currency": "USDT", "amount": "1", "window": "30"}
+    request = QuoteParser.to_request(json)
+    assert (request.window, request.window_average) == (30, "twap")
+
+    json["average"] = "vwap"
+    assert QuoteParser.get_validation_error(json)[0] == "invalid_average"
+    json["window"] = "0"
+    assert QuoteParser.get_validation_error(json)[0] == "invalid_window"
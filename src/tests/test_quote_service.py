@@ -1,5 +1,6 @@
-from models.quote import QuoteRequest, QuoteResponse
-from models.order_book import LimitOrder, LimitOrderBook
+import time
+from models.quote import QuoteRequest, QuoteResponse, PriceImpactRequest, PriceImpactPoint
+from models.order_book import LimitOrder, LimitOrderBook, OrderBookSnapshot
 from utils.quote_parser import QuoteParser
 from services.quote_service import QuoteService
 
@@ -94,4 +95,68 @@ class TestQuoteService:
         request = QuoteRequest(action="buy", base_currency="USDT", quote_currency="ETH", amount=7000000)
         response = self.quote_service.quote(request)
         assert isinstance(response, str)
-        assert "not liquid" in response
\ No newline at end of file
+        assert "not liquid" in response
+
+    def test_quote_batch_matches_single_quotes(self):
+        requests = [
+            QuoteRequest(action="buy", base_currency="ETH", quote_currency="USDT", amount=amount)
+            for amount in [30, 1.5, 20, 10, 36]] + [
+            QuoteRequest(action="sell", base_currency="USDT", quote_currency="ETH", amount=amount)
+            for amount in [50000, 3800]]
+
+        responses = self.quote_service.quote_batch(requests)
+        assert responses == [self.quote_service.quote(request) for request in requests]
+        assert isinstance(responses[4], str)
+
+    def test_order_book_version_increases(self):
+        order_book = self.quote_service.order_books["ETHUSDT"]
+        self.quote_service.on_order_book_received(LimitOrderBook("ETHUSDT", order_book.bids, order_book.asks, event_time=5))
+
+        snapshot = self.quote_service.order_books["ETHUSDT"]
+        assert snapshot.version == 2
+        assert snapshot.event_time == 5
+        assert order_book.version == 1
+
+        request = QuoteRequest(action="buy", base_currency="ETH", quote_currency="USDT", amount=1.5)
+        assert self.quote_service.quote(request).version == 2
+
+    def test_min_version(self):
+        request = QuoteRequest(action="buy", base_currency="ETH", quote_currency="USDT", amount=1.5, min_version=2)
+        response = self.quote_service.quote(request)
+        assert isinstance(response, str)
+        assert "minimum version" in response
+
+        assert self.quote_service.get_order_book("ETHUSDT", min_version=1).version == 1
+
+    def test_max_age(self):
+        self.quote_service.on_order_book_received(LimitOrderBook("ETHUSDT", received_time=time.time() - 10))
+
+        request = QuoteRequest(action="buy", base_currency="ETH", quote_currency="USDT", amount=1.5, max_age=1)
+        response = self.quote_service.quote(request)
+        assert isinstance(response, str)
+        assert "maximum age" in response
+        assert isinstance(self.quote_service.get_order_book("ETHUSDT", max_age=60), OrderBookSnapshot)
+
+    def test_price_impact(self):
+        response = self.quote_service.price_impact(PriceImpactRequest("ETHUSDT", "buy", [20, 10, 40]))
+        assert response.top_price == 2000
+        assert response.version == 1
+        assert response.points[0] == PriceImpactPoint(20, 41000, 2050, 0.025)
+        assert response.points[1] == PriceImpactPoint(10, 20000, 2000, 0)
+        assert response.points[2] == PriceImpactPoint(40)
+
+    def test_price_impact_sell_slippage(self):
+        response = self.quote_service.price_impact(PriceImpactRequest("ETHUSDT", "sell", [20]))
+        assert response.points[0].price == 1850
+        assert response.points[0].slippage == 50 / 1900
+
+    def test_price_impact_matches_quotes(self):
+        amounts = [0.5 * step for step in range(1, 70)]
+        response = self.quote_service.price_impact(PriceImpactRequest("ETHUSDT", "buy", amounts))
+
+        for amount, point in zip(amounts, response.points):
+            quote = self.quote_service.quote(QuoteRequest("buy", "ETH", "USDT", amount))
+            if isinstance(quote, QuoteResponse):
+                assert (point.total, point.price) == (quote.total, quote.price)
+            else:
+                assert point.total is None
@@ -0,0 +1,84 @@
+import pytest
+from models.quote import QuoteRequest, QuoteResponse
+from models.order_book import LimitOrder, LimitOrderBook
+from services.quote_service import QuoteService
+from services.route_service import CurrencyRouter
+
+class TestCurrencyRouter:
+    """Tests currency graph and route search"""
+
+    def setup_method(self):
+        self.router = CurrencyRouter(max_hops=2)
+        self.router.update_symbols(["ETHUSDT", "USDTTRY", "ETHBTC", "BTCTRY"])
+
+    def test_split_symbol(self):
+        assert self.router.split_symbol("ETHUSDT") == ("ETH", "USDT")
+        assert self.router.split_symbol("USDTTRY") == ("USDT", "TRY")
+        assert self.router.split_symbol("XYZ") is None
+
+    def test_routes(self):
+        routes = self.router.get_routes("ETH", "TRY")
+        assert [[hop.symbol for hop in route] for route in routes] == [["ETHBTC", "BTCTRY"], ["ETHUSDT", "USDTTRY"]]
+
+    def test_routes_cached_until_symbols_change(self):
+        routes = self.router.get_routes("ETH", "TRY")
+        self.router.update_symbols(["USDTTRY", "ETHBTC", "BTCTRY", "ETHUSDT"])
+        assert self.router.get_routes("ETH", "TRY") is routes
+
+        self.router.update_symbols(["ETHUSDT", "USDTTRY"])
+        assert len(self.router.get_routes("ETH", "TRY")) == 1
+
+    def test_max_hops(self):
+        self.router.max_hops = 1
+        assert self.router.get_routes("ETH", "TRY") == []
+
+
+class TestRoutedQuote:
+    """Tests quotes through intermediate currencies"""
+
+    def setup_method(self):
+        self.quote_service = QuoteService(router=CurrencyRouter())
+
+        for symbol, bid, ask in [("ETHUSDT", 1900, 2000), ("USDTTRY", 29, 30), ("ETHBTC", 0.049, 0.05), ("BTCTRY", 1000000, 1100000)]:
+            self.quote_service.on_order_book_received(LimitOrderBook(
+                symbol, bids=[LimitOrder(bid, 1000000)], asks=[LimitOrder(ask, 1000000)]))
+
+    def test_buy_picks_cheapest_route(self):
+        response = self.quote_service.quote(QuoteRequest("buy", "ETH", "TRY", 1))
+        assert isinstance(response, QuoteResponse)
+        assert response.total == 55000
+        assert response.price == 55000
+        assert response.currency == "TRY"
+        assert list(response.route) == ["ETHBTC", "BTCTRY"]
+
+    def test_sell_picks_highest_route(self):
+        response = self.quote_service.quote(QuoteRequest("sell", "ETH", "TRY", 1))
+        assert response.total == 55100
+        assert list(response.route) == ["ETHUSDT", "USDTTRY"]
+
+    def test_reversed_hops(self):
+        self.quote_service.router.update_symbols(["ETHUSDT", "USDTTRY"])
+        response = self.quote_service.quote(QuoteRequest("buy", "TRY", "ETH", 60000))
+
+        # TRY is received by selling USDT at its bid and USDT by selling ETH at its bid
+        assert response.total == pytest.approx(60000 / 29 / 1900)
+        assert response.currency == "ETH"
+
+    def test_mixed_direct_and_reversed_hops(self):
+        quote_service = QuoteService(router=CurrencyRouter())
+        for symbol, bid, ask in [("LTCUSDT", 90, 100), ("ETHUSDT", 1000, 2000)]:
+            quote_service.on_order_book_received(LimitOrderBook(
+                symbol, bids=[LimitOrder(bid, 1000000)], asks=[LimitOrder(ask, 1000000)]))
+
+        buy = quote_service.quote(QuoteRequest("buy", "LTC", "ETH", 1))
+        sell = quote_service.quote(QuoteRequest("sell", "LTC", "ETH", 1))
+
+        # LTC bought at 100 USDT paid by selling ETH at 1000, sold at 90 USDT that buy ETH at 2000
+        assert buy.total == pytest.approx(0.1)
+        assert sell.total == pytest.approx(0.045)
+        assert sell.total <= buy.total
+
+    def test_no_route(self):
+        response = self.quote_service.quote(QuoteRequest("buy", "ETH", "GBP", 1))
+        assert isinstance(response, str)
+        assert "not valid" in response
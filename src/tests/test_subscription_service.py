@@ -0,0 +1,107 @@
+import asyncio, json, websockets
+from models.order_book import LimitOrderBook
+from models.quote import QuoteRequest, QuoteResponse
+from services.quote_service import QuoteService
+from services.route_service import CurrencyRouter
+from services.subscription_service import QuoteSubscriptionService
+from controllers.subscription_server import QuoteSubscriptionServer
+from tests.helpers import create_order_book
+
+class TestQuoteSubscriptionService:
+    """Tests recomputing standing quote requests on order book updates"""
+
+    def setup_method(self):
+        self.quote_service = QuoteService(router=CurrencyRouter())
+        self.service = QuoteSubscriptionService(self.quote_service)
+        self.pushed = []
+
+        for symbol, price in [("ETHUSDT", 2000), ("BTCUSDT", 60000)]:
+            self.publish(create_order_book(symbol, price))
+
+    def publish(self, order_book: LimitOrderBook):
+        self.quote_service.on_order_book_received(order_book)
+        self.service.on_order_book_received(order_book)
+
+    def subscriber(self, key, result):
+        self.pushed.append(result)
+
+    def test_current_result_is_pushed_on_subscribe(self):
+        self.service.subscribe(QuoteRequest("buy", "eth", "usdt", 1), self.subscriber)
+        assert self.pushed == [QuoteResponse(2000, 2000, "USDT", 1)]
+
+    def test_only_changed_results_are_pushed(self):
+        self.service.subscribe(QuoteRequest("buy", "ETH", "USDT", 1), self.subscriber)
+
+        # same price on a new version, other symbol, then changed price
+        self.publish(create_order_book("ETHUSDT", 2000))
+        self.publish(create_order_book("BTCUSDT", 61000))
+        self.publish(create_order_book("ETHUSDT", 2001))
+
+        assert [response.price for response in self.pushed] == [2000, 2001]
+        assert self.pushed[-1].version == 3
+
+    def test_shared_subscription_is_computed_once(self):
+        other = []
+        key = self.service.subscribe(QuoteRequest("buy", "ETH", "USDT", 1), self.subscriber)
+        self.service.subscribe(QuoteRequest("buy", "ETH", "USDT", 1), lambda key, result: other.append(result))
+
+        calls = []
+        quote_batch = self.quote_service.quote_batch
+        self.quote_service.quote_batch = lambda requests: calls.append(len(requests)) or quote_batch(requests)
+
+        self.publish(create_order_book("ETHUSDT", 2001))
+        assert calls == [1]
+        assert len(self.pushed) == len(other) == 2
+
+        self.service.unsubscribe(key, self.subscriber)
+        self.service.unsubscribe(key, self.service.get_subscription(key).subscribers[0])
+        assert self.service.subscriptions == {} and self.service.subscriptions_by_symbol == {}
+
+    def test_routed_subscription_follows_route_books(self):
+        self.service.subscribe(QuoteRequest("sell", "BTC", "ETH", 0.1), self.subscriber)
+        assert self.pushed[-1].route == {"BTCUSDT": 1, "ETHUSDT": 1}
+
+        self.publish(create_order_book("ETHUSDT", 2500))
+        assert self.pushed[-1].route == {"BTCUSDT": 1, "ETHUSDT": 2}
+        assert len(self.pushed) == 2
+
+        # new symbol prices pair directly
+        self.publish(create_order_book("ETHBTC", 0.04, depth=1, bid=0.025))
+        assert self.pushed[-1].route is None
+        assert self.pushed[-1].total == 4
+
+
+class TestQuoteSubscriptionServer:
+    """Tests websocket subscription endpoint"""
+
+    def test_subscribe_and_receive_changes(self):
+        quote_service = QuoteService()
+        service = QuoteSubscriptionService(quote_service)
+        order_book = create_order_book("ETHUSDT", 2000)
+        quote_service.on_order_book_received(order_book)
+
+        async def run():
+            server = await QuoteSubscriptionServer(service, "127.0.0.1", 0).start()
+            messages = []
+
+            async with websockets.connect(f"ws://127.0.0.1:{server.port}") as websocket:
+                await websocket.send(json.dumps({"type": "subscribe", "id": 7,
+                    "request": {"action": "buy", "base_currency": "ETH", "quote_currency": "USDT", "amount": "2"}}))
+                messages.append(json.loads(await websocket.recv()))
+
+                order_book = create_order_book("ETHUSDT", 2100)
+                quote_service.on_order_book_received(order_book)
+                service.on_order_book_received(order_book)
+                messages.append(json.loads(await websocket.recv()))
+
+                await websocket.send(json.dumps({"type": "subscribe", "id": 8, "request": {"action": "buy"}}))
+                messages.append(json.loads(await websocket.recv()))
+
+            await server.stop()
+            return messages
+
+        messages = asyncio.run(run())
+        assert messages[0] == {"type": "quote", "id": 7, "total": "4000.0", "price": "2000.0", "currency": "USDT", "version": 1}
+        assert messages[1]["total"] == "4200.0"
+        assert messages[2] == {"type": "error", "id": 8, "error": "Missing parameter 'base_currency'"}
+        assert service.subscriptions == {}
@@ -0,0 +1,145 @@
+import asyncio, threading, time
+from models.order_book import LimitOrderBook
+from models.quote import QuoteRequest
+from services.exchange_service import BinanceSpotWebSocketClient
+from services.quote_service import QuoteService
+from services.price_service import OrderBookObserver
+from services.tracing_service import Tracer, SamplingProfiler, current_trace
+from controllers.quote_controller import QuoteController, create_controller
+from controllers.http_server import AsyncHttpServer
+from tests.helpers import create_quote_service, raw_message
+
+def get_stages(trace) -> list:
+    return [stage for stage, _ in trace.spans]
+
+class TestTracer:
+    """Tests sampled stage timings of quote requests and feed messages"""
+
+    def setup_method(self):
+        self.tracer = Tracer(sample_rate=1, capacity=3)
+        self.client = create_controller(create_quote_service(), tracer=self.tracer).test_client()
+
+    def test_quote_stages(self):
+        response = self.client.post("/quote", json={"action": "buy", "base_currency": "ETH", "quote_currency": "USDT", "amount": "20"})
+        assert response.status_code == 200
+
+        trace = self.tracer.get_traces("quote")[0]
+        assert get_stages(trace) == ["validate", "parse", "resolve", "fill", "serialize"]
+        assert trace.attributes == {"symbol": "ETHUSDT", "action": "buy"}
+        assert trace.cpu_time is not None
+        assert current_trace.get() is None
+
+    def test_ring_buffer_and_endpoint(self):
+        for amount in range(5):
+            self.client.post("/quote", json={"action": "buy", "base_currency": "ETH", "quote_currency": "USDT", "amount": str(amount + 1)})
+        self.client.post("/quote", json={"action": "buy"})
+
+        traces = self.tracer.get_traces()
+        assert len(traces) == 3
+        assert get_stages(traces[-1]) == ["validate"]
+
+        body = self.client.get("/admin/traces", query_string={"kind": "quote", "limit": 2}).get_json()
+        assert body["sample_rate"] == 1
+        assert len(body["traces"]) == 2
+        assert body["summary"]["quote"]["total"]["count"] == 3
+        assert body["summary"]["quote"]["fill"]["count"] == 2
+
+        assert self.client.get("/admin/traces", query_string={"limit": "x"}).status_code == 400
+        assert create_controller(QuoteService()).test_client().get("/admin/traces").status_code == 404
+
+    def test_unsampled_requests_are_not_traced(self):
+        tracer = Tracer(sample_rate=0)
+        client = create_controller(create_quote_service(), tracer=tracer).test_client()
+        client.post("/quote", json={"action": "buy", "base_currency": "ETH", "quote_currency": "USDT", "amount": "1"})
+        assert tracer.get_traces() == []
+
+    def test_feed_stages(self):
+        client = BinanceSpotWebSocketClient()
+        client.set_tracer(self.tracer)
+        client._process_message(raw_message("ETHUSDT", 2000), time.time() - 0.5)
+
+        trace = self.tracer.get_traces("feed")[0]
+        assert get_stages(trace) == ["receive", "decode", "convert", "dispatch"]
+        assert trace.spans[0][1] >= 0.5
+        assert trace.attributes == {"symbol": "ETHUSDT"}
+        assert client.trace is None
+
+    def test_feed_dispatch_does_not_mark_quote_stages(self):
+        quote_service = QuoteService()
+        responses = []
+
+        class QuotingObserver(OrderBookObserver):
+            def on_order_book_received(self, order_book: LimitOrderBook):
+                responses.append(quote_service.quote(QuoteRequest("buy", "ETH", "USDT", 1)))
+
+        client = BinanceSpotWebSocketClient()
+        client.set_tracer(self.tracer)
+        client.observers += [quote_service, QuotingObserver()]
+        client._process_message(raw_message("ETHUSDT", 2000), time.time())
+
+        assert responses[0].total == 2000
+        assert get_stages(self.tracer.get_traces("feed")[0]) == ["receive", "decode", "convert", "dispatch"]
+        assert current_trace.get() is None
+
+
+class TestSamplingProfiler:
+    """Tests time-boxed collapsed stack profiles of the live process"""
+
+    def test_collapsed_stacks(self):
+        stop = threading.Event()
+        def busy_loop():
+            while not stop.is_set():
+                sum(range(1000))
+
+        thread = threading.Thread(target=busy_loop, name="busy")
+        thread.start()
+        try:
+            profile = SamplingProfiler().profile(0.1, 0.001)
+        finally:
+            stop.set()
+            thread.join()
+
+        lines = [line for line in profile.splitlines() if line.startswith("busy;")]
+        assert lines
+        assert all("busy_loop (test_tracing_service.py:" in line for line in lines)
+        assert sum(int(line.rsplit(" ", 1)[1]) for line in lines) > 10
+        assert "sampling-profiler" not in profile
+
+    def test_one_profile_at_a_time(self):
+        profiler = SamplingProfiler()
+        future = profiler.start(0.05)
+        try:
+            profiler.start(0.05)
+            assert False, "second profile must be rejected"
+        except RuntimeError:
+            pass
+        future.result()
+
+        client = create_controller(QuoteService()).test_client()
+        assert client.get("/admin/profile", query_string={"seconds": 0}).status_code == 400
+
+    def test_async_server_keeps_serving_while_profiling(self):
+        async def run():
+            server = await AsyncHttpServer(QuoteController(create_quote_service()).get_routes(), "127.0.0.1", 0).start()
+            try:
+                reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+                writer.write(b"GET /admin/profile?seconds=0.2 HTTP/1.1\r\nHost: localhost\r\n\r\n")
+
+                # another connection is answered while profile runs
+                start = time.perf_counter()
+                other_reader, other_writer = await asyncio.open_connection("127.0.0.1", server.port)
+                other_writer.write(b"GET /ready HTTP/1.1\r\nHost: localhost\r\n\r\n")
+                ready = await other_reader.readline()
+                ready_time = time.perf_counter() - start
+
+                header = await reader.readuntil(b"\r\n\r\n")
+                other_writer.close()
+                writer.close()
+                return ready, ready_time, header
+            finally:
+                await server.stop()
+
+        ready, ready_time, header = asyncio.run(run())
+        assert ready.startswith(b"HTTP/1.1 200")
+        assert ready_time < 0.2
+        assert header.startswith(b"HTTP/1.1 200") and b"text/plain" in header
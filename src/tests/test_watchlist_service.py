@@ -0,0 +1,250 @@
+import asyncio, json, pytest, websockets
+from concurrent.futures import Future
+from functools import partial
+from typing import Dict, Set
+from urllib.parse import urlparse, parse_qs
+from services.exchange_service import BinanceSpotWebSocketClient
+from services.ingestion_service import ShardedIngestion, ProcessIngestionShard, create_binance_client
+from services.quote_service import QuoteService
+from services.watchlist_service import WatchlistService
+from controllers.quote_controller import QuoteController
+from tests.helpers import RecordingObserver, raw_message
+
+class SubscribableFeed:
+    """Local stand-in of Binance combined streams that answers SUBSCRIBE and UNSUBSCRIBE requests and
+    sends order books of subscribed streams of listed symbols. Streams of other symbols are accepted but silent"""
+
+    def __init__(self, listed: Set[str], interval=0.02):
+        self.listed = listed
+        self.interval = interval
+        self.streams: Dict[websockets.WebSocketServerProtocol, Set[str]] = {}
+        """Subscribed streams by connection"""
+        self.server = None
+
+    async def _serve(self, websocket):
+        query = parse_qs(urlparse(websocket.path).query)
+        streams = self.streams[websocket] = set(query["streams"][0].split("/")) if "streams" in query else set()
+        sender = asyncio.create_task(self._send(websocket, streams))
+
+        try:
+            async for message in websocket:
+                request = json.loads(message)
+
+                # like Binance, invalid stream names reject the whole request
+                if not all(stream.split("@")[0].isalnum() for stream in request["params"]):
+                    await websocket.send(json.dumps({"error": {"code": 2, "msg": "Invalid request"}, "id": request["id"]}))
+                elif request["method"] == "SUBSCRIBE":
+                    streams.update(request["params"])
+                else:
+                    streams.difference_update(request["params"])
+                await websocket.send(json.dumps({"result": None, "id": request["id"]}))
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            sender.cancel()
+            del self.streams[websocket]
+
+    async def _send(self, websocket, streams: Set[str]):
+        update_id = 0
+        while True:
+            update_id += 1
+            for stream in list(streams):
+                symbol = stream.split("@")[0].upper()
+                if symbol in self.listed:
+                    await websocket.send(raw_message(symbol, 2000, update_id=update_id))
+            await asyncio.sleep(self.interval)
+
+    def get_streams(self) -> Set[str]:
+        return set().union(*self.streams.values())
+
+    async def start(self) -> str:
+        self.server = await websockets.serve(self._serve, "127.0.0.1", 0)
+        return f"ws://127.0.0.1:{self.server.sockets[0].getsockname()[1]}"
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+
+async def wait_until(condition, timeout=5):
+    for _ in range(int(timeout / 0.01)):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise TimeoutError
+
+class TestRuntimeSubscriptions:
+    """Tests subscribing and unsubscribing symbols on an open connection"""
+
+    def test_subscribe_and_unsubscribe(self):
+        observer = RecordingObserver()
+
+        async def run():
+            feed = SubscribableFeed({"ETHUSDT", "BTCUSDT"})
+            client = BinanceSpotWebSocketClient()
+            client.base_uri = await feed.start()
+            client.set_symbols(["ETHUSDT"])
+            client.observers.append(observer)
+            await client.start()
+
+            try:
+                assert await client.subscribe(["BTCUSDT", "ETHUSDT"]) == ["BTCUSDT"]
+                await wait_until(lambda: any(order_book.symbol == "BTCUSDT" for order_book in observer.order_books))
+
+                assert await client.unsubscribe(["ETHUSDT"]) == ["ETHUSDT"]
+                received = len(observer.order_books)
+                await asyncio.sleep(0.1)
+                return client.symbols, feed.get_streams(), observer.order_books[received:]
+            finally:
+                await client.stop()
+                await feed.stop()
+
+        symbols, streams, later_order_books = asyncio.run(run())
+        assert symbols == ["BTCUSDT"]
+        assert streams == {"btcusdt@depth5@100ms"}
+        assert later_order_books and all(order_book.symbol == "BTCUSDT" for order_book in later_order_books)
+
+    def test_rejected_subscription_is_rolled_back(self):
+        async def run():
+            feed = SubscribableFeed({"ETHUSDT"})
+            client = BinanceSpotWebSocketClient()
+            client.base_uri = await feed.start()
+            client.set_symbols(["ETHUSDT"])
+            await client.start()
+
+            try:
+                await client.subscribe(["BAD/SYM"])
+                assert False, "rejected subscription must raise"
+            except RuntimeError:
+                pass
+            finally:
+                await client.stop()
+                await feed.stop()
+            return client
+
+        client = asyncio.run(run())
+        assert client.symbols == ["ETHUSDT"]
+        assert client.get_uri().endswith("streams=ethusdt@depth5@100ms")
+
+    def test_unsupported_subscriptions_are_rejected(self):
+        client = BinanceSpotWebSocketClient()
+        client.subscribable = False
+        with pytest.raises(ValueError, match="does not support runtime subscriptions"):
+            asyncio.run(client.subscribe(["ETHUSDT"]))
+        assert client.symbols == []
+
+        shard = ProcessIngestionShard(create_binance_client, ["ETHUSDT"], [])
+        with pytest.raises(ValueError, match="do not support runtime subscriptions"):
+            asyncio.run(shard.unsubscribe(["ETHUSDT"]))
+
+    def test_start_without_symbols(self):
+        async def run():
+            feed = SubscribableFeed({"ETHUSDT"})
+            ingestion = ShardedIngestion(partial(create_binance_client, base_uri=await feed.start()), [], 2)
+            observer = RecordingObserver()
+            ingestion.observers.append(observer)
+            await ingestion.start()
+
+            try:
+                assert await ingestion.subscribe(["ETHUSDT"]) == ["ETHUSDT"]
+                await wait_until(lambda: observer.order_books)
+                return ingestion.get_symbols()
+            finally:
+                await ingestion.stop()
+                await feed.stop()
+
+        assert asyncio.run(run()) == ["ETHUSDT"]
+
+
+class TestLazySubscriptions:
+    """Tests subscribing pairs on first quote and unsubscribing idle symbols"""
+
+    def run_with_watchlist(self, test, idle_timeout=60.0, max_rate=10.0):
+        async def run():
+            feed = SubscribableFeed({"ETHUSDT", "BTCUSDT"})
+            ingestion = ShardedIngestion(partial(create_binance_client, base_uri=await feed.start()), [])
+            quote_service = QuoteService()
+            watchlist = WatchlistService(ingestion, quote_service, lazy=True, wait=1, idle_timeout=idle_timeout, max_lazy_rate=max_rate)
+            ingestion.observers.extend([quote_service, watchlist])
+
+            watchlist.start()
+            await ingestion.start()
+            try:
+                return await test(QuoteController(quote_service, watchlist=watchlist), watchlist, feed)
+            finally:
+                await watchlist.stop()
+                await ingestion.stop()
+                await feed.stop()
+
+        return asyncio.run(run())
+
+    @staticmethod
+    async def quote(controller: QuoteController, base_currency: str, quote_currency: str):
+        result = controller.quote({"action": "buy", "base_currency": base_currency, "quote_currency": quote_currency, "amount": "1"})
+        return await asyncio.wrap_future(result) if isinstance(result, Future) else result
+
+    def test_first_quote_waits_for_order_book(self):
+        async def test(controller: QuoteController, watchlist: WatchlistService, feed: SubscribableFeed):
+            first = await self.quote(controller, "ETH", "USDT")
+            await wait_until(lambda: feed.get_streams() == {"ethusdt@depth5@100ms"})
+            second = controller.quote({"action": "sell", "base_currency": "USDT", "quote_currency": "ETH", "amount": "1"})
+            return first, second, watchlist.lazy_symbols, watchlist.rejected
+
+        first, second, lazy_symbols, rejected = self.run_with_watchlist(test)
+        assert first[1] == 200 and first[0]["total"] == "2000.0"
+        assert second[1] == 200
+        assert lazy_symbols == {"ETHUSDT"}
+
+        # reversed symbol sent nothing and is not retried until idle timeout
+        assert list(rejected) == ["USDTETH"]
+
+    def test_unknown_pair_is_not_retried(self):
+        async def test(controller: QuoteController, watchlist: WatchlistService, feed: SubscribableFeed):
+            first = await self.quote(controller, "XRP", "ABC")
+            second = controller.quote({"action": "buy", "base_currency": "XRP", "quote_currency": "ABC", "amount": "1"})
+            return first, second, feed.get_streams()
+
+        first, second, streams = self.run_with_watchlist(test)
+        assert first[1] == 400
+        assert not isinstance(second, Future) and second[1] == 400
+        assert streams == set()
+
+    def test_invalid_currencies_and_rate_limit(self):
+        async def test(controller: QuoteController, watchlist: WatchlistService, feed: SubscribableFeed):
+            invalid = [controller.quote({"action": "buy", "base_currency": base, "quote_currency": "USDT", "amount": "1"})
+                for base in ["BAD/SYM", "ETH@DEPTH", "X" * 20]]
+            first = controller.quote({"action": "buy", "base_currency": "ETH", "quote_currency": "USDT", "amount": "1"})
+            second = controller.quote({"action": "buy", "base_currency": "BTC", "quote_currency": "USDT", "amount": "1"})
+            await asyncio.wrap_future(first)
+            return invalid, second
+
+        invalid, second = self.run_with_watchlist(test, max_rate=1)
+        assert all(not isinstance(result, Future) and result[1] == 400 for result in invalid)
+        assert not isinstance(second, Future) and second[1] == 400
+
+    def test_idle_symbols_are_unsubscribed(self):
+        async def test(controller: QuoteController, watchlist: WatchlistService, feed: SubscribableFeed):
+            await self.quote(controller, "ETH", "USDT")
+            assert "ETHUSDT" in watchlist.quote_service.order_books
+
+            # explicitly subscribed symbols are kept
+            await watchlist.subscribe(["btcusdt"])
+            await wait_until(lambda: "ETHUSDT" not in watchlist.quote_service.order_books)
+            return feed.get_streams(), watchlist.get_symbols()
+
+        streams, symbols = self.run_with_watchlist(test, idle_timeout=0.2)
+        assert streams == {"btcusdt@depth5@100ms"}
+        assert symbols == ["BTCUSDT"]
+
+    def test_admin_endpoint(self):
+        async def test(controller: QuoteController, watchlist: WatchlistService, feed: SubscribableFeed):
+            result = await asyncio.wrap_future(controller.update_symbols({"subscribe": ["BTCUSDT", "ETHUSDT"]}))
+            await wait_until(lambda: len(watchlist.quote_service.order_books) == 2)
+            removed = await asyncio.wrap_future(controller.update_symbols({"unsubscribe": ["ETHUSDT"]}))
+            return result, removed, controller.get_symbols({}), controller.update_symbols({"subscribe": "BTCUSDT"})
+
+        result, removed, symbols, invalid = self.run_with_watchlist(test)
+        assert result == ({"subscribed": ["BTCUSDT", "ETHUSDT"], "unsubscribed": []}, 200)
+        assert removed == ({"subscribed": [], "unsubscribed": ["ETHUSDT"]}, 200)
+        assert symbols == ({"symbols": ["BTCUSDT"], "lazy": []}, 200)
+        assert invalid[1] == 400
@@ -0,0 +1,173 @@
+import asyncio, struct
+from typing import Dict, List, Optional, Union
+from models.quote import QuoteResponse
+
+INTERN = 1
+"""Request: currency code in ascii after header. Response: id of currency used in quote requests"""
+
+QUOTE = 2
+"""Request: action, base and quote currency ids, amount. Response: total, price and order book version"""
+
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+ACTIONS = ("buy", "sell")
+"""Action by action code"""
+
+FRAME_HEADER = struct.Struct("<I")
+"""body length"""
+
+REQUEST_HEADER = struct.Struct("<IBI")
+"""body length, message type, request id"""
+
+RESPONSE_HEADER = struct.Struct("<IBIB")
+"""body length, message type, request id, status"""
+
+QUOTE_REQUEST = struct.Struct("<IBIBHHd")
+"""body length, message type, request id, action code, base currency id, quote currency id, amount"""
+
+QUOTE_RESPONSE = struct.Struct("<IBIBddQ")
+"""body length, message type, request id, status, total, price, order book version (0 when routed)"""
+
+INTERN_RESPONSE = struct.Struct("<IBIBH")
+"""body length, message type, request id, status, currency id"""
+
+MAX_FRAME_SIZE = 64 * 1024
+"""Maximum body length, larger frames close the connection"""
+
+
+def encode_quote_request(request_id: int, action: str, base_currency_id: int, quote_currency_id: int, amount: float) -> bytes:
+    return QUOTE_REQUEST.pack(QUOTE_REQUEST.size - FRAME_HEADER.size, QUOTE, request_id,
+        ACTIONS.index(action), base_currency_id, quote_currency_id, amount)
+
+def encode_intern_request(request_id: int, currency: str) -> bytes:
+    code = currency.upper().encode("ascii")
+    return REQUEST_HEADER.pack(REQUEST_HEADER.size - FRAME_HEADER.size + len(code), INTERN, request_id) + code
+
+def encode_error(message_type: int, request_id: int, message: str) -> bytes:
+    text = message.encode()
+    return RESPONSE_HEADER.pack(RESPONSE_HEADER.size - FRAME_HEADER.size + len(text), message_type, request_id, STATUS_ERROR) + text
+
+
+class CurrencyTable:
+    """Interned currency codes of one connection. Ids are assigned on first use, table is limited
+    so a client can not grow server memory with arbitrary codes"""
+
+    max_currencies = 1024
+    max_currency_length = 16
+
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.names: List[str] = []
+        """Currency code by id"""
+
+    def intern(self, currency: str) -> Optional[int]:
+        """Gets id of currency, assigns a new one on first use. Returns None when code is too long or table is full"""
+        currency = currency.upper()
+        currency_id = self.ids.get(currency)
+
+        if currency_id is None:
+            if len(currency) > CurrencyTable.max_currency_length or len(self.names) >= CurrencyTable.max_currencies:
+                return None
+            currency_id = self.ids[currency] = len(self.names)
+            self.names.append(currency)
+
+        return currency_id
+
+    def get_name(self, currency_id: int) -> Optional[str]:
+        return self.names[currency_id] if currency_id < len(self.names) else None
+
+
+class BinaryQuoteClient:
+    """Client of binary quote protocol over TCP or a Unix domain socket. Requests may be sent concurrently,
+    responses are matched by request id"""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+
+        self.currency_ids: Dict[str, int] = {}
+        """Interned currency ids by code"""
+
+        self.pending: Dict[int, asyncio.Future] = {}
+        """Responses waited by request id"""
+
+        self.next_request_id = 1
+        self.read_task = asyncio.create_task(self._read())
+
+    @staticmethod
+    async def connect(host: str, port: int) -> "BinaryQuoteClient":
+        return BinaryQuoteClient(*await asyncio.open_connection(host, port))
+
+    @staticmethod
+    async def connect_unix(path: str) -> "BinaryQuoteClient":
+        return BinaryQuoteClient(*await asyncio.open_unix_connection(path))
+
+    async def _read(self):
+        try:
+            while True:
+                header = await self.reader.readexactly(FRAME_HEADER.size)
+                body = await self.reader.readexactly(FRAME_HEADER.unpack(header)[0])
+                frame = header + body
+
+                _, message_type, request_id, status = RESPONSE_HEADER.unpack_from(frame)
+                future = self.pending.pop(request_id, None)
+                if future is None or future.done():
+                    continue
+
+                if status != STATUS_OK:
+                    future.set_result(frame[RESPONSE_HEADER.size:].decode())
+                elif message_type == QUOTE:
+                    _, _, _, _, total, price, version = QUOTE_RESPONSE.unpack(frame)
+                    future.set_result((total, price, version))
+                else:
+                    future.set_result(INTERN_RESPONSE.unpack(frame)[4])
+
+        except (asyncio.IncompleteReadError, ConnectionError) as e:
+            for future in self.pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError(f"Connection closed: {e}"))
+            self.pending.clear()
+
+    def _send(self, frame_builder) -> asyncio.Future:
+        request_id = self.next_request_id
+        self.next_request_id = (self.next_request_id + 1) & 0xFFFFFFFF
+
+        future = asyncio.get_running_loop().create_future()
+        self.pending[request_id] = future
+        self.writer.write(frame_builder(request_id))
+        return future
+
+    async def intern(self, currency: str) -> int:
+        """Gets server id of currency"""
+        currency = currency.upper()
+        currency_id = self.currency_ids.get(currency)
+
+        if currency_id is None:
+            result = await self._send(lambda request_id: encode_intern_request(request_id, currency))
+            if isinstance(result, str):
+                raise ValueError(result)
+            currency_id = self.currency_ids[currency] = result
+
+        return currency_id
+
+    async def quote(self, action: str, base_currency: str, quote_currency: str, amount: float) -> Union[QuoteResponse, str]:
+        """Quotes request. Returns response or error message str"""
+        base_id = await self.intern(base_currency)
+        quote_id = await self.intern(quote_currency)
+
+        result = await self._send(lambda request_id: encode_quote_request(request_id, action, base_id, quote_id, amount))
+        if isinstance(result, str):
+            return result
+
+        total, price, version = result
+        return QuoteResponse(total, price, quote_currency.upper(), version or None)
+
+    async def close(self):
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except ConnectionError:
+            pass
+
+        self.read_task.cancel()
@@ -1,5 +1,19 @@
 from abc import ABC, abstractmethod
-from models.order_book import LimitOrder, LimitOrderBook
+import json
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+from models.order_book import LimitOrderBook, OrderBookUpdate, PriceLevels, RawPriceLevels, FixedPointPriceLevels
+
+JsonDecoder = Callable[[Union[str, bytes]], Any]
+
+def get_fast_json_decoder() -> JsonDecoder:
+    """Returns orjson decoder when it is installed, otherwise standard json decoder"""
+    try:
+        import orjson
+        return orjson.loads
+
+    except ImportError:
+        return json.loads
+
 
 class ExchangeWebSocketMessageParser(ABC):
     """Converts received raw json messages to models"""
@@ -14,9 +28,69 @@ class ExchangeWebSocketMessageParser(ABC):
         """Converts received json message to order book model"""
         pass
 
+    def is_order_book_update(self, message:dict) -> bool:
+        """Checks wether received message is incremental order book update or not"""
+        return False
+
+    def get_stream_key(self, raw_message) -> Optional[str]:
+        """Gets stream of raw message without decoding it. Messages of the same stream replace older unprocessed ones.
+        Returns None for messages that must not be dropped"""
+        return None
+
+    def get_message_id(self, raw_message) -> Optional[Tuple[str, int]]:
+        """Gets (stream, increasing update id) of raw message without decoding it. Messages of redundant connections
+        are deduplicated by it. Returns None for messages that can not be deduplicated"""
+        return None
+
+    def get_response(self, message:dict) -> Optional[Tuple[int, Optional[str]]]:
+        """Gets (request id, error message or None) of a response to a control request like subscribe.
+        Returns None for stream data messages"""
+        return None
+
+    def get_raw_levels(self, message:dict) -> Optional[Tuple[str, list, list]]:
+        """Gets (symbol, raw bids, raw asks) of order book message before conversion, so that an unchanged order book
+        is detected by comparing its raw levels. Returns None when raw levels can not be compared"""
+        return None
+
+    @abstractmethod
+    def convert_order_book_update(self, message:dict) -> OrderBookUpdate:
+        """Converts received json message to incremental order book update model"""
+        pass
+
+    @abstractmethod
+    def convert_snapshot(self, symbol:str, snapshot:dict) -> OrderBookUpdate:
+        """Converts full depth order book snapshot to update model that replaces all levels"""
+        pass
+
 class BinanceSpotWebSocketMessageParser(ExchangeWebSocketMessageParser):
     """Converts received raw json messages to models for Binance Spot markets"""
 
+    def __init__(self, lazy=False):
+        self.lazy = lazy
+        """Keeps order book levels as raw strings until they are read"""
+
+        self.fixed_point = False
+        """Converts order book levels to integers scaled by symbol precision instead of floats"""
+
+        self.precisions: Dict[str, Tuple[int, int]] = {}
+        """(price decimals, quantity decimals) by symbol. 
+        Symbols without exchange precision use decimals of their first received level strings"""
+
+    def set_fixed_point(self, precisions: Dict[str, Tuple[int, int]] = None):
+        """Enables fixed point order book levels with given (price decimals, quantity decimals) by symbol"""
+        self.fixed_point = True
+        self.precisions.update(precisions or {})
+
+    def _get_precision(self, symbol: str, levels: list) -> Tuple[int, int]:
+        precision = self.precisions.get(symbol)
+
+        # Binance level strings are padded to a fixed number of decimals
+        if precision is None and levels:
+            price, quantity = levels[0]
+            precision = self.precisions[symbol] = (len(price.partition(".")[2]), len(quantity.partition(".")[2]))
+
+        return precision or (8, 8)
+
     def _get_stream_name(self, message: dict) -> str:
         """Gets stream name from stream message"""
         return message['stream']
@@ -25,17 +99,105 @@ class BinanceSpotWebSocketMessageParser(ExchangeWebSocketMessageParser):
         """Gets price data json from stream message"""
         return message['data']
 
+    @staticmethod
+    def _to_levels(levels: list) -> list:
+        """Converts raw [price, quantity] string pairs to float tuples"""
+        return [(float(price), float(quantity)) for price, quantity in levels]
+
     def is_order_book(self, message: dict) -> bool:
         return "depth" in self._get_stream_name(message)
+
+    def get_response(self, message: dict) -> Optional[Tuple[int, Optional[str]]]:
+        # responses to SUBSCRIBE and UNSUBSCRIBE are {"result": null, "id": 1} or {"error": {...}, "id": 1}
+        if "stream" in message or "id" not in message:
+            return None
+
+        error = message.get("error")
+        return message["id"], error.get("msg", str(error)) if isinstance(error, dict) else error
+
+    @staticmethod
+    def _find_stream_name(raw_message: str) -> Optional[str]:
+        # combined stream messages start with '{"stream":"<stream name>"'
+        start = raw_message.find('"stream":"')
+        if start < 0:
+            return None
+
+        start += len('"stream":"')
+        return raw_message[start:raw_message.find('"', start)]
+
+    def get_stream_key(self, raw_message) -> Optional[str]:
+        if isinstance(raw_message, bytes):
+            raw_message = raw_message.decode()
+
+        stream_name = self._find_stream_name(raw_message)
+
+        # every incremental update is required to keep local order book in sync
+        return None if stream_name is None or "@depth@" in stream_name else stream_name
+
+    def get_message_id(self, raw_message) -> Optional[Tuple[str, int]]:
+        if isinstance(raw_message, bytes):
+            raw_message = raw_message.decode()
+
+        stream_name = self._find_stream_name(raw_message)
+        if stream_name is None:
+            return None
+
+        # partial order books carry last update id, diff depth updates carry final update id
+        for field in ('"lastUpdateId":', '"u":'):
+            start = raw_message.find(field)
+            if start >= 0:
+                start += len(field)
+                end = start
+                while end < len(raw_message) and raw_message[end].isdigit():
+                    end += 1
+                return (stream_name, int(raw_message[start:end])) if end > start else None
+
+        return None
     
-    def convert_order_book(self, message: dict) -> LimitOrderBook:
-        stream_name = self._get_stream_name(message)
+    def get_raw_levels(self, message: dict) -> Tuple[str, list, list]:
         stream_data = self._get_stream_data(message)
 
         # example: converts stream name 'ethusdt@depth5@100ms' to symbol 'ETHUSDT'
-        symbol = stream_name.split('@')[0].upper()
-        
-        bids = [LimitOrder(float(price), float(quantity)) for price, quantity in stream_data.get("bids", [])]
-        asks = [LimitOrder(float(price), float(quantity)) for price, quantity in stream_data.get("asks", [])]
+        symbol = self._get_stream_name(message).split('@')[0].upper()
+
+        return symbol, stream_data.get("bids", []), stream_data.get("asks", [])
+
+    def convert_order_book(self, message: dict) -> LimitOrderBook:
+        symbol, raw_bids, raw_asks = self.get_raw_levels(message)
+
+        # levels are stored as arrays, lazy mode converts them on first read
+        if self.fixed_point:
+            precision = self._get_precision(symbol, raw_bids or raw_asks)
+            bids = FixedPointPriceLevels.from_raw(raw_bids, *precision)
+            asks = FixedPointPriceLevels.from_raw(raw_asks, *precision)
+        else:
+            convert = RawPriceLevels if self.lazy else PriceLevels.from_raw
+            bids = convert(raw_bids)
+            asks = convert(raw_asks)
         
-        return LimitOrderBook(symbol, bids, asks)
\ No newline at end of file
+        return LimitOrderBook(symbol, bids, asks)
+
+    def is_order_book_update(self, message: dict) -> bool:
+        # diff depth stream name example 'ethusdt@depth@100ms'
+        return "@depth@" in self._get_stream_name(message)
+
+    def convert_order_book_update(self, message: dict) -> OrderBookUpdate:
+        stream_data = self._get_stream_data(message)
+
+        return OrderBookUpdate(
+            stream_data["s"],
+            stream_data["U"],
+            stream_data["u"],
+            self._to_levels(stream_data.get("b", [])),
+            self._to_levels(stream_data.get("a", [])),
+            stream_data.get("E"))
+
+    def convert_snapshot(self, symbol: str, snapshot: dict) -> OrderBookUpdate:
+        last_update_id = snapshot["lastUpdateId"]
+
+        return OrderBookUpdate(
+            symbol.upper(),
+            last_update_id,
+            last_update_id,
+            self._to_levels(snapshot.get("bids", [])),
+            self._to_levels(snapshot.get("asks", [])))
@@ -0,0 +1,176 @@
+import gzip, os, struct, time
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Iterable, Iterator, List, Tuple, Union
+
+MAGIC = b"QFR1"
+"""Start of every feed log file"""
+
+RECORD_HEADER = struct.Struct("<QI")
+"""Receive time in nanoseconds, payload length"""
+
+class FeedRecorder:
+    """Appends received raw websocket frames with their receive time to a compact log file.
+    Files are optionally gzip compressed and rotated after a number of bytes.
+    Records are buffered and written by a background thread, so recording does not block the event loop"""
+
+    def __init__(self, path: str, compress=False, max_bytes: int = None, buffer_size=64 * 1024, flush_interval=1.0):
+        self.path = path
+        """Log file path. Rotated files get an increasing index suffix"""
+
+        self.compress = compress
+        """Compresses files with gzip"""
+
+        self.max_bytes = max_bytes
+        """Bytes per file on disk (compressed when compressing) before rotating to a new file. Never rotates when None"""
+
+        self.buffer_size = buffer_size
+        """Buffered record bytes that are handed to writer thread"""
+
+        self.flush_interval = flush_interval
+        """Seconds after which buffered records are handed to writer thread on next write"""
+
+        self.buffer: List[bytes] = []
+        self.buffered_bytes = 0
+        self.buffer_time = time.monotonic()
+        """Monotonic time buffer was last handed to writer thread"""
+
+        self.writer: ThreadPoolExecutor = None
+        """Single thread that owns open files, so records are written in order"""
+
+        self.index = 0
+        """Index of current file"""
+
+        self.file: BinaryIO = None
+        self.raw_file: BinaryIO = None
+        self.written_bytes = 0
+        """Bytes on disk of current file, output still buffered by the compressor is not counted yet"""
+
+    def get_file_path(self, index: int) -> str:
+        """Path of file with given rotation index"""
+        path = self.path if index == 0 else f"{self.path}.{index:05d}"
+        return path + ".gz" if self.compress else path
+
+    def _open(self):
+        # continues after files of a previous recording
+        while self.max_bytes is not None and os.path.exists(self.get_file_path(self.index + 1)):
+            self.index += 1
+
+        file_path = self.get_file_path(self.index)
+        self.raw_file = open(file_path, "ab")
+        is_new = self.raw_file.tell() == 0
+
+        # compressed appends are separate gzip members that are read as one stream
+        self.file = gzip.GzipFile(fileobj=self.raw_file, mode="ab", compresslevel=1) if self.compress else self.raw_file
+
+        if is_new:
+            self.file.write(MAGIC)
+        self.written_bytes = self.raw_file.tell()
+
+    def _flush_file(self):
+        if self.file is not None:
+            self.file.flush()
+            self.written_bytes = self.raw_file.tell()
+
+    def _close_file(self):
+        if self.file is not None:
+            self.file.close()
+            if self.raw_file is not self.file:
+                self.raw_file.close()
+            self.file = self.raw_file = None
+
+    def _write_records(self, records: List[bytes]):
+        """Writes records on writer thread, rotating files between records"""
+        for record in records:
+            if self.file is None:
+                self._open()
+
+            self.file.write(record)
+            self.written_bytes = self.raw_file.tell()
+
+            if self.max_bytes is not None and self.written_bytes >= self.max_bytes:
+                self._close_file()
+                self.index += 1
+
+    def _hand_over(self):
+        """Hands buffered records to writer thread"""
+        if self.writer is None:
+            self.writer = ThreadPoolExecutor(max_workers=1)
+
+        if self.buffer:
+            self.writer.submit(self._write_records, self.buffer)
+            self.buffer = []
+            self.buffered_bytes = 0
+        self.buffer_time = time.monotonic()
+
+    def write(self, message: Union[str, bytes], received_time: float):
+        """Appends a raw frame received at given unix time in seconds"""
+        payload = message.encode() if isinstance(message, str) else message
+        record = RECORD_HEADER.pack(int(received_time * 1e9), len(payload)) + payload
+        self.buffer.append(record)
+        self.buffered_bytes += len(record)
+
+        if self.buffered_bytes >= self.buffer_size or time.monotonic() - self.buffer_time >= self.flush_interval:
+            self._hand_over()
+
+    def flush(self):
+        """Writes buffered records and flushes file. Blocks until written"""
+        self._hand_over()
+        self.writer.submit(self._flush_file).result()
+
+    def close(self):
+        """Writes buffered records and closes file. Blocks until closed, later writes open the file again"""
+        if self.writer is None and not self.buffer:
+            return
+
+        self._hand_over()
+        self.writer.submit(self._close_file).result()
+        self.writer.shutdown()
+        self.writer = None
+
+
+def get_feed_files(path: str) -> List[str]:
+    """Gets recorded files of given log path in rotation order"""
+    directory = os.path.dirname(path) or "."
+    name = os.path.basename(path)
+    files = []
+
+    for file_name in os.listdir(directory):
+        if file_name in (name, name + ".gz"):
+            files.append((0, file_name))
+            continue
+
+        # rotated file name example 'feed.log.00002' or 'feed.log.00002.gz'
+        if file_name.startswith(name + "."):
+            index = file_name[len(name) + 1:].split(".")[0]
+            if index.isdigit():
+                files.append((int(index), file_name))
+
+    return [os.path.join(directory, file_name) for _, file_name in sorted(files)]
+
+
+def read_feed(paths: Union[str, Iterable[str]]) -> Iterator[Tuple[int, str]]:
+    """Reads (receive time in nanoseconds, raw frame) records of given log files in order.
+    A log path without rotation suffix reads all of its rotated files"""
+    if isinstance(paths, str):
+        paths = get_feed_files(paths) or [paths]
+
+    for path in paths:
+        opener = gzip.open if path.endswith(".gz") else open
+
+        with opener(path, "rb") as file:
+            if file.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"'{path}' is not a feed log file")
+
+            while True:
+                header = file.read(RECORD_HEADER.size)
+
+                # a truncated last record is left by an interrupted recording
+                if len(header) < RECORD_HEADER.size:
+                    break
+
+                timestamp, length = RECORD_HEADER.unpack(header)
+                payload = file.read(length)
+                if len(payload) < length:
+                    break
+
+                yield timestamp, payload.decode()
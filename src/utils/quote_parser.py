@@ -1,6 +1,11 @@
-from models.quote import QuoteRequest, QuoteResponse
+from models.quote import QuoteRequest, QuoteResponse, PriceImpactRequest, PriceImpactResponse
+from models.order_book import OrderBookSnapshot
+from typing import List, Tuple
 import math
 
+MAX_IMPACT_POINTS = 10000
+"""Maximum number of amounts of a price impact curve"""
+
 
 class QuoteParser:
     @staticmethod
@@ -8,18 +13,24 @@ class QuoteParser:
         """Validates parameters in JSON. 
         Returns an error message string if the request is invalid. 
         Returns an empty string if the request is valid"""
+        return QuoteParser.get_validation_error(json)[1]
+
+    @staticmethod
+    def get_validation_error(json:dict) -> Tuple[str, str]:
+        """Validates parameters in JSON. Returns (reason, error message) where reason is a fixed
+        identifier of the failed check, e.g. 'missing_amount'. Returns empty strings if the request is valid"""
         
         # check parameters exist and filled
         for param in ["action", "base_currency", "quote_currency", "amount"]:
             if param not in json:
-                return f"Missing parameter '{param}'"
+                return f"missing_{param}", f"Missing parameter '{param}'"
             elif json[param] == "":
-                return f"Parameter '{param}' is empty"
+                return f"empty_{param}", f"Parameter '{param}' is empty"
             
         # check action is valid
         action = json["action"]
         if not (action == "buy" or action == "sell"):
-            return f"'{action}' is not valid action"
+            return "invalid_action", f"'{action}' is not valid action"
 
         # check amount is valid positive finite number
         try:
@@ -29,10 +40,152 @@ class QuoteParser:
                 raise ValueError
 
         except ValueError:
-            return f"'{json['amount']}' is not valid amount"
-        
+            return "invalid_amount", f"'{json['amount']}' is not valid amount"
+
+        # check optional order book freshness parameters
+        freshness_error = QuoteParser._get_freshness_error(json)
+        if freshness_error[1] != "":
+            return freshness_error
+
+        if json.get("venues") not in (None, True, False, "true", "false"):
+            return "invalid_venues", f"'{json['venues']}' is not valid venues"
+
+        if json.get("allow_stale") not in (None, True, False, "true", "false"):
+            return "invalid_allow_stale", f"'{json['allow_stale']}' is not valid allow_stale"
+
+        # check optional history window parameters
+        if json.get("window") is not None:
+            try:
+                window = float(json["window"])
+
+                if not math.isfinite(window) or window <= 0:
+                    raise ValueError
+
+            except (TypeError, ValueError):
+                return "invalid_window", f"'{json['window']}' is not valid window"
+
+        if json.get("average") not in (None, "twap", "snapshot"):
+            return "invalid_average", f"'{json['average']}' is not valid average, must be 'twap' or 'snapshot'"
+
         # no error
-        return ""
+        return "", ""
+
+    @staticmethod
+    def _get_freshness_error(json:dict) -> Tuple[str, str]:
+        """Validates optional order book freshness parameters"""
+        if json.get("min_version") is not None:
+            try:
+                if int(json["min_version"]) < 0:
+                    raise ValueError
+
+            except (TypeError, ValueError):
+                return "invalid_min_version", f"'{json['min_version']}' is not valid min_version"
+
+        if json.get("max_age") is not None:
+            try:
+                max_age = float(json["max_age"])
+
+                if not math.isfinite(max_age) or max_age < 0:
+                    raise ValueError
+
+            except (TypeError, ValueError):
+                return "invalid_max_age", f"'{json['max_age']}' is not valid max_age"
+
+        return "", ""
+
+    @staticmethod
+    def get_impact_validation_error(json:dict) -> Tuple[str, str]:
+        """Validates price impact curve parameters. Amounts are given either as an 'amounts' list
+        or as a 'start', 'stop' (inclusive) and 'step' range. Returns empty strings if the request is valid"""
+        if not isinstance(json, dict):
+            return "invalid_request", "Price impact request must be an object"
+
+        for param in ["symbol", "action"]:
+            if param not in json:
+                return f"missing_{param}", f"Missing parameter '{param}'"
+            elif json[param] == "":
+                return f"empty_{param}", f"Parameter '{param}' is empty"
+
+        action = json["action"]
+        if not (action == "buy" or action == "sell"):
+            return "invalid_action", f"'{action}' is not valid action"
+
+        try:
+            amounts = QuoteParser._get_impact_amounts(json)
+
+        except ValueError as e:
+            return "invalid_amounts", str(e)
+
+        if len(amounts) > MAX_IMPACT_POINTS:
+            return "invalid_amounts", f"Price impact curve is limited to {MAX_IMPACT_POINTS} amounts"
+
+        return QuoteParser._get_freshness_error(json)
+
+    @staticmethod
+    def _get_impact_amounts(json:dict) -> List[float]:
+        """Amounts of given list or range. Raises ValueError on invalid amounts"""
+        if "amounts" in json:
+            if not isinstance(json["amounts"], list) or not json["amounts"]:
+                raise ValueError("Parameter 'amounts' must be a non empty list")
+            return [QuoteParser._to_positive_amount(amount) for amount in json["amounts"]]
+
+        for param in ["start", "stop", "step"]:
+            if param not in json:
+                raise ValueError(f"Missing parameter 'amounts' or '{param}'")
+
+        start, stop, step = (QuoteParser._to_positive_amount(json[param]) for param in ["start", "stop", "step"])
+        if stop < start:
+            raise ValueError(f"'{json['stop']}' is not valid stop, it is less than start")
+
+        # multiples of step instead of repeated additions, stop is included despite float rounding
+        # ratio of huge stop to tiny step overflows to infinity, which cannot be floored
+        steps = (stop - start) / step + 1e-9
+        count = math.floor(steps) + 1 if math.isfinite(steps) else math.inf
+        if count > MAX_IMPACT_POINTS:
+            raise ValueError(f"Price impact curve is limited to {MAX_IMPACT_POINTS} amounts")
+        return [start + index * step for index in range(count)]
+
+    @staticmethod
+    def _to_positive_amount(amount) -> float:
+        try:
+            value = float(amount)
+
+        except (TypeError, ValueError):
+            value = math.nan
+
+        if not math.isfinite(value) or value <= 0:
+            raise ValueError(f"'{amount}' is not valid amount")
+        return value
+
+    @staticmethod
+    def to_impact_request(json:dict) -> PriceImpactRequest:
+        """Converts validated json parameters to PriceImpactRequest model"""
+        min_version = int(json["min_version"]) if json.get("min_version") is not None else None
+        max_age = float(json["max_age"]) if json.get("max_age") is not None else None
+        return PriceImpactRequest(json["symbol"].upper(), json["action"], QuoteParser._get_impact_amounts(json), min_version, max_age)
+
+    @staticmethod
+    def to_impact_response_json(response: PriceImpactResponse) -> dict:
+        """Converts price impact response model to json"""
+        points = []
+        for point in response.points:
+            if point.total is None:
+                points.append({"amount": str(point.amount), "error": "Order book is not liquid enough to fill amount"})
+            else:
+                points.append({"amount": str(point.amount), "total": str(point.total), "price": str(point.price),
+                    "slippage": str(point.slippage)})
+
+        return {"symbol": response.symbol, "action": response.action, "top_price": str(response.top_price),
+            "version": response.version, "points": points}
+
+    @staticmethod
+    def to_order_book_json(snapshot: OrderBookSnapshot) -> dict:
+        """Converts order book snapshot to json with [price, quantity] string pairs"""
+        return {
+            "symbol": snapshot.symbol,
+            "received_time": snapshot.received_time,
+            "bids": [[str(order.price), str(order.quantity)] for order in snapshot.bids],
+            "asks": [[str(order.price), str(order.quantity)] for order in snapshot.asks]}
 
     @staticmethod
     def to_request(json:dict) -> QuoteRequest:
@@ -41,13 +194,44 @@ class QuoteParser:
         base_currency = json["base_currency"]
         quote_currency = json["quote_currency"]
         amount = float(json["amount"])
-        return QuoteRequest(action, base_currency, quote_currency, amount)
+        min_version = int(json["min_version"]) if json.get("min_version") is not None else None
+        max_age = float(json["max_age"]) if json.get("max_age") is not None else None
+        venue_breakdown = json.get("venues") in (True, "true")
+        allow_stale = json.get("allow_stale") in (True, "true")
+        window = float(json["window"]) if json.get("window") is not None else None
+        window_average = json.get("average") or "twap"
+        return QuoteRequest(action, base_currency, quote_currency, amount, min_version, max_age, venue_breakdown, allow_stale,
+            window, window_average)
         
     @staticmethod
     def to_response_json(respone: QuoteResponse) -> dict[str, str]:
         """Converts response model to json"""
-        return {
+        response_json = {
             "total": str(respone.total),
             "price" : str(respone.price),
             "currency": respone.currency
-		}
\ No newline at end of file
+		}
+
+        # version of order book that response is priced against
+        if respone.version is not None:
+            response_json["version"] = respone.version
+
+        # order books that response is priced through
+        if respone.route is not None:
+            response_json["route"] = respone.route
+
+        # amount and total filled on each venue
+        if respone.venues is not None:
+            response_json["venues"] = {venue: {"amount": str(amount), "total": str(total)}
+                for venue, (amount, total) in respone.venues.items()}
+
+        # averaged over order books of a history window
+        if respone.snapshots is not None:
+            response_json["snapshots"] = respone.snapshots
+
+        # priced against order books restored from a previous run
+        if respone.stale_age is not None:
+            response_json["stale"] = True
+            response_json["stale_age"] = round(respone.stale_age, 3)
+
+        return response_json
\ No newline at end of file